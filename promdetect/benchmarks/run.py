@@ -0,0 +1,384 @@
+"""
+Extraction benchmarks on synthetic recordings, see `promdetect.benchmarks.synthetic`.
+
+The stages of the nucleus-level, frame-level and word-level pipelines are timed one by one on recordings of the given lengths.
+Throughput is reported as real-time factor, i.e. processing time divided by audio duration (lower is faster).
+Results are written to a JSON file, which later runs can be compared against.
+
+Usage: promdetect-benchmark --durations 30 120 --output results.json --compare baseline.json
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import parselmouth as pm
+
+from promdetect.benchmarks import synthetic
+from promdetect.frame_based.extract_frame_features import FrameLevelExtractor
+from promdetect.prep import (
+    audio,
+    extract_features,
+    find_syllable_nuclei,
+    prepare_data,
+    schemas,
+)
+from promdetect.word_based import segmentation
+from promdetect.word_based.extract_word_features import WordLevelExtractor
+
+PIPELINES = ["nucleus", "frame", "word"]
+
+
+class StageTimer(object):
+    """
+    Collect the wall time of pipeline stages for one recording.
+    Failing stages are recorded with their error instead of aborting the benchmark.
+    """
+
+    def __init__(self, pipeline, audio_seconds):
+        self.pipeline = pipeline
+        self.audio_seconds = audio_seconds
+        self.results = []
+
+    def run(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        error = None
+        try:
+            output = func(*args, **kwargs)
+        except Exception as exc:
+            output = None
+            error = f"{type(exc).__name__}: {exc}"
+        seconds = time.perf_counter() - start
+
+        self.results.append(
+            {
+                "pipeline": self.pipeline,
+                "stage": stage,
+                "audio_seconds": self.audio_seconds,
+                "seconds": seconds,
+                "rtf": seconds / self.audio_seconds,
+                "error": error,
+            }
+        )
+
+        return output
+
+
+def benchmark_nucleus(wav_file, nucleus_times, gender="f"):
+    """
+    Time syllable nucleus detection, label assignment and each nucleus-level feature of the default configuration.
+    The features are extracted for a nucleus table built directly from the synthetic nucleus times and annotation spans,
+    so they are timed even if detection or label assignment fails.
+    """
+
+    wav_file = Path(wav_file)
+    timer = StageTimer("nucleus", cold_start(wav_file))
+
+    with open(prepare_data.CFG_FILE, "r") as cfg:
+        config = dict(json.load(cfg), directory=str(wav_file.parent))
+
+    timer.run(
+        "get_nucleus_points", find_syllable_nuclei.get_nucleus_points, str(wav_file)
+    )
+
+    feature_set = prepare_data.FeatureSet(
+        config, wav_file.stem, speaker=("unknown", gender)
+    )
+    annotations = {
+        annotation_type: feature_set.collect_annotations(annotation_type)
+        for annotation_type in ["phones", "words", "tones", "accents"]
+    }
+    timer.run(
+        "assign_points_labels",
+        find_syllable_nuclei.assign_points_labels,
+        list(nucleus_times),
+        annotations["phones"],
+        annotations["words"],
+        annotations["tones"],
+        annotations["accents"],
+    )
+
+    feature_set.nuclei = annotated_nuclei(nucleus_times, annotations)
+    features = feature_set.nuclei.copy()
+
+    extractor = timer.run(
+        "__init__",
+        extract_features.Extractor,
+        str(wav_file),
+        feature_set.nuclei,
+        gender,
+    )
+    if extractor is None:
+        return timer.results
+
+    # Shared objects first, so the features are timed on their own
+    for stage in ["calc_intensity", "calc_pitch", "extract_parts"]:
+        timer.run(stage, getattr(extractor, stage))
+
+    for func_to_run, to_run in config["features"].items():
+        if to_run:
+            timer.run(
+                f"get_{func_to_run}",
+                feature_set.call_function,
+                extractor,
+                features,
+                func_to_run,
+            )
+
+    return timer.results
+
+
+def benchmark_frame(wav_file, gender="f"):
+    """
+    Time the stages of the frame-level extraction.
+    """
+
+    timer = StageTimer("frame", cold_start(wav_file))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        extractor = timer.run(
+            "__init__", FrameLevelExtractor, str(wav_file), gender, out_dir
+        )
+        if extractor is None:
+            return timer.results
+
+        for stage in [
+            "rms_extraction",
+            "loudness_extraction",
+            "zcr_extraction",
+            "hnr_extraction",
+        ]:
+            timer.run(stage, getattr(extractor, stage))
+
+    return timer.results
+
+
+def benchmark_word(wav_file, gender="f"):
+    """
+    Time the segmentation of the annotations and the stages of the word-level extraction.
+    """
+
+    wav_file = Path(wav_file)
+    timer = StageTimer("word", cold_start(wav_file))
+
+    tables = {}
+    for level in ["words", "tones"]:
+        segmenter = segmentation.Segmenter(level, str(wav_file.parent))
+        segmenter.files = [str(wav_file.with_suffix(f".{level}"))]
+        timer.run(f"segmentation_{level}", segmenter.read_annotations)
+        tables[level] = segmenter.annotations.get(wav_file.stem)
+
+    extractor = timer.run(
+        "__init__",
+        WordLevelExtractor,
+        str(wav_file),
+        tables["words"],
+        tables["tones"],
+        gender,
+    )
+    if extractor is None:
+        return timer.results
+
+    for stage in [
+        "get_duration_features",
+        "get_intensity_features",
+        "get_pitch_features",
+        "get_spectral_features",
+    ]:
+        timer.run(stage, getattr(extractor, stage))
+
+    return timer.results
+
+
+def run_benchmarks(durations, pipelines=PIPELINES, gender="f", repeat=1, seed=0):
+    """
+    Run the benchmarks of the given pipelines on one synthetic recording per duration.
+    With repeat > 1, the fastest of the repeated runs is kept for each stage.
+    Returns the results as a list of dictionaries, one per pipeline stage and duration.
+    """
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for duration in durations:
+            wav_file, nucleus_times = synthetic.write_recording(
+                data_dir,
+                f"synthetic_{int(duration)}s",
+                duration,
+                f0=120.0 if gender == "m" else 200.0,
+                seed=seed,
+            )
+
+            benchmarks = {
+                "nucleus": partial(benchmark_nucleus, nucleus_times=nucleus_times),
+                "frame": benchmark_frame,
+                "word": benchmark_word,
+            }
+
+            for pipeline in pipelines:
+                for _ in range(repeat):
+                    for result in benchmarks[pipeline](wav_file, gender=gender):
+                        key = (pipeline, result["stage"], duration)
+                        if (
+                            key not in results
+                            or result["seconds"] < results[key]["seconds"]
+                        ):
+                            results[key] = result
+
+    return list(results.values())
+
+
+# ANCILLARY FUNCTIONS
+def annotated_nuclei(nucleus_times, annotations):
+    """
+    Nucleus table as built by `find_syllable_nuclei.assign_points_labels()`, for nuclei at known times:
+    each nucleus gets the span and label of the phone, word and intonation phrase it lies in, and the accent within its phone.
+    """
+
+    times = np.asarray(nucleus_times, dtype="float64")
+    nuclei = pd.DataFrame({"nucl_time": times})
+
+    for annotation_type, end_col, columns in [
+        ("phones", "end", ["start_est", "end", "phone"]),
+        ("words", "end", ["word_start", "word_end", "word"]),
+        ("tones", "time", ["ip_start", "ip_end", "bound_tone"]),
+    ]:
+        spans = annotations[annotation_type]
+        starts = spans["start_est"].fillna(0.0).to_numpy(dtype="float64")
+        ends = spans[end_col].to_numpy(dtype="float64")
+
+        # First span ending at or after each nucleus, if it also starts before it
+        pos = np.minimum(np.searchsorted(ends, times, side="left"), len(spans) - 1)
+        found = (starts[pos] <= times) & (ends[pos] >= times)
+
+        nuclei[columns[0]] = np.where(found, spans["start_est"].to_numpy()[pos], np.nan)
+        nuclei[columns[1]] = np.where(found, ends[pos], np.nan)
+        nuclei[columns[2]] = np.where(found, spans["label"].to_numpy()[pos], None)
+
+    nuclei["duration_est"] = nuclei["end"] - nuclei["start_est"]
+
+    accent_times = annotations["accents"]["time"].to_numpy(dtype="float64")
+    pos = np.minimum(
+        np.searchsorted(accent_times, nuclei["start_est"].to_numpy(), side="left"),
+        max(len(accent_times) - 1, 0),
+    )
+    has_accent = (
+        (accent_times[pos] >= nuclei["start_est"])
+        & (accent_times[pos] <= nuclei["end"])
+        if len(accent_times)
+        else np.zeros(len(nuclei), dtype=bool)
+    )
+    nuclei["accent_time"] = np.where(has_accent, accent_times[pos], np.nan)
+    nuclei["accent_label"] = np.where(
+        has_accent, annotations["accents"]["label"].to_numpy()[pos], None
+    )
+
+    nuclei = nuclei.loc[nuclei["phone"].notna()].reset_index()
+
+    return schemas.enforce(nuclei, schemas.NUCLEI)
+
+
+def cold_start(wav_file):
+    """
+    Close the recordings opened by earlier benchmarks, so each pipeline decodes its recording itself.
+    Returns the duration of the recording.
+    """
+
+    audio._open_wav.cache_clear()
+
+    return audio.WavFile(wav_file).duration
+
+
+def environment():
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "praat": pm.PRAAT_VERSION,
+        "parselmouth": pm.VERSION,
+    }
+
+
+def compare(results, baseline):
+    """
+    Ratio of the time of each stage to the time in a baseline run, below 1 means faster.
+    """
+
+    baseline_seconds = {
+        (result["pipeline"], result["stage"], result["audio_seconds"]): result[
+            "seconds"
+        ]
+        for result in baseline["results"]
+        if result["error"] is None
+    }
+
+    ratios = []
+    for result in results:
+        key = (result["pipeline"], result["stage"], result["audio_seconds"])
+        if result["error"] is None and key in baseline_seconds:
+            ratios.append(dict(result, ratio=result["seconds"] / baseline_seconds[key]))
+
+    return ratios
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the feature extraction pipelines on synthetic recordings."
+    )
+    parser.add_argument(
+        "--durations",
+        nargs="+",
+        type=float,
+        default=[30.0],
+        help="Lengths of the synthetic recordings in seconds",
+    )
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=PIPELINES)
+    parser.add_argument("--gender", choices=["f", "m"], default="f")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument(
+        "--compare", help="Results of an earlier run to compare against"
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    results = run_benchmarks(args.durations, args.pipelines, args.gender, args.repeat)
+
+    with open(args.output, "w") as out_file:
+        json.dump(
+            {"environment": environment(), "results": results}, out_file, indent=4
+        )
+
+    for result in results:
+        status = result["error"] or f"RTF {result['rtf']:.4f}"
+        print(
+            f"{result['pipeline']:8} {result['stage']:28} {result['audio_seconds']:7.1f} s  "
+            f"{result['seconds']:8.3f} s  {status}"
+        )
+
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+        print(f"\nCompared to {args.compare}:")
+        for result in compare(results, baseline):
+            print(
+                f"{result['pipeline']:8} {result['stage']:28} {result['audio_seconds']:7.1f} s  "
+                f"x{result['ratio']:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
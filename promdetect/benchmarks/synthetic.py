@@ -0,0 +1,134 @@
+"""
+Synthetic speech-like recordings with DIRNDL-style annotations, for benchmarks and tests without corpus data.
+
+Each syllable is a short noise burst (consonant) followed by a harmonic tone (vowel) with a rising and falling amplitude.
+F0 follows a declining contour with accent peaks. Words of one to three syllables are separated by pauses ("<P>")
+every few words, intonation phrase boundaries and pitch accents are placed on a fixed share of words and syllables.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import parselmouth as pm
+
+HEADER = "signal rec\nnfields 1\n#\n"
+
+CONSONANT_DURATION = 0.06
+VOWEL_DURATION = 0.14
+
+
+def write_recording(
+    directory, name="synthetic", duration=30.0, sample_rate=16_000, f0=120.0, seed=0
+):
+    """
+    Write `<name>.wav` with `.phones`, `.words`, `.tones` and `.accents` annotations of about `duration` seconds to `directory`.
+    Returns the path to the WAV file and the times of the vowel centres, i.e. the syllable nuclei.
+    """
+
+    rng = np.random.default_rng(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    phones = []
+    words = []
+    tones = []
+    accents = []
+    nuclei = []
+    pauses = []
+
+    time = 0.05
+    words_since_pause = 0
+    while time < duration - 1.0:
+        if words_since_pause >= rng.integers(5, 10):
+            pause_end = time + rng.uniform(0.2, 0.5)
+            pauses.append((time, pause_end))
+            words.append((pause_end, "<P>"))
+            time = pause_end
+            words_since_pause = 0
+            continue
+
+        for syllable in range(rng.integers(1, 4)):
+            vowel_start = time + CONSONANT_DURATION
+            vowel_end = vowel_start + VOWEL_DURATION * rng.uniform(0.8, 1.4)
+            phones.append((vowel_start, "t"))
+            phones.append((vowel_end, "a:"))
+            nuclei.append((vowel_start + vowel_end) / 2)
+
+            if rng.random() < 0.3:
+                accents.append((nuclei[-1], "H*L"))
+
+            time = vowel_end
+
+        words.append((time, f"wort{len(words)}"))
+        words_since_pause += 1
+
+        boundary = rng.random()
+        if boundary < 0.15:
+            tones.append((time, "L%"))
+        elif boundary < 0.25:
+            tones.append((time, "H%"))
+        elif boundary < 0.4:
+            tones.append((time, "-"))
+
+    tones.append((time, "L%"))
+
+    signal = synthesize(time + 0.3, sample_rate, f0, phones, accents, pauses, rng)
+
+    wav_file = directory.joinpath(f"{name}.wav")
+    pm.Sound(signal, sample_rate).save(str(wav_file), "WAV")
+
+    for annotation_type, rows in [
+        ("phones", phones),
+        ("words", [(0.05, "[@]")] + words),
+        ("tones", tones),
+        ("accents", accents),
+    ]:
+        write_annotations(directory.joinpath(f"{name}.{annotation_type}"), rows)
+
+    return wav_file, np.array(nuclei)
+
+
+# ANCILLARY FUNCTIONS
+def synthesize(duration, sample_rate, f0, phones, accents, pauses, rng):
+    """
+    Harmonic tone with a declining F0 contour and accent peaks, amplitude-modulated by the syllables.
+    """
+
+    times = np.arange(int(duration * sample_rate)) / sample_rate
+
+    contour = (
+        f0
+        * (1.1 - 0.2 * times / duration)
+        * (1 + 0.05 * np.sin(2 * np.pi * 0.7 * times))
+    )
+    for accent_time, label in accents:
+        contour += 0.25 * f0 * np.exp(-(((times - accent_time) / 0.08) ** 2))
+
+    phase = 2 * np.pi * np.cumsum(contour) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 10))
+    noise = rng.normal(size=times.size)
+
+    signal = 0.002 * noise
+    start = 0.0
+    for end, label in phones:
+        span = (times >= start) & (times < end)
+        position = (times[span] - start) / (end - start)
+        if label == "t":
+            signal[span] += 0.05 * noise[span]
+        else:
+            signal[span] += 0.3 * np.sin(np.pi * position) ** 2 * voiced[span]
+        start = end
+
+    for pause_start, pause_end in pauses:
+        signal[(times >= pause_start) & (times < pause_end)] = (
+            0.002 * noise[(times >= pause_start) & (times < pause_end)]
+        )
+
+    return signal
+
+
+def write_annotations(path, rows):
+    with open(path, "w", encoding="iso-8859-1") as annotation_file:
+        annotation_file.write(HEADER)
+        for time, label in rows:
+            annotation_file.write(f"    {time:.6f}  121 {label}\n")
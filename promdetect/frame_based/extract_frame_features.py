@@ -1,25 +1,29 @@
+import numpy as np
 import pandas as pd
-import parselmouth as pm
 from parselmouth import praat
 
+from promdetect.prep import audio, schemas
+from promdetect.prep.pitch_range import gender_range
+from promdetect.word_based.segmentation import FrameIndexer, NO_INDEX
+
 
 class FrameLevelExtractor:
     """
     Extract raw feature values on the level of short analysis frames (10-15 ms).
     No external information is needed, aside from speaker gender
+    pitch_range: (floor, ceiling) of the pitch analysis, defaults to the range for the speaker gender.
     """
 
-    def __init__(self, wav_file, gender="f", path="features") -> None:
+    def __init__(self, wav_file, gender="f", path="features", pitch_range=None) -> None:
         self.wav_file = wav_file
-        self.snd_obj = pm.Sound(self.wav_file)
+        self.audio = audio.as_wav(wav_file)
         self.gender = gender
         self.features = pd.DataFrame()
         self.path = f"{path}/{wav_file}.frames"
 
-        if gender == "f":
-            self.__pitch_range = (75, 500)
-        else:
-            self.__pitch_range = (50, 300)
+        if pitch_range is None:
+            pitch_range = gender_range(gender)
+        self.__pitch_range = tuple(pitch_range)
 
         # Fixed 10 ms time step for all extraction, but 10 ms vs 15 ms analysis window for female and male speakers, respectively.
         # Accordingly, male speaker analysis windows overlap.
@@ -33,6 +37,43 @@ class FrameLevelExtractor:
 
         self.pitch_extraction()
 
+    @property
+    def snd_obj(self):
+        """
+        Praat sound object of the recording, only built once a Praat analysis needs it.
+        """
+
+        return self.audio.sound()
+
+    def frame_indexer(self):
+        """
+        Indexer for the analysis frames of this extractor, see `Segmenter.add_frame_info()`.
+        """
+
+        return FrameIndexer(
+            self.audio.sample_rate,
+            self.audio.num_samples,
+            self.TIME_STEP,
+            self.__pitch_range[0],
+        )
+
+    def add_word_info(self, words):
+        """
+        Label each frame with the word it lies in.
+        words: Segmented word annotations with frame indices of the same pitch floor, see `Segmenter.add_frame_info()`.
+        """
+
+        word_labels = np.full(len(self.features), np.nan, dtype=object)
+
+        has_frames = (words["start_frame"] != NO_INDEX) & (
+            words["end_frame"] >= words["start_frame"]
+        )
+        for word in words.loc[has_frames].itertuples():
+            word_labels[word.start_frame : word.end_frame + 1] = word.label
+
+        self.features["word"] = word_labels
+        schemas.enforce(self.features, schemas.FRAMES)
+
     def pitch_extraction(self):
         """
         Extract F0 values and strength of pitch candidates for each frame
@@ -53,18 +94,16 @@ class FrameLevelExtractor:
 
         data_to_add = pd.DataFrame(vals_to_add, columns=cols_to_add)
         self.features = pd.concat([self.features, data_to_add])
+        schemas.enforce(self.features, schemas.FRAMES)
 
     def rms_extraction(self):
         """
         Extract root-mean-square (RMS) for each frame
         """
 
-        self.features["rms"] = [
-            self.snd_obj.get_rms(
-                from_time=frame.time, to_time=(frame.time + self.TIME_STEP)
-            )
-            for frame in self.features.itertuples()
-        ]
+        times = self.features["time"].to_numpy(dtype="float64")
+        self.features["rms"] = self.audio.rms(times, times + self.TIME_STEP)
+        schemas.enforce(self.features, schemas.FRAMES)
 
     def loudness_extraction(self):
         """
@@ -88,6 +127,7 @@ class FrameLevelExtractor:
         ]
 
         self.features = self.features.drop(columns="excitation")
+        schemas.enforce(self.features, schemas.FRAMES)
 
     def zcr_extraction(self):
         """
@@ -95,43 +135,20 @@ class FrameLevelExtractor:
         Both negative-to-positive and positive-to-negative crossings are counted.
         """
 
+        times = self.features["time"].to_numpy(dtype="float64")
+
+        # Count sign changes between consecutive samples of each frame's part of the recording,
+        # as Praat's "To PointProcess (zeroes)" on the extracted part
         if (
             self.gender == "f"
         ):  # accommodate for varying window lengths between male and female speakers
-            self.features["snd_part"] = [
-                self.snd_obj.extract_part(
-                    from_time=frame.time, to_time=frame.time + 0.01
-                )
-                for frame in self.features.itertuples()
-            ]
-        else:
-            self.features["snd_part"] = [
-                self.snd_obj.extract_part(
-                    from_time=frame.time, to_time=frame.time + 0.015
-                )
-                for frame in self.features.itertuples()
-            ]
-
-        # Create Praat PointProcess object containing points where zero line is crossed coming from positive or negative area
-        self.features["pp_part"] = [
-            praat.call(frame.snd_part, "To PointProcess (zeroes)", 1, "yes", "yes")
-            for frame in self.features.itertuples()
-        ]
-
-        # normalize rate to female speaker window length
-        # male speaker window length = 1.5x female speaker window length
-        if self.gender == "f":
-            self.features["zcr"] = [
-                praat.call(frame.pp_part, "Get number of points")
-                for frame in self.features.itertuples()
-            ]
+            self.features["zcr"] = self.audio.zero_crossings(times, times + 0.01)
         else:
-            self.features["zcr"] = [
-                praat.call(frame.pp_part, "Get number of points") / 1.5
-                for frame in self.features.itertuples()
-            ]
+            # normalize rate to female speaker window length
+            # male speaker window length = 1.5x female speaker window length
+            self.features["zcr"] = self.audio.zero_crossings(times, times + 0.015) / 1.5
 
-        self.features = self.features.drop(columns=["snd_part", "pp_part"])
+        schemas.enforce(self.features, schemas.FRAMES)
 
     def hnr_extraction(self):
         """
@@ -147,6 +164,7 @@ class FrameLevelExtractor:
             praat.call(self.harm_obj, "Get value in frame", frame.Index)
             for frame in self.features.itertuples()
         ]
+        schemas.enforce(self.features, schemas.FRAMES)
 
     def write_features(self):
         self.features.to_csv(self.path)
@@ -1,18 +1,23 @@
+import json
 from pathlib import Path
 from glob import glob
 from os import chdir
-from json import load
 from promdetect.frame_based.extract_frame_features import FrameLevelExtractor
+from promdetect.prep.process_annotations import SpeakerRegistry
+from promdetect.prep.prepare_data import CFG_FILE
+from promdetect.prep import pitch_range
+from promdetect.prep import instrumentation as instr
 
 """
 Run frame-level feature extraction for all files and store results in files
 """
 
 # Import dictionary containing speaker gender for each recording
-with open(
-    "/home/lukas/Dokumente/Uni/ma_thesis/promdetect/data/dirndl/speakers.json", "r"
-) as speaker_file:
-    SPEAKERS = load(speaker_file)
+SPEAKERS = SpeakerRegistry.from_json()
+
+# Pitch ranges narrowed to the speakers if "adaptive_pitch" is set in the prep configuration
+with open(CFG_FILE, "r") as cfg:
+    PREP_CONFIG = json.load(cfg)
 
 INPUT_PATH = Path(input("Enter directory containing input WAV files: ")).resolve()
 chdir(INPUT_PATH)
@@ -29,7 +34,7 @@ for wav in glob("*.wav"):
     cur_rec += 1
 
     recording = Path(wav).stem
-    gender = SPEAKERS[recording]
+    gender = SPEAKERS.gender(recording)
 
     if Path(f"{OUTPUT_PATH}/{recording}.wav.frames").exists():
         print(f"Skipping recording {recording}")
@@ -37,9 +42,25 @@ for wav in glob("*.wav"):
     else:
         pass
 
-    extractor = FrameLevelExtractor(wav, gender, OUTPUT_PATH)
+    # Opt-in measurements, enabled by the environment variable PROMDETECT_INSTRUMENTATION
+    instrumentation = instr.from_env(recording, "frame")
+
+    with instr.stage(instrumentation, "__init__"):
+        extractor = FrameLevelExtractor(
+            wav,
+            gender,
+            OUTPUT_PATH,
+            pitch_range.recording_range(recording, wav, gender, PREP_CONFIG),
+        )
+    instr.instrument(extractor, instrumentation)
+
     extractor.rms_extraction()
     extractor.loudness_extraction()
     extractor.zcr_extraction()
     extractor.hnr_extraction()
+    # Praat analyses are done, drop the Sound object of the shared recording
+    extractor.audio.release()
     extractor.write_features()
+
+    if instrumentation is not None:
+        instrumentation.write()
@@ -0,0 +1,340 @@
+"""
+Streaming versions of the frame-level feature extraction and the frame CNN, for live input with bounded latency.
+
+`StreamingFrameExtractor` accepts blocks of samples of any size and emits the features of `FrameLevelExtractor`
+for each 10 ms frame as soon as the analysis windows around the frame are complete.
+Pitch, HNR and loudness are computed by Praat on a buffer of recent audio around the new frames,
+RMS and zero-crossing rate directly on the samples.
+Frames lie on a fixed grid from the start of the stream, while `FrameLevelExtractor` centres its frames on the recording,
+so frame times of both differ by less than one time step and values near pitch jumps can differ.
+
+`StreamingFrameClassifier` runs a trained frame CNN on the emitted frames. Its three strided convolutions look
+35 frames ahead, so each output is emitted once those frames are available and equals the output of the CNN on the whole recording.
+
+Example:
+    extractor = StreamingFrameExtractor(16_000, gender="m")
+    classifier = StreamingFrameClassifier(networks.load_model("frame_cnn.pt"))
+    for block in audio_blocks:
+        scores = classifier.push(extractor.push(block))
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import parselmouth as pm
+import torch
+from parselmouth import praat
+
+from promdetect.prep import schemas
+from promdetect.prep.pitch_range import gender_range
+
+# Frame features in the column order of the CNN input
+FRAME_FEATURES = ["f0", "voicing_pr", "rms", "loudness", "zcr", "hnr"]
+
+
+class StreamingFrameExtractor(object):
+    """
+    Frame-level features of an audio stream.
+    sample_rate: Sample rate of the pushed blocks.
+    gender: Speaker gender, determines pitch range and ZCR window as in `FrameLevelExtractor`.
+    pitch_range: (floor, ceiling) of the pitch analysis, defaults to the range for the speaker gender.
+    lookahead: Audio in seconds after a frame's analysis windows that is waited for before the frame is emitted,
+    so the pitch path of the frame does not change anymore.
+    context: Audio in seconds before the new frames included in each analysis.
+    chunk_frames: Number of frames analysed together. Larger chunks need fewer Praat analyses but add to the latency.
+    Chunks are analysed on the same audio span regardless of the block size, so the features do not depend on it.
+    """
+
+    TIME_STEP = 0.01
+
+    def __init__(
+        self,
+        sample_rate,
+        gender="f",
+        pitch_range=None,
+        lookahead=0.05,
+        context=0.15,
+        chunk_frames=5,
+    ):
+        self.sample_rate = sample_rate
+        self.chunk_frames = chunk_frames
+        self.gender = gender
+
+        if pitch_range is None:
+            pitch_range = gender_range(gender)
+        self.pitch_range = tuple(pitch_range)
+
+        # ZCR window as in `FrameLevelExtractor`, normalized to the female window length
+        self.zcr_window = 0.01 if gender == "f" else 0.015
+
+        # Longest analysis window around a frame: cochleagram (0.1 s), harmonicity (4.5 periods) and pitch (2 periods)
+        half_window = max(0.05, 2.25 / self.pitch_range[0], 1 / self.pitch_range[0])
+        self.delay = half_window + lookahead
+        self.context = context + half_window
+        # Shortest sound the Praat analyses accept
+        self.min_duration = 2 * half_window
+
+        # The first frame is the first one with a complete pitch window
+        self.first_time = 1 / self.pitch_range[0]
+
+        self.samples = np.zeros(0)
+        self.buffer_start = 0  # index of the first buffered sample in the stream
+        self.num_frames = 0  # number of frames emitted so far
+
+    @property
+    def latency(self):
+        """
+        Longest time from the end of a frame until it is emitted, not counting the block size and computation.
+        """
+
+        return self.delay + (self.chunk_frames - 1) * self.TIME_STEP
+
+    def push(self, block):
+        """
+        Add a block of samples and return the features of all frames that became final, possibly none.
+        """
+
+        self.samples = np.concatenate(
+            [self.samples, np.asarray(block, dtype="float64")]
+        )
+        num_final = self.num_frames_until(self.stream_end() - self.delay)
+
+        return self.emit(num_final - num_final % self.chunk_frames)
+
+    def flush(self):
+        """
+        Return the remaining frames at the end of the stream.
+        """
+
+        return self.emit(
+            self.num_frames_until(
+                self.stream_end() - max(self.zcr_window, self.TIME_STEP)
+            )
+        )
+
+    def stream_end(self):
+        return (self.buffer_start + len(self.samples)) / self.sample_rate
+
+    def num_frames_until(self, last_time):
+        return max(math.floor((last_time - self.first_time) / self.TIME_STEP) + 1, 0)
+
+    def emit(self, num_final):
+        """
+        Features of the frames before frame `num_final` that have not been emitted yet.
+        """
+
+        chunks = [
+            self.extract_chunk(
+                np.arange(start, min(start + self.chunk_frames, num_final))
+            )
+            for start in range(self.num_frames, num_final, self.chunk_frames)
+        ]
+        if not chunks:
+            return empty_frames()
+
+        self.num_frames = max(num_final, self.num_frames)
+
+        # Samples before the context of the next frame are not needed anymore
+        keep_from = math.floor(
+            (self.frame_time(self.num_frames) - self.context) * self.sample_rate
+        )
+        if keep_from > self.buffer_start:
+            self.samples = self.samples[keep_from - self.buffer_start :]
+            self.buffer_start = keep_from
+
+        return pd.concat(chunks, ignore_index=True)
+
+    def extract_chunk(self, frames):
+        """
+        Features of consecutive frames, analysed on the audio from `context` before the first frame
+        to `delay` after the last frame.
+        At the end of a short stream, the audio for the Praat analyses is padded with silence to `min_duration`.
+        """
+
+        times = self.frame_time(frames)
+
+        segment_start = max(
+            self.buffer_start, math.floor((times[0] - self.context) * self.sample_rate)
+        )
+        segment_end = math.ceil((times[-1] + self.delay) * self.sample_rate)
+        segment = self.samples[
+            segment_start - self.buffer_start : segment_end - self.buffer_start
+        ]
+        padding = max(math.ceil(self.min_duration * self.sample_rate) - len(segment), 0)
+        snd_obj = pm.Sound(
+            np.pad(segment, (0, padding)),
+            sampling_frequency=self.sample_rate,
+            start_time=segment_start / self.sample_rate,
+        )
+
+        features = pd.DataFrame({"time": times})
+        features["f0"], features["voicing_pr"] = self.pitch(snd_obj, times)
+        features["rms"] = self.sample_stats(segment, segment_start, times, "rms")
+        features["loudness"] = self.loudness(snd_obj, times)
+        features["zcr"] = self.sample_stats(segment, segment_start, times, "zcr")
+        features["hnr"] = self.hnr(snd_obj, times)
+
+        return schemas.enforce(features, schemas.FRAMES)
+
+    def frame_time(self, frames):
+        return self.first_time + self.TIME_STEP * frames
+
+    def pitch(self, snd_obj, times):
+        """
+        F0 and strength of the best pitch candidate of the analysis frame nearest to each frame time.
+        """
+
+        pitch_obj = snd_obj.to_pitch_cc(
+            time_step=self.TIME_STEP,
+            pitch_floor=self.pitch_range[0],
+            pitch_ceiling=self.pitch_range[1],
+        )
+        frames = nearest_frames(pitch_obj, times)
+
+        # Maximum strength candidate, as in `FrameLevelExtractor.pitch_extraction()`
+        candidates = pitch_obj.to_array()[:, frames]
+        best = np.argmax(np.nan_to_num(candidates["strength"], nan=-np.inf), axis=0)
+        columns = np.arange(len(frames))
+
+        return (
+            candidates["frequency"][best, columns],
+            candidates["strength"][best, columns],
+        )
+
+    def sample_stats(self, segment, segment_start, times, stat):
+        """
+        RMS over the 10 ms after each frame time, or the number of zero crossings in the ZCR window after it.
+        """
+
+        window = self.TIME_STEP if stat == "rms" else self.zcr_window
+        # Samples whose time lies within the window, as selected by Praat
+        first = np.ceil(times * self.sample_rate - 0.5).astype("int64") - segment_start
+        last = (
+            np.floor((times + window) * self.sample_rate - 0.5).astype("int64")
+            - segment_start
+        )
+
+        values = np.full(len(times), np.nan)
+        for pos in range(len(times)):
+            part = segment[max(first[pos], 0) : last[pos] + 1]
+            if stat == "rms":
+                values[pos] = np.sqrt(np.mean(part * part))
+            else:
+                crossings = np.count_nonzero(
+                    np.signbit(part[1:]) != np.signbit(part[:-1])
+                )
+                values[pos] = crossings if self.gender == "f" else crossings / 1.5
+
+        return values
+
+    def loudness(self, snd_obj, times):
+        cochleagram = praat.call(snd_obj, "To Cochleagram", 0.01, 0.1, 0.03, 0.03)
+
+        return np.array(
+            [
+                praat.call(
+                    praat.call(cochleagram, "To Excitation (slice)", time),
+                    "Get loudness",
+                )
+                for time in times
+            ]
+        )
+
+    def hnr(self, snd_obj, times):
+        harm_obj = snd_obj.to_harmonicity_cc(
+            time_step=self.TIME_STEP, minimum_pitch=self.pitch_range[0]
+        )
+
+        return harm_obj.values[0, nearest_frames(harm_obj, times)]
+
+
+class StreamingFrameClassifier(object):
+    """
+    Running prominence scores of a trained `FrameClassifier` on streamed frame features.
+    Outputs are at the CNN resolution of 8 input frames and are emitted once the 35 input frames after them are available.
+    transform: Function mapping a table of frame features to the (frames x features) CNN input,
+    e.g. the imputation and scaling used for the training data. Defaults to the `FRAME_FEATURES` columns.
+    """
+
+    REDUCTION = 8
+    LOOKAHEAD = 35
+
+    def __init__(self, cnn, transform=None):
+        self.cnn = cnn.eval()
+        self.transform = transform
+        self.inputs = torch.zeros(cnn.num_features, 0)
+        self.inputs_start = 0  # index of the first buffered input frame
+        self.num_outputs = 0  # number of outputs emitted so far
+
+    def push(self, frames):
+        """
+        Add frame features and return the prominence probabilities of all outputs that became final, possibly none.
+        """
+
+        if len(frames) > 0:
+            if self.transform is not None:
+                values = self.transform(frames)
+            else:
+                values = frames[FRAME_FEATURES].to_numpy(dtype="float32")
+            values = torch.as_tensor(np.nan_to_num(values), dtype=torch.float32)
+            self.inputs = torch.cat([self.inputs, values.T], dim=1)
+
+        num_inputs = self.inputs_start + self.inputs.shape[1]
+
+        return self.emit(
+            math.floor((num_inputs - 1 - self.LOOKAHEAD) / self.REDUCTION) + 1
+        )
+
+    def flush(self):
+        """
+        Return the remaining outputs at the end of the stream, padded like the CNN pads a whole recording.
+        """
+
+        num_inputs = self.inputs_start + self.inputs.shape[1]
+
+        return self.emit(math.ceil(num_inputs / self.REDUCTION))
+
+    def emit(self, num_final):
+        if num_final <= self.num_outputs:
+            return np.zeros(0, dtype="float32")
+
+        # Window of input frames covering the receptive fields of the new outputs,
+        # starting on a multiple of the reduction so the strides line up with the whole-recording run
+        window_start = max(self.REDUCTION * self.num_outputs - self.LOOKAHEAD - 5, 0)
+        window_start -= window_start % self.REDUCTION
+        window = self.inputs[:, window_start - self.inputs_start :]
+
+        with torch.inference_mode():
+            logits = self.cnn.frame_logits(window.unsqueeze(0))[0, :, 0]
+
+        first = self.num_outputs - window_start // self.REDUCTION
+        probs = torch.sigmoid(logits[first : first + num_final - self.num_outputs])
+        self.num_outputs = num_final
+
+        # Keep the input frames needed for the left context of the next outputs
+        keep_from = max(self.REDUCTION * self.num_outputs - self.LOOKAHEAD - 5, 0)
+        keep_from -= keep_from % self.REDUCTION
+        if keep_from > self.inputs_start:
+            self.inputs = self.inputs[:, keep_from - self.inputs_start :]
+            self.inputs_start = keep_from
+
+        return probs.numpy()
+
+
+# ANCILLARY FUNCTIONS
+def nearest_frames(sampled, times):
+    """
+    Index of the frame of a Praat Pitch or Harmonicity object nearest to each time.
+    """
+
+    frames = np.round((np.asarray(times) - sampled.x1) / sampled.dx).astype("int64")
+
+    return np.clip(frames, 0, sampled.nx - 1)
+
+
+def empty_frames():
+    return schemas.enforce(
+        pd.DataFrame(columns=["time"] + FRAME_FEATURES, dtype="float64"),
+        schemas.FRAMES,
+    )
@@ -0,0 +1,285 @@
+"""
+Accelerated inference modes for the trained classifiers, the packaged versions of the notebook networks (see `networks.py`).
+
+- "eager": float32 eager mode, as the networks were trained.
+- "bf16": the network runs under bfloat16 autocast, convolutions, dense layers and LSTMs compute in bfloat16.
+  The LSTMs are replaced by `PaddedLSTM`, which runs on padded instead of packed sequences,
+  as only those are handled by the fused oneDNN RNN kernel on the CPU. Outputs are returned in float32.
+- "compile": as "bf16", with the convolution stack of the frame CNN compiled by `torch.compile()`.
+
+Lower precision changes the outputs slightly, so `parity()` compares an accelerated model with the float32 model
+on the validation set of its training configuration before it is put to use.
+
+Usage: promdetect-accelerate nucleus promdetect/models/model_store/nucleus_level/model-12_epoch-49_f1-0.640.pt --mode bf16
+"""
+
+import argparse
+import contextlib
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.metrics import f1_score
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+from promdetect.models import networks, training
+
+MODES = ["eager", "bf16", "compile"]
+
+
+class AcceleratedModel(nn.Module):
+    """
+    Network wrapper that runs the forward pass in one of the MODES and returns float32 outputs.
+    model: Trained network in evaluation mode, it is prepared for the mode in place (see `prepare()`).
+    backend: Backend of `torch.compile()`.
+    """
+
+    def __init__(self, model, mode="bf16", backend="inductor"):
+        super(AcceleratedModel, self).__init__()
+
+        if mode not in MODES:
+            raise ValueError(f"Argument 'mode' must be one of {MODES}")
+
+        self.model = prepare(model, mode, backend)
+        self.mode = mode
+
+    def forward(self, *inputs):
+        device = next(self.model.parameters()).device
+
+        with autocast(self.mode, device):
+            outputs = self.model(*inputs)
+
+        return to_float(outputs)
+
+
+class PaddedLSTM(nn.Module):
+    """
+    Inference replacement for a (bidirectional) LSTM on packed sequences, with the same weights.
+    Each layer and direction runs on the padded batch, the backward direction on the sequences reversed within their lengths,
+    so padding never precedes valid positions and the results equal those of the packed LSTM.
+    Returns the packed output and the final hidden states; cell states are not kept and returned as None.
+    """
+
+    def __init__(self, lstm):
+        super(PaddedLSTM, self).__init__()
+
+        if not lstm.batch_first:
+            raise ValueError("Only batch-first LSTMs can be replaced")
+
+        self.num_layers = lstm.num_layers
+        self.num_directions = 2 if lstm.bidirectional else 1
+
+        names = (
+            ["weight_ih", "weight_hh", "bias_ih", "bias_hh"]
+            if lstm.bias
+            else ["weight_ih", "weight_hh"]
+        )
+
+        # One single-layer, unidirectional LSTM per layer and direction
+        self.cells = nn.ModuleList()
+        for layer in range(lstm.num_layers):
+            input_size = (
+                lstm.input_size
+                if layer == 0
+                else lstm.hidden_size * self.num_directions
+            )
+            for suffix in ["", "_reverse"][: self.num_directions]:
+                cell = nn.LSTM(
+                    input_size, lstm.hidden_size, bias=lstm.bias, batch_first=True
+                )
+                cell.load_state_dict(
+                    {
+                        f"{name}_l0": getattr(lstm, f"{name}_l{layer}{suffix}")
+                        for name in names
+                    }
+                )
+                self.cells.append(cell)
+
+    def forward(self, inputs):
+        x, lengths = pad_packed_sequence(inputs, batch_first=True)
+        reverse = reverse_index(lengths, x.shape[1]).to(x.device)
+        batch = torch.arange(len(lengths), device=x.device)
+        last = (lengths - 1).to(x.device)
+
+        hidden = []
+        for layer in range(self.num_layers):
+            outputs = []
+            for direction in range(self.num_directions):
+                cell = self.cells[layer * self.num_directions + direction]
+                cell_input = x if direction == 0 else reverse_within(x, reverse)
+
+                out, discard = cell(cell_input)
+                # The last valid step, also in reversed time for the backward direction
+                hidden.append(out[batch, last])
+
+                outputs.append(out if direction == 0 else reverse_within(out, reverse))
+            x = torch.cat(outputs, dim=2)
+
+        packed = pack_padded_sequence(
+            x, lengths, batch_first=True, enforce_sorted=False
+        )
+
+        return packed, (torch.stack(hidden), None)
+
+
+def prepare(model, mode="bf16", backend="inductor"):
+    """
+    Prepare a network in place for an accelerated mode: batch-first LSTMs are replaced by `PaddedLSTM`,
+    in "compile" mode the convolution stack of a frame CNN, on its own or within a CNN+LSTM model, is compiled.
+    Networks are returned unchanged in "eager" mode.
+    """
+
+    if mode == "eager":
+        return model
+
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, nn.LSTM) and child.batch_first:
+                setattr(module, name, PaddedLSTM(child))
+
+    if mode != "compile":
+        return model
+
+    for module in model.modules():
+        if isinstance(module, networks.FrameClassifier):
+            # Utterances differ in length, so the graph is compiled for dynamic shapes
+            module.frame_logits = torch.compile(
+                module.frame_logits, backend=backend, dynamic=True
+            )
+
+    return model
+
+
+def autocast(mode, device):
+    """
+    Context to run a network prepared for `mode` in, bfloat16 autocast for the accelerated modes.
+    """
+
+    if mode == "eager":
+        return contextlib.nullcontext()
+
+    return torch.autocast(torch.device(device).type, dtype=torch.bfloat16)
+
+
+def parity(trainer, network, mode="bf16", backend="inductor", min_agreement=0.99):
+    """
+    Compare a network in an accelerated mode with the float32 network on the validation set of `trainer`.
+    Returns the largest probability difference, the share of identical decisions and the F1 scores of the prominent class.
+    The accelerated mode passes if at least `min_agreement` of the decisions are identical.
+    """
+
+    network = network.to(trainer.device).eval()
+    reference, labels = validation_probs(trainer, network, "eager")
+
+    # The CNN of the CNN+LSTM model is part of the model definition, not of the trained network
+    for module in [network, getattr(trainer.definition, "cnn", None)]:
+        if module is not None:
+            prepare(module, mode, backend)
+    accelerated, discard = validation_probs(trainer, network, mode)
+
+    agreement = np.mean((reference > 0.5) == (accelerated > 0.5))
+
+    return {
+        "mode": mode,
+        "max_abs_diff": float(np.abs(reference - accelerated).max()),
+        "agreement": float(agreement),
+        "f1_eager": f1_score(labels, reference > 0.5, zero_division=0),
+        f"f1_{mode}": f1_score(labels, accelerated > 0.5, zero_division=0),
+        "passed": bool(agreement >= min_agreement),
+    }
+
+
+# ANCILLARY FUNCTIONS
+def reverse_index(lengths, total_length):
+    """
+    Time index that reverses each sequence of a padded batch within its length, padding stays in place.
+    """
+
+    steps = torch.arange(total_length).unsqueeze(0)
+    lengths = lengths.unsqueeze(1)
+
+    return torch.where(steps < lengths, lengths - 1 - steps, steps)
+
+
+def reverse_within(x, index):
+    return x.gather(1, index.unsqueeze(2).expand(-1, -1, x.shape[2]))
+
+
+def to_float(outputs):
+    if isinstance(outputs, tuple):
+        return tuple(to_float(output) for output in outputs)
+    if torch.is_tensor(outputs) and outputs.is_floating_point():
+        return outputs.float()
+
+    return outputs
+
+
+def validation_probs(trainer, network, mode):
+    """
+    Probabilities and labels of all valid positions of the validation set of `trainer`, predicted in `mode`.
+    """
+
+    network.eval()
+    val_loader = trainer.build_loader(trainer.val_set, shuffle=False)
+
+    probs = []
+    labels = []
+    with torch.inference_mode():
+        for batch in val_loader:
+            with autocast(mode, trainer.device):
+                preds, batch_labels, lengths = trainer.definition.run_batch(
+                    network, batch, trainer.device
+                )
+
+            preds = torch.sigmoid(preds.float()).reshape(preds.shape[0], -1).cpu()
+            batch_labels = batch_labels.reshape(batch_labels.shape[0], -1).cpu()
+            for i, length in enumerate(lengths):
+                probs.append(preds[i, :length].numpy())
+                labels.append(batch_labels[i, :length].numpy() > 0.5)
+
+    return np.concatenate(probs), np.concatenate(labels)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Check the accuracy of a trained classifier in an accelerated inference mode."
+    )
+    parser.add_argument("model_name", choices=list(training.MODEL_DEFINITIONS))
+    parser.add_argument(
+        "model", help="Trained model, the word-level LSTM for the CNN+LSTM model"
+    )
+    parser.add_argument("--mode", choices=MODES[1:], default="bf16")
+    parser.add_argument("--backend", default="inductor", help="torch.compile backend")
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--config", default=str(training.CFG_FILE))
+    parser.add_argument("--data-dir", help="Directory containing the data sets")
+    parser.add_argument("--cnn-model", help="Trained CNN for the CNN+LSTM model")
+    parser.add_argument("--device", help="e.g. 'cpu' or 'cuda:0', default: auto")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    config = training.load_config(args.config)
+
+    for key in ["data_dir", "device"]:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    if args.cnn_model is not None:
+        config["models"][args.model_name]["cnn_model"] = args.cnn_model
+
+    trainer = training.Trainer(config, args.model_name)
+    network = networks.load_model(args.model, trainer.device)
+
+    results = parity(trainer, network, args.mode, args.backend, args.min_agreement)
+
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+    if not results["passed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
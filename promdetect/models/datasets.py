@@ -0,0 +1,202 @@
+"""
+Loading and batching of the training sets for the prominence classifiers.
+
+All sets are stored as object arrays in `.npy` files, containing one array per recording (nucleus level) or utterance (frame and word level).
+Sets written by `prep.build_sets` store all rows in one array instead, with the first row of each sequence in an `<name>_offsets.npy` file.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import torch
+from sklearn.model_selection import train_test_split
+from torch.nn.utils.rnn import pad_sequence
+from torch.utils.data import Dataset
+
+
+def load_set(data_dir, file):
+    """
+    Load a ragged data set from a `.npy` file, relative paths are resolved against `data_dir`.
+    Sets with an offsets file are memory-mapped and returned as an object array of views on the rows of each sequence.
+    """
+
+    path = Path(data_dir).joinpath(file)
+    offsets_file = path.with_name(f"{path.stem}_offsets.npy")
+
+    if not offsets_file.exists():
+        return np.load(path, allow_pickle=True)
+
+    rows = np.load(path, mmap_mode="r")
+    offsets = np.load(offsets_file)
+
+    sequences = np.empty(len(offsets) - 1, dtype=object)
+    for i in range(len(sequences)):
+        sequences[i] = rows[offsets[i] : offsets[i + 1]]
+
+    return sequences
+
+
+def split_sets(*sets, test_size=0.2, random_state=1):
+    """
+    Split all sets into training and validation parts, using the split of the thesis models.
+    Returns a tuple of training sets and a tuple of validation sets.
+    """
+
+    split = train_test_split(*sets, test_size=test_size, random_state=random_state)
+
+    return tuple(split[0::2]), tuple(split[1::2])
+
+
+def to_tensor(data_list):
+    return [torch.FloatTensor(np.asarray(data, dtype="float64")) for data in data_list]
+
+
+def seq_lengths(data_list):
+    return torch.tensor([len(data) for data in data_list], dtype=torch.int64)
+
+
+class SequenceDataset(Dataset):
+    """
+    Padded sequences of feature vectors and binary labels, one sequence per item.
+    Items are (features, labels, length) tuples, so sequence lengths need not be inferred from the padding.
+    """
+
+    def __init__(self, features, labels, total_length=None):
+        self.lengths = seq_lengths(features)
+
+        self.features = pad_sequence(to_tensor(features), batch_first=True)
+        self.labels = pad_sequence(to_tensor(labels), batch_first=True)
+
+        if total_length is not None:
+            self.features = pad_to(self.features, total_length, dim=1)
+            self.labels = pad_to(self.labels, total_length, dim=1)
+
+    def __getitem__(self, index):
+        return self.features[index], self.labels[index], self.lengths[index]
+
+    def __len__(self):
+        return len(self.features)
+
+    @property
+    def num_features(self):
+        return self.features.shape[2]
+
+    @property
+    def total_length(self):
+        return self.features.shape[1]
+
+
+class FrameWordDataset(Dataset):
+    """
+    Frame-level features and labels with word timetables, word-level features and word labels for each utterance.
+    half_times: Number of times the frame labels are halved in length, to match the resolution of the CNN output.
+    """
+
+    def __init__(
+        self,
+        features,
+        labels,
+        times,
+        words,
+        words_labels,
+        half_times=3,
+        total_words=None,
+    ):
+        self.half_times = half_times
+
+        # Convert feature inputs to tensors, pad with zeroes to make them rectangular
+        self.features_input = pad_sequence(
+            to_tensor(features), batch_first=True
+        ).permute(0, 2, 1)
+
+        # Reduce label sizes to the size that can be expected at system output
+        labels_input = pad_sequence(to_tensor(labels), batch_first=True)
+        for i in range(self.half_times):
+            labels_input = labels_input[:, halving_mask(labels_input.shape[1])]
+        self.labels_input = labels_input.unsqueeze(2)
+
+        # Number of valid output frames per utterance
+        self.frames_lengths = seq_lengths(labels)
+        for i in range(self.half_times):
+            self.frames_lengths = (self.frames_lengths + 1) // 2
+
+        # Frame indices of the word spans, reduced to the output resolution
+        self.times_input = pad_sequence(to_tensor(times), batch_first=True) // (
+            2**self.half_times
+        )
+
+        self.words_input = pad_sequence(to_tensor(words), batch_first=True)
+        self.words_labels_input = pad_sequence(
+            to_tensor(words_labels), batch_first=True
+        ).unsqueeze(2)
+        self.words_lengths = seq_lengths(words)
+
+        if total_words is not None:
+            self.times_input = pad_to(self.times_input, total_words, dim=1)
+            self.words_input = pad_to(self.words_input, total_words, dim=1)
+            self.words_labels_input = pad_to(
+                self.words_labels_input, total_words, dim=1
+            )
+
+    def __len__(self):
+        return len(self.labels_input)
+
+    def __getitem__(self, idx):
+        sample = {
+            "features": self.features_input[idx],
+            "labels": self.labels_input[idx],
+            "times": self.times_input[idx],
+            "words": self.words_input[idx],
+            "words_labels": self.words_labels_input[idx],
+            "frames_lengths": self.frames_lengths[idx],
+            "words_lengths": self.words_lengths[idx],
+        }
+
+        return sample
+
+    @property
+    def num_features(self):
+        return self.features_input.shape[1]
+
+    @property
+    def num_word_features(self):
+        return self.words_input.shape[2]
+
+    @property
+    def total_words(self):
+        return self.words_labels_input.shape[1]
+
+
+# ANCILLARY FUNCTIONS
+def halving_mask(length):
+    """
+    Boolean mask that drops every second element of a sequence, starting with the first one.
+    The last element is kept for sequences of odd length, so the result has the length of a stride-2 convolution output.
+    """
+
+    keep = np.ones(length, dtype=bool)
+    keep[np.arange(0, length - 1, 2)] = False
+
+    return torch.from_numpy(keep)
+
+
+def pad_to(tensor, length, dim=1):
+    """
+    Zero-pad a tensor along `dim` to `length`.
+    """
+
+    missing = length - tensor.shape[dim]
+
+    if missing < 0:
+        raise ValueError(
+            "Data is longer ({}) than the requested length ({}).".format(
+                tensor.shape[dim], length
+            )
+        )
+    elif missing == 0:
+        return tensor
+
+    pad_shape = list(tensor.shape)
+    pad_shape[dim] = missing
+
+    return torch.cat([tensor, tensor.new_zeros(pad_shape)], dim=dim)
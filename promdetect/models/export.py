@@ -0,0 +1,221 @@
+"""
+Export of trained classifiers to TorchScript or ONNX, to be loaded with `promdetect.models.runtime`.
+
+The exported graphs take padded tensors and sequence lengths instead of packed sequences,
+so they can be run without the network definitions in `networks.py`.
+Both stages of the CNN+LSTM model are exported as one graph.
+A `meta.json` file describing the exported files is written next to them.
+
+Usage: promdetect-export nucleus model.pt exported/nucleus --format onnx
+       promdetect-export cnn_lstm word_lstm.pt exported/cnn_lstm --cnn-model frame_cnn.pt
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+from promdetect.models import networks
+
+FORMATS = {"torchscript": ".pt", "onnx": ".onnx"}
+
+# Factor by which the frame CNN reduces the time resolution
+FRAME_REDUCTION = 8
+
+
+class NucleusExport(nn.Module):
+    """
+    Nucleus-level classifier on padded input.
+    Input: (batch x nuclei x features) feature tensor and the number of nuclei per recording.
+    Output: (batch x nuclei) prominence probabilities.
+    """
+
+    def __init__(self, model):
+        super(NucleusExport, self).__init__()
+
+        dense_layers = model.dense_layers()
+
+        self.lstm_1 = model.lstm_1
+        self.hidden = nn.ModuleList(dense_layers[:-1])
+        self.output = dense_layers[-1]
+
+    def forward(self, inputs, lengths):
+        packed = pack_padded_sequence(
+            inputs, lengths, batch_first=True, enforce_sorted=False
+        )
+        lstm_out, discard = self.lstm_1(packed)
+        x, discard_lengths = pad_packed_sequence(
+            lstm_out, batch_first=True, total_length=inputs.shape[1]
+        )
+
+        x = torch.relu(x)
+        for dense in self.hidden:
+            x = torch.relu(dense(x))
+        x = self.output(x)
+
+        return torch.sigmoid(x.squeeze(2))
+
+
+class CNNLSTMExport(nn.Module):
+    """
+    Both stages of the CNN+LSTM model on padded input, see `networks.CNNLSTMClassifier`.
+    Input: (batch x features x frames) frame features, (batch x words x 2) first and last frame of each word,
+    (batch x words x features) word-level features and the number of words per utterance.
+    Output: (batch x words) prominence probabilities.
+    """
+
+    def __init__(self, cnn, lstm):
+        super(CNNLSTMExport, self).__init__()
+
+        self.model = networks.CNNLSTMClassifier(cnn, lstm)
+        self.reduction = FRAME_REDUCTION
+
+    def forward(self, frames, times, words, lengths):
+        x = self.model(frames, times // self.reduction, words, lengths)
+
+        return torch.sigmoid(x.squeeze(2))
+
+
+def export_module(module, example_inputs, path, fmt, input_names, dynamic_axes):
+    """
+    Write a module in evaluation mode to TorchScript or ONNX.
+    dynamic_axes: Names of the variable-size axes for each input and the output, see `torch.onnx.export()`.
+    """
+
+    module = module.eval()
+
+    if fmt == "torchscript":
+        torch.jit.save(torch.jit.script(module), str(path))
+    elif fmt == "onnx":
+        torch.onnx.export(
+            module,
+            example_inputs,
+            str(path),
+            input_names=input_names,
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    else:
+        raise ValueError("Format must be one of {}".format(", ".join(FORMATS)))
+
+
+def export_nucleus(model, out_dir, fmt="torchscript"):
+    """
+    Export a nucleus-level classifier to `out_dir`.
+    """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model_file = "model" + FORMATS.get(fmt, "")
+
+    export_module(
+        NucleusExport(model),
+        (torch.zeros(2, 10, model.num_features), torch.tensor([10, 6])),
+        out_dir.joinpath(model_file),
+        fmt,
+        ["inputs", "lengths"],
+        {
+            "inputs": {0: "batch", 1: "nuclei"},
+            "lengths": {0: "batch"},
+            "output": {0: "batch", 1: "nuclei"},
+        },
+    )
+
+    meta = {
+        "model": "nucleus",
+        "format": fmt,
+        "files": {"model": model_file},
+        "num_features": model.num_features,
+    }
+    write_meta(meta, out_dir)
+
+    return meta
+
+
+def export_cnn_lstm(cnn, lstm, out_dir, fmt="torchscript"):
+    """
+    Export the CNN+LSTM model as a single graph to `out_dir`.
+    The word-level features are used if the LSTM input is larger than the single summed CNN prediction.
+    """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model_file = "model" + FORMATS.get(fmt, "")
+    num_word_features = lstm.num_features - 1
+
+    export_module(
+        CNNLSTMExport(cnn, lstm),
+        (
+            torch.zeros(2, cnn.num_features, 64),
+            torch.tensor([[[0, 20], [21, 60]], [[0, 30], [0, 0]]]),
+            torch.zeros(2, 2, num_word_features),
+            torch.tensor([2, 1]),
+        ),
+        out_dir.joinpath(model_file),
+        fmt,
+        ["frames", "times", "words", "lengths"],
+        {
+            "frames": {0: "batch", 2: "frames"},
+            "times": {0: "batch", 1: "words"},
+            "words": {0: "batch", 1: "words"},
+            "lengths": {0: "batch"},
+            "output": {0: "batch", 1: "words"},
+        },
+    )
+
+    meta = {
+        "model": "cnn_lstm",
+        "format": fmt,
+        "files": {"model": model_file},
+        "num_features": cnn.num_features,
+        "num_word_features": num_word_features,
+    }
+    write_meta(meta, out_dir)
+
+    return meta
+
+
+# ANCILLARY FUNCTIONS
+def write_meta(meta, out_dir):
+    with open(Path(out_dir).joinpath("meta.json"), "w") as meta_file:
+        json.dump(meta, meta_file, indent=4)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Export a trained classifier to TorchScript or ONNX."
+    )
+    parser.add_argument("model_type", choices=["nucleus", "cnn_lstm"])
+    parser.add_argument(
+        "model", help="Trained model, the word-level LSTM for the CNN+LSTM model"
+    )
+    parser.add_argument("out_dir")
+    parser.add_argument("--cnn-model", help="Trained frame CNN for the CNN+LSTM model")
+    parser.add_argument("--format", choices=list(FORMATS), default="torchscript")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    model = networks.load_model(args.model).eval()
+
+    if args.model_type == "nucleus":
+        meta = export_nucleus(model, args.out_dir, args.format)
+    else:
+        if not args.cnn_model:
+            raise ValueError("The CNN+LSTM model requires a trained CNN (--cnn-model).")
+        cnn = networks.load_model(args.cnn_model).eval()
+        meta = export_cnn_lstm(cnn, model, args.out_dir, args.format)
+
+    print("Exported {} to {}".format(meta["files"]["model"], args.out_dir))
+
+
+if __name__ == "__main__":
+    main()
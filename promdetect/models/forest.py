@@ -0,0 +1,261 @@
+"""
+Random forest baseline for the nucleus level, packaged from `nucleus_level/random_forest_nucleus.py`.
+
+Trees are built on all cores (n_jobs=-1). With a chunk size, the forest is grown out of core:
+consecutive sequences of the (memory-mapped) training set are read in chunks of at least `chunk_size` rows,
+and each chunk adds a batch of warm-started trees, so only one chunk is held in memory at a time.
+Each chunk contributes trees in proportion to its number of rows, and each tree is bootstrapped from its own chunk only.
+
+Predictions are made in batches of rows, each batch is run through the trees in parallel.
+
+Usage: promdetect-train-forest --data-dir data/features --chunk-size 200000 --num-jobs -1
+"""
+
+import argparse
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report
+
+from promdetect.models import datasets, training
+
+MODEL_NAME = "random_forest"
+
+
+class NucleusForest(object):
+    """
+    Random forest classifier for the syllable nuclei, with the hyperparameters of the thesis model.
+    n_jobs: Number of parallel jobs for training and prediction, -1 to use all cores.
+    batch_size: Number of rows predicted at once, bounds the memory used by the per-tree predictions.
+    """
+
+    def __init__(
+        self,
+        n_estimators=200,
+        criterion="entropy",
+        min_samples_split=2,
+        min_samples_leaf=2,
+        random_state=1,
+        n_jobs=-1,
+        batch_size=65536,
+    ):
+        self.n_estimators = n_estimators
+        self.batch_size = batch_size
+
+        self.model = RandomForestClassifier(
+            n_estimators=n_estimators,
+            criterion=criterion,
+            min_samples_split=min_samples_split,
+            min_samples_leaf=min_samples_leaf,
+            random_state=random_state,
+            n_jobs=n_jobs,
+            warm_start=True,
+        )
+
+    def fit(self, features, labels, chunk_size=None):
+        """
+        Train the forest on sequences of (rows x features) and (rows) arrays, e.g. sets from `datasets.load_set()`.
+        chunk_size: Minimum number of rows per chunk, none to train on all rows at once.
+        """
+
+        lengths = np.array([len(seq) for seq in labels])
+        bounds = chunk_bounds(lengths, chunk_size)
+
+        # Trees are spread over the chunks by their share of the rows
+        rows = np.concatenate([[0], np.cumsum(lengths)])[bounds]
+        trees = np.round(self.n_estimators * rows / rows[-1]).astype(int)
+
+        # Start from an untrained forest, which the chunks extend
+        self.model = clone(self.model)
+        classes = None
+
+        for first, last, num_trees in zip(bounds[:-1], bounds[1:], trees[1:]):
+            if num_trees == len(getattr(self.model, "estimators_", [])):
+                continue
+
+            chunk_features = np.concatenate(features[first:last]).astype(
+                "float32", copy=False
+            )
+            chunk_labels = np.concatenate(labels[first:last])
+
+            # Trees of a warm-started forest must all know the same classes
+            chunk_classes = np.unique(chunk_labels)
+            if classes is None:
+                classes = chunk_classes
+            elif not np.array_equal(classes, chunk_classes):
+                raise ValueError(
+                    f"Sequences {first} to {last} do not contain all classes, use a larger chunk size"
+                )
+
+            self.model.set_params(n_estimators=num_trees)
+            self.model.fit(chunk_features, chunk_labels)
+
+        return self
+
+    def predict_proba(self, features):
+        """
+        Probability of the prominent class for each row of a (rows x features) array.
+        """
+
+        probs = np.empty(len(features), dtype="float64")
+        for start in range(0, len(features), self.batch_size):
+            batch = np.asarray(
+                features[start : start + self.batch_size], dtype="float32"
+            )
+            probs[start : start + len(batch)] = self.model.predict_proba(batch)[:, -1]
+
+        return probs
+
+    def predict(self, features, threshold=0.5):
+        """
+        Binary prominence label for each row of a (rows x features) array.
+        """
+
+        return (self.predict_proba(features) > threshold).astype("int8")
+
+    def predict_sequences(self, sequences):
+        """
+        Prominence probabilities for sequences of (rows x features) arrays, predicted in batches of whole sequences.
+        Returns an object array with one array of probabilities per sequence.
+        """
+
+        lengths = np.array([len(seq) for seq in sequences])
+        bounds = chunk_bounds(lengths, self.batch_size)
+
+        probs = np.empty(len(sequences), dtype=object)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            batch_probs = self.predict_proba(np.concatenate(sequences[first:last]))
+            splits = np.cumsum(lengths[first:last])[:-1]
+            for i, seq_probs in enumerate(np.split(batch_probs, splits)):
+                probs[first + i] = seq_probs
+
+        return probs
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+# ANCILLARY FUNCTIONS
+def chunk_bounds(lengths, chunk_size=None):
+    """
+    Boundaries of the runs of consecutive sequences with at least `chunk_size` rows each, including 0 and the number of sequences.
+    The last run may be shorter, without a chunk size all sequences form one run.
+    """
+
+    if chunk_size is None:
+        return np.array([0, len(lengths)])
+    if chunk_size < 1:
+        raise ValueError("Argument 'chunk_size' must be positive")
+
+    bounds = [0]
+    rows = 0
+    for i, length in enumerate(lengths, start=1):
+        rows += length
+        if rows >= chunk_size:
+            bounds.append(i)
+            rows = 0
+
+    if bounds[-1] != len(lengths):
+        bounds.append(len(lengths))
+
+    return np.array(bounds)
+
+
+def evaluate(forest, features, labels, eval_file=None):
+    """
+    Classification report of the forest on a validation set, optionally written to `eval_file`.
+    """
+
+    preds = (np.concatenate(forest.predict_sequences(features)) > 0.5).astype("int8")
+    report = classification_report(np.concatenate(labels), preds, digits=4)
+
+    if eval_file is not None:
+        Path(eval_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(eval_file, "w") as reportfile:
+            reportfile.write(report)
+
+    return report
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Train and evaluate the nucleus-level random forest."
+    )
+    parser.add_argument("--config", default=str(training.CFG_FILE))
+    parser.add_argument("--data-dir", help="Directory containing the data sets")
+    parser.add_argument("--model-store", help="Directory to store the forest in")
+    parser.add_argument("--eval-dir", help="Directory to write evaluation reports to")
+    parser.add_argument("--n-estimators", type=int)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Grow the forest from chunks of at least this many rows, default: all rows at once",
+    )
+    parser.add_argument("--batch-size", type=int, help="Rows predicted at once")
+    parser.add_argument("--num-jobs", type=int, help="Parallel jobs, -1 for all cores")
+    parser.add_argument(
+        "--evaluate", metavar="MODEL_FILE", help="Only evaluate a stored forest"
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    config = training.load_config(args.config)
+
+    for key in ["data_dir", "model_store", "eval_dir"]:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    cfg = config["models"][MODEL_NAME]
+    for key, arg in [
+        ("n_estimators", "n_estimators"),
+        ("chunk_size", "chunk_size"),
+        ("batch_size", "batch_size"),
+        ("n_jobs", "num_jobs"),
+    ]:
+        if getattr(args, arg) is not None:
+            cfg[key] = getattr(args, arg)
+
+    train, val = datasets.split_sets(
+        datasets.load_set(config["data_dir"], cfg["features"]),
+        datasets.load_set(config["data_dir"], cfg["labels"]),
+    )
+
+    if args.evaluate:
+        forest = NucleusForest.load(args.evaluate)
+        model_file = Path(args.evaluate)
+    else:
+        forest = NucleusForest(
+            cfg["n_estimators"],
+            cfg["criterion"],
+            cfg["min_samples_split"],
+            cfg["min_samples_leaf"],
+            cfg["random_state"],
+            cfg["n_jobs"],
+            cfg["batch_size"],
+        )
+        forest.fit(*train, chunk_size=cfg.get("chunk_size"))
+
+        model_file = Path(config["model_store"]).joinpath(
+            cfg["store"], f"model-{MODEL_NAME}-est_{cfg['n_estimators']}.joblib"
+        )
+        model_file.parent.mkdir(parents=True, exist_ok=True)
+        forest.save(model_file)
+
+    eval_file = Path(config["eval_dir"]).joinpath(
+        cfg["store"], "eval", f"{model_file.stem}.txt"
+    )
+    print(evaluate(forest, *val, eval_file=eval_file))
+
+
+if __name__ == "__main__":
+    main()
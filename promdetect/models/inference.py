@@ -0,0 +1,194 @@
+"""
+Prominence prediction for new recordings with a trained nucleus-level model.
+
+Each recording needs a WAV file with phone, word and tone annotations in DIRNDL format next to it, i.e. `<recording>.phones` etc.
+Syllable nuclei are detected and their features extracted as for the training data (see `promdetect.prep`),
+then the recordings are run through the model in batches.
+
+Usage: promdetect-predict model.pt recording1.wav recording2.wav --gender m --batch-size 8 --threads 4 --mode bf16
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, pad_sequence
+
+from promdetect.models import acceleration, networks
+from promdetect.prep import prepare_data, process_features
+
+
+class NucleusPredictor(object):
+    """
+    Predict per-nucleus prominence probabilities with a nucleus-level model.
+    model_file: Model stored by the training engine or one of the notebooks.
+    config: Feature extraction configuration, defaults to `promdetect/prep/config.json`.
+    batch_size: Number of recordings run through the model at once.
+    num_threads: Number of recordings prepared in parallel.
+    mode: Inference mode of the model, see `acceleration.MODES`.
+    """
+
+    def __init__(
+        self,
+        model_file,
+        config=None,
+        device="cpu",
+        batch_size=8,
+        num_threads=1,
+        mode="eager",
+    ):
+        if config is None:
+            with open(prepare_data.CFG_FILE, "r") as cfg:
+                config = json.load(cfg)
+
+        self.config = dict(config, accents=False, find_nuclei=True)
+        self.device = torch.device(device)
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+
+        self.model = networks.load_model(model_file, self.device).eval()
+        # Pad to the longest recording in each batch
+        self.model.total_length = None
+
+        if mode != "eager":
+            self.model = acceleration.AcceleratedModel(self.model, mode)
+
+    def prepare(self, wav_file, gender="f"):
+        """
+        Detect the syllable nuclei in a recording and extract their feature vectors.
+        Returns the nucleus table, the model input and the time spent.
+        """
+
+        start = time.perf_counter()
+
+        wav_file = Path(wav_file)
+        config = dict(self.config, directory=str(wav_file.parent))
+
+        feature_set = prepare_data.FeatureSet(
+            config, wav_file.stem, speaker=("unknown", gender)
+        )
+        features = feature_set.run_config()
+        nuclei, sequence = process_features.to_sequence(features, gender)
+
+        return nuclei, torch.from_numpy(sequence), time.perf_counter() - start
+
+    def predict_sequences(self, sequences):
+        """
+        Run a batch of nucleus feature sequences through the model.
+        Returns one array of prominence probabilities per sequence.
+        """
+
+        lengths = torch.tensor([len(seq) for seq in sequences], dtype=torch.int64)
+
+        with torch.inference_mode():
+            inputs = pad_sequence(sequences, batch_first=True).to(self.device)
+            inputs = pack_padded_sequence(
+                inputs, lengths, batch_first=True, enforce_sorted=False
+            )
+            probs = torch.sigmoid(self.model(inputs)).squeeze(2).cpu()
+
+        return [probs[i, : lengths[i]].numpy() for i in range(len(sequences))]
+
+    def predict(self, wav_files, genders=None):
+        """
+        Predict prominence for all nuclei in the given recordings.
+        genders: Speaker gender per recording ("f" or "m"), defaults to "f" for all.
+        Returns a dictionary mapping each recording to its nucleus table with an added "prominence" column
+        and a dictionary with the latency in seconds for each recording.
+        """
+
+        if genders is None:
+            genders = ["f"] * len(wav_files)
+
+        results = {}
+        latency = {}
+
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            prepared = executor.map(self.prepare, wav_files, genders)
+
+            batch = []
+            for wav_file, (nuclei, sequence, prep_time) in zip(wav_files, prepared):
+                batch.append((Path(wav_file).stem, nuclei, sequence, prep_time))
+
+                if len(batch) == self.batch_size:
+                    self._run_batch(batch, results, latency)
+                    batch = []
+
+            if batch:
+                self._run_batch(batch, results, latency)
+
+        return results, latency
+
+    def _run_batch(self, batch, results, latency):
+        start = time.perf_counter()
+        probs = self.predict_sequences([sequence for _, _, sequence, _ in batch])
+        model_time = time.perf_counter() - start
+
+        for (recording, nuclei, sequence, prep_time), prob in zip(batch, probs):
+            nuclei = nuclei.copy()
+            nuclei["prominence"] = prob
+            results[recording] = nuclei
+            latency[recording] = prep_time + model_time
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Predict syllable nucleus prominence for WAV recordings."
+    )
+    parser.add_argument("model", help="Trained nucleus-level model")
+    parser.add_argument("wav_files", nargs="+")
+    parser.add_argument(
+        "--gender",
+        nargs="+",
+        default=["f"],
+        help="Speaker gender, either once for all recordings or once per recording",
+    )
+    parser.add_argument("--config", help="Feature extraction configuration")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument(
+        "--mode",
+        choices=acceleration.MODES,
+        default="eager",
+        help="Run the model in float32 or in an accelerated mode",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    config = None
+    if args.config:
+        with open(args.config, "r") as cfg:
+            config = json.load(cfg)
+
+    genders = args.gender
+    if len(genders) == 1:
+        genders = genders * len(args.wav_files)
+    elif len(genders) != len(args.wav_files):
+        raise ValueError("Supply one gender for all recordings or one per recording.")
+
+    predictor = NucleusPredictor(
+        args.model, config, args.device, args.batch_size, args.threads, args.mode
+    )
+    results, latency = predictor.predict(args.wav_files, genders)
+
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    for recording, nuclei in results.items():
+        nuclei[["nucl_time", "start_est", "end", "phone", "word", "prominence"]].to_csv(
+            out_dir.joinpath(f"{recording}.prominence.csv"), index=False
+        )
+        print(f"{recording}: {len(nuclei)} nuclei, {latency[recording]:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
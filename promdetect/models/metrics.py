@@ -0,0 +1,165 @@
+"""
+Incremental evaluation metrics for the binary prominence classifiers.
+
+Instead of collecting all predictions and labels on the CPU, batches are reduced to confusion matrix counts on the device the model runs on.
+Precision, recall and F1 scores are derived from the counts when they are needed, usually once per epoch.
+"""
+
+import math
+
+import torch
+
+
+class ConfusionMatrix(object):
+    """
+    Binary confusion matrix accumulated over batches of logits.
+    device: Device to keep the counts on, should be the device of the model output.
+    threshold: Probability above which a prediction counts as prominent.
+
+    `counts[i, j]` holds the number of positions with label i that were predicted as j.
+    """
+
+    def __init__(self, device="cpu", threshold=0.5):
+        self.device = torch.device(device)
+        self.threshold = threshold
+        # Comparing logits to the logit of the threshold saves the sigmoid activation
+        self.logit_threshold = math.log(threshold / (1 - threshold))
+        self.reset()
+
+    def reset(self):
+        self.counts = torch.zeros(2, 2, dtype=torch.int64, device=self.device)
+
+    def update(self, logits, labels, lengths=None):
+        """
+        Add a batch of logits and labels, shaped (batch, sequence[, 1]).
+        lengths: Number of valid positions in each sequence, padded positions are not counted.
+        """
+
+        with torch.no_grad():
+            logits = logits.detach().reshape(logits.shape[0], -1)
+            labels = labels.detach().reshape(labels.shape[0], -1)
+
+            preds = logits > self.logit_threshold
+            truth = labels > 0.5
+
+            if lengths is not None:
+                lengths = torch.as_tensor(lengths, device=logits.device)
+                mask = torch.arange(
+                    logits.shape[1], device=logits.device
+                ) < lengths.unsqueeze(1)
+            else:
+                mask = torch.ones_like(preds)
+
+            self.counts += torch.stack(
+                [
+                    (mask & ~truth & ~preds).sum(),
+                    (mask & ~truth & preds).sum(),
+                    (mask & truth & ~preds).sum(),
+                    (mask & truth & preds).sum(),
+                ]
+            ).view(2, 2)
+
+    def report(self):
+        """
+        Compute precision, recall, F1 score and support per class, as well as accuracy and averages.
+        The layout follows the dictionary output of sklearn's `classification_report()`.
+        """
+
+        counts = self.counts.cpu().double()
+        total = counts.sum().item()
+
+        results = {}
+        for cls in [0, 1]:
+            true_pos = counts[cls, cls].item()
+            support = counts[cls, :].sum().item()
+            predicted = counts[:, cls].sum().item()
+
+            precision = true_pos / predicted if predicted else 0.0
+            recall = true_pos / support if support else 0.0
+            f1 = (
+                2 * precision * recall / (precision + recall)
+                if precision + recall
+                else 0.0
+            )
+
+            results[str(cls)] = {
+                "precision": precision,
+                "recall": recall,
+                "f1-score": f1,
+                "support": int(support),
+            }
+
+        results["accuracy"] = counts.trace().item() / total if total else 0.0
+
+        for avg in ["macro avg", "weighted avg"]:
+            results[avg] = {"support": int(total)}
+            for metric in ["precision", "recall", "f1-score"]:
+                if avg == "macro avg":
+                    value = (results["0"][metric] + results["1"][metric]) / 2
+                elif total:
+                    value = (
+                        results["0"][metric] * results["0"]["support"]
+                        + results["1"][metric] * results["1"]["support"]
+                    ) / total
+                else:
+                    value = 0.0
+                results[avg][metric] = value
+
+        return results
+
+    def f1(self, cls=1):
+        return self.report()[str(cls)]["f1-score"]
+
+    def format_report(self, digits=4):
+        """
+        Text report in the format of sklearn's `classification_report()`, as in the stored evaluation files.
+        """
+
+        results = self.report()
+        headers = ["precision", "recall", "f1-score", "support"]
+        width = len("weighted avg")
+
+        head_fmt = "{:>{width}s} " + " {:>9}" * len(headers)
+        row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+        accuracy_fmt = (
+            "{:>{width}s} " + " {:>9.{digits}}" * 2 + " {:>9.{digits}f}" + " {:>9}\n"
+        )
+
+        report = head_fmt.format("", *headers, width=width) + "\n\n"
+
+        for name in ["0", "1"]:
+            row = results[name]
+            report += row_fmt.format(
+                name,
+                row["precision"],
+                row["recall"],
+                row["f1-score"],
+                row["support"],
+                width=width,
+                digits=digits,
+            )
+
+        report += "\n"
+        report += accuracy_fmt.format(
+            "accuracy",
+            "",
+            "",
+            results["accuracy"],
+            results["macro avg"]["support"],
+            width=width,
+            digits=digits,
+        )
+
+        for name in ["macro avg", "weighted avg"]:
+            row = results[name]
+            report += row_fmt.format(
+                name,
+                row["precision"],
+                row["recall"],
+                row["f1-score"],
+                row["support"],
+                width=width,
+                digits=digits,
+            )
+
+        return report
@@ -0,0 +1,495 @@
+"""
+Network definitions for the prominence classifiers.
+
+These are the packaged versions of the classes defined in the Colab notebooks under `promdetect/models`.
+Layer names are identical to the notebook versions, so weights of the stored models can be loaded into them.
+"""
+
+import copy
+import math
+import pickle
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.rnn import (
+    PackedSequence,
+    pack_padded_sequence,
+    pad_packed_sequence,
+)
+
+
+class NucleusClassifier(nn.Module):
+    """
+    Bidirectional LSTM classifier on the syllable nucleus level.
+    Input: packed sequences of nucleus feature vectors, one sequence per recording.
+    num_features: Number of acoustic features per nucleus.
+    total_length: Length the packed LSTM output is padded to, should equal the padded label length.
+    If None, the output is padded to the longest sequence in the batch.
+    hidden_size, num_layers: Size and depth of the LSTM, lstm_dropout: dropout between its layers.
+    dense_sizes: Output sizes of the dense layers before the final one, dropout: dropout before each dense layer.
+    The defaults are those of the final thesis model, the other values cover earlier models in `model_store`.
+    """
+
+    def __init__(
+        self,
+        num_features,
+        total_length=None,
+        hidden_size=128,
+        num_layers=2,
+        dense_sizes=(32,),
+        dropout=0.4,
+        lstm_dropout=0.0,
+    ):
+        super(NucleusClassifier, self).__init__()
+
+        self.num_features = num_features
+        self.total_length = total_length
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.dense_sizes = list(dense_sizes)
+        self.dropout = dropout
+        self.lstm_dropout = lstm_dropout
+
+        self.lstm_1 = nn.LSTM(
+            input_size=num_features,
+            hidden_size=hidden_size,
+            num_layers=num_layers,
+            bidirectional=True,
+            batch_first=True,
+            dropout=lstm_dropout,
+        )
+
+        # dense_1 ... dense_n, the last one has a single output
+        sizes = [2 * hidden_size] + self.dense_sizes + [1]
+        for i in range(1, len(sizes)):
+            setattr(
+                self,
+                f"dense_{i}",
+                nn.Linear(in_features=sizes[i - 1], out_features=sizes[i]),
+            )
+
+        self.relu = nn.ReLU()
+        for i in range(1, len(sizes)):
+            setattr(self, f"dropout_{i}", nn.Dropout(dropout))
+
+    def forward(self, inputs):
+        lstm_out, (h, c) = self.lstm_1(inputs)
+        x, lengths = pad_packed_sequence(
+            lstm_out, batch_first=True, total_length=self.total_length
+        )
+
+        for dropout, dense in zip(self.dropout_layers(), self.dense_layers()):
+            x = self.relu(x)
+            x = dropout(x)
+            x = dense(x)
+
+        return x
+
+    def dense_layers(self):
+        return [
+            getattr(self, f"dense_{i}") for i in range(1, len(self.dense_sizes) + 2)
+        ]
+
+    def dropout_layers(self):
+        return [
+            getattr(self, f"dropout_{i}") for i in range(1, len(self.dense_sizes) + 2)
+        ]
+
+    def hparams(self):
+        return {
+            "num_features": self.num_features,
+            "total_length": self.total_length,
+            "hidden_size": self.hidden_size,
+            "num_layers": self.num_layers,
+            "dense_sizes": self.dense_sizes,
+            "dropout": self.dropout,
+            "lstm_dropout": self.lstm_dropout,
+        }
+
+
+class FrameClassifier(nn.Module):
+    """
+    Convolutional classifier on the frame level.
+    Three strided convolutions reduce the time resolution by a factor of 8, predictions are summed over each word span afterwards.
+    num_features: Number of acoustic features per frame.
+    kernel_size: Kernel size of all convolution layers.
+    """
+
+    def __init__(self, num_features, kernel_size=11):
+        super(FrameClassifier, self).__init__()
+
+        self.num_features = num_features
+        self.kernel_size = kernel_size
+
+        padding = math.floor(kernel_size / 2)
+
+        self.cnn_1 = nn.Conv1d(
+            in_channels=num_features,
+            out_channels=128,
+            kernel_size=kernel_size,
+            stride=2,
+            padding=padding,
+        )
+        self.cnn_2 = nn.Conv1d(
+            in_channels=128,
+            out_channels=256,
+            kernel_size=kernel_size,
+            stride=2,
+            padding=padding,
+        )
+        self.cnn_3 = nn.Conv1d(
+            in_channels=256,
+            out_channels=256,
+            kernel_size=kernel_size,
+            stride=2,
+            padding=padding,
+        )
+        self.dense_1 = nn.Linear(in_features=256, out_features=1)
+
+        self.dropout_1 = nn.Dropout(0.2)
+        self.dropout_2 = nn.Dropout(0.5)
+        self.dropout_3 = nn.Dropout(0.5)
+        self.relu = nn.ReLU()
+        self.hardtanh = nn.Hardtanh()
+        self.sigmoid = nn.Sigmoid()
+
+        # The second and third convolution share one batch normalization layer, as in the trained models
+        self.batchnorm128 = nn.BatchNorm1d(128)
+        self.batchnorm256 = nn.BatchNorm1d(256)
+
+    def forward(self, inputs, times):
+        x = self.frame_logits(inputs)
+
+        sum_preds(times, x)
+
+        return x
+
+    def frame_logits(self, inputs):
+        """
+        Frame predictions at the output resolution, before the summation over word spans.
+        """
+
+        x = self.cnn_1(inputs)
+        x = self.batchnorm128(x)
+        x = self.hardtanh(x)
+        x = self.dropout_1(x)
+
+        x = self.cnn_2(x)
+        x = self.batchnorm256(x)
+        x = self.hardtanh(x)
+        x = self.dropout_2(x)
+
+        x = self.cnn_3(x)
+        x = self.batchnorm256(x)
+        x = self.hardtanh(x)
+        x = self.dropout_3(x)
+
+        x = x.permute(0, 2, 1)
+
+        x = self.dense_1(x)
+
+        return x
+
+    def hparams(self):
+        return {"num_features": self.num_features, "kernel_size": self.kernel_size}
+
+
+class WordClassifier(nn.Module):
+    """
+    Bidirectional LSTM classifier on the word level, the second stage of the CNN+LSTM model.
+    Input: packed sequences of word vectors, i.e. the summed CNN predictions per word, optionally preceded by word-level features.
+    num_features: Size of the word vectors.
+    total_length: Length the packed LSTM output is padded to, should equal the padded word label length.
+    """
+
+    def __init__(self, num_features, total_length=40):
+        super(WordClassifier, self).__init__()
+
+        self.num_features = num_features
+        self.total_length = total_length
+
+        self.lstm_1 = nn.LSTM(
+            input_size=num_features,
+            hidden_size=128,
+            num_layers=2,
+            batch_first=True,
+            bidirectional=True,
+            dropout=0.2,
+        )
+        self.dense_1 = nn.Linear(in_features=256, out_features=1)
+
+        self.dropout_1 = nn.Dropout(0.5)
+        self.relu = nn.ReLU()
+
+    def forward(self, inputs: PackedSequence):
+        x, discard = self.lstm_1(inputs)
+        x, lengths = pad_packed_sequence(
+            x, batch_first=True, total_length=self.total_length
+        )
+        x = self.relu(x)
+        x = self.dropout_1(x)
+        x = self.dense_1(x)
+
+        return x, lengths
+
+    def hparams(self):
+        return {"num_features": self.num_features, "total_length": self.total_length}
+
+
+class CNNLSTMClassifier(nn.Module):
+    """
+    Both stages of the CNN+LSTM model in one module: frame CNN, pooling of its predictions over each word span and word-level LSTM.
+    All steps are tensor operations on the device of the input, so the module can be scripted or exported as a whole.
+    Input: (batch x features x frames) frame features, (batch x words x 2) word spans at the CNN output resolution,
+    (batch x words x features) word-level features and the number of words per utterance.
+    The output is padded to the word dimension of the input, so batches padded to a fixed number of words give fixed output shapes.
+    cnn: Trained FrameClassifier.
+    lstm: WordClassifier, its input size determines whether the word-level features are used.
+    """
+
+    def __init__(self, cnn, lstm):
+        super(CNNLSTMClassifier, self).__init__()
+
+        self.cnn = cnn
+        self.lstm = lstm
+        self.num_word_features = lstm.num_features - 1
+
+    def forward(self, frames, times, words, lengths):
+        frame_preds = self.cnn.frame_logits(frames).squeeze(2)
+
+        # Summing the output of `sum_preds()` over a span gives the span sum times the span length
+        sums, span_frames = span_sums(frame_preds, times)
+        word_preds = (sums * span_frames).unsqueeze(2)
+
+        if self.num_word_features > 0:
+            word_input = torch.cat([words, word_preds], dim=2)
+        else:
+            word_input = word_preds
+
+        packed = pack_padded_sequence(
+            word_input, lengths, batch_first=True, enforce_sorted=False
+        )
+        x, discard = self.lstm.lstm_1(packed)
+        x, discard_lengths = pad_packed_sequence(
+            x, batch_first=True, total_length=word_input.shape[1]
+        )
+        x = self.lstm.relu(x)
+        x = self.lstm.dropout_1(x)
+        x = self.lstm.dense_1(x)
+
+        return x
+
+
+NETWORKS = {
+    "NucleusClassifier": NucleusClassifier,
+    "FrameClassifier": FrameClassifier,
+    "WordClassifier": WordClassifier,
+}
+
+
+# CHECKPOINTS
+def save_checkpoint(model, path):
+    """
+    Store the network weights along with the arguments needed to rebuild the network.
+    Networks quantized with `quantize()` are stored with their int8 weights.
+    """
+
+    torch.save(
+        {
+            "network": type(model).__name__,
+            "hparams": model.hparams(),
+            "quantized": getattr(model, "quantized", False),
+            "state_dict": model.state_dict(),
+        },
+        path,
+    )
+
+
+def load_checkpoint(path, device="cpu"):
+    """
+    Rebuild a network stored by `save_checkpoint()`.
+    """
+
+    # Packed int8 weights of quantized networks are stored as script objects
+    with torch.serialization.safe_globals([torch.ScriptObject]):
+        checkpoint = torch.load(path, map_location=device)
+
+    model = NETWORKS[checkpoint["network"]](**checkpoint["hparams"])
+    if checkpoint.get("quantized", False):
+        model = quantize(model)
+    model.load_state_dict(checkpoint["state_dict"])
+
+    return model.to(device)
+
+
+def quantize(model):
+    """
+    Dynamically quantized copy of a network for CPU inference: the weights of the LSTM and dense layers are stored in int8,
+    their inputs are quantized on the fly for each batch. Convolutions are not quantized.
+    """
+
+    quantized = torch.ao.quantization.quantize_dynamic(
+        copy.deepcopy(model).cpu().eval(), {nn.LSTM, nn.Linear}, dtype=torch.qint8
+    )
+    quantized.quantized = True
+
+    return quantized
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """
+    Unpickler for models stored with `torch.save(model, ...)` in the notebooks.
+    The notebook classes are only defined in `__main__` there, so they are restored as plain modules of the same name.
+    """
+
+    def find_class(self, module, name):
+        if module == "__main__":
+            return type(name, (nn.Module,), {})
+        return super().find_class(module, name)
+
+
+class _legacy_pickle(object):
+    Unpickler = _LegacyUnpickler
+    load = pickle.load
+
+
+def load_legacy_model(path, device="cpu"):
+    """
+    Load a model pickled by one of the notebooks (see `model_store`) into the corresponding packaged network.
+    The network type is taken from the notebook class, its size from the stored weights.
+    Raises a ValueError for architectures the packaged networks cannot represent.
+    """
+
+    legacy_model = torch.load(
+        path, map_location=device, pickle_module=_legacy_pickle, weights_only=False
+    )
+    state_dict = legacy_model.state_dict()
+    legacy_class = type(legacy_model).__name__
+
+    if "cnn_1.weight" in state_dict:
+        model = FrameClassifier(
+            state_dict["cnn_1.weight"].shape[1], state_dict["cnn_1.weight"].shape[2]
+        )
+    elif legacy_class == "binaryClassifier":
+        model = NucleusClassifier(**legacy_nucleus_hparams(legacy_model))
+    elif legacy_class == "LSTMClassifier" and "lstm_1.weight_ih_l0" in state_dict:
+        model = WordClassifier(state_dict["lstm_1.weight_ih_l0"].shape[1], None)
+    else:
+        raise ValueError(
+            f"Unsupported legacy architecture in {path}: notebook class '{legacy_class}'"
+        )
+
+    try:
+        model.load_state_dict(state_dict)
+    except RuntimeError as error:
+        raise ValueError(
+            f"Unsupported legacy architecture in {path}, the weights do not fit a {type(model).__name__}: {error}"
+        )
+
+    return model.to(device)
+
+
+def load_model(path, device="cpu"):
+    """
+    Load a network from either a checkpoint or a pickled notebook model.
+    """
+
+    try:
+        return load_checkpoint(path, device)
+    except (pickle.UnpicklingError, AttributeError, KeyError, TypeError):
+        return load_legacy_model(path, device)
+
+
+# ANCILLARY FUNCTIONS
+def legacy_nucleus_hparams(legacy_model):
+    """
+    Arguments of the `NucleusClassifier` matching a nucleus model pickled by the notebook, inferred from its weights.
+    """
+
+    state_dict = legacy_model.state_dict()
+    if "lstm_1.weight_ih_l0_reverse" not in state_dict:
+        raise ValueError(
+            "Unsupported legacy architecture: the nucleus model has no bidirectional LSTM 'lstm_1'"
+        )
+
+    num_layers = 0
+    while f"lstm_1.weight_ih_l{num_layers}" in state_dict:
+        num_layers += 1
+
+    num_dense = 0
+    while f"dense_{num_dense + 1}.weight" in state_dict:
+        num_dense += 1
+    if num_dense == 0 or state_dict[f"dense_{num_dense}.weight"].shape[0] != 1:
+        raise ValueError(
+            "Unsupported legacy architecture: the nucleus model has no single-output dense layer"
+        )
+
+    dropout = getattr(legacy_model, "dropout_1", None)
+
+    return {
+        "num_features": state_dict["lstm_1.weight_ih_l0"].shape[1],
+        "hidden_size": state_dict["lstm_1.weight_hh_l0"].shape[1],
+        "num_layers": num_layers,
+        "dense_sizes": [
+            state_dict[f"dense_{i}.weight"].shape[0] for i in range(1, num_dense)
+        ],
+        "dropout": dropout.p if dropout is not None else 0.4,
+        "lstm_dropout": legacy_model.lstm_1.dropout,
+    }
+
+
+def sum_preds(time_batch, pred_batch):
+    """
+    Replace the frame predictions within each word span by their sum over the span.
+    time_batch contains (start, end) frame indices for each word, padded with zeros.
+    """
+
+    for idx in range(len(time_batch)):
+        timetable = time_batch[idx]
+        for span in timetable:
+            if span[1] != 0.0 and span[0] != span[1]:
+                start = int(span[0]) + 1
+                end = int(span[1]) + 1
+                pred_batch[idx][start:end] = sum(pred_batch[idx][start:end])
+
+
+def sum_labels(time_batch, label_batch):
+    """
+    Set the frame labels within each word span to the majority label of the span.
+    """
+
+    for idx in range(len(time_batch)):
+        timetable = time_batch[idx]
+        for span in timetable:
+            if span[1] != 0.0 and span[0] != span[1]:
+                start = int(span[0]) + 1
+                end = int(span[1]) + 1
+                mean_val = torch.mean(label_batch[idx][start:end])
+                if mean_val > 0.5:
+                    label_batch[idx][start:end] = 1.0
+                else:
+                    label_batch[idx][start:end] = 0.0
+
+
+def span_sums(preds, times):
+    """
+    Sum the frame predictions within each word span.
+    preds: (batch x frames) predictions, times: (batch x words x 2) spans with (start, end) frame indices, padded with zeros.
+    Returns the (batch x words) sums and the number of frames in each span.
+    """
+
+    num_frames = preds.shape[1]
+    times = times.long()
+
+    # Cumulative sums with a leading zero, so the sum over [start, end) is cumsum[end] - cumsum[start]
+    cumsum = nn.functional.pad(torch.cumsum(preds, dim=1), [1, 0])
+
+    start = torch.clamp(times[:, :, 0] + 1, max=num_frames)
+    end = torch.clamp(times[:, :, 1] + 1, max=num_frames)
+    valid = (times[:, :, 1] != 0) & (times[:, :, 0] != times[:, :, 1])
+
+    sums = cumsum.gather(1, end) - cumsum.gather(1, start)
+    sums = torch.where(valid, sums, torch.zeros_like(sums))
+    span_frames = torch.where(valid, torch.clamp(end - start, min=0), 0)
+
+    return sums, span_frames
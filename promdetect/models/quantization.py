@@ -0,0 +1,147 @@
+"""
+Post-training dynamic int8 quantization of the LSTM classifiers for CPU inference, see `networks.quantize()`.
+
+A trained model is quantized, compared with the float32 model on the validation split of its training configuration,
+and written to an output directory with:
+- `checkpoint.pt`: the quantized network, to be loaded with `networks.load_model()`, e.g. by `promdetect-predict`
+- `model.pt` and `meta.json`: a TorchScript export of the quantized network, to be loaded with `runtime.load()`
+  (nucleus and CNN+LSTM models)
+- `quantization.json`: the comparison with the float32 model
+
+Usage: promdetect-quantize nucleus promdetect/models/model_store/nucleus_level/model-12_epoch-49_f1-0.640.pt exported/nucleus_int8
+       promdetect-quantize cnn_lstm word_lstm.pt exported/cnn_lstm_int8 --cnn-model frame_cnn.pt
+"""
+
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from sklearn.metrics import f1_score
+
+from promdetect.models import acceleration, export, networks, training
+
+
+def compare(trainer, network, quantized):
+    """
+    Compare a quantized network with its float32 original on the validation set of `trainer`.
+    Returns the F1 scores of the prominent class, the share of identical decisions,
+    the largest probability difference, the size of the weights and the time spent on the validation set.
+    """
+
+    results = {}
+    probs = {}
+    for name, model in [("float32", network), ("int8", quantized)]:
+        start = time.perf_counter()
+        probs[name], labels = acceleration.validation_probs(trainer, model, "eager")
+        results[f"seconds_{name}"] = time.perf_counter() - start
+        results[f"f1_{name}"] = float(
+            f1_score(labels, probs[name] > 0.5, zero_division=0)
+        )
+        results[f"bytes_{name}"] = state_dict_size(model)
+
+    results["agreement"] = float(
+        np.mean((probs["float32"] > 0.5) == (probs["int8"] > 0.5))
+    )
+    results["max_abs_diff"] = float(np.abs(probs["float32"] - probs["int8"]).max())
+
+    return results
+
+
+def export_quantized(model_name, quantized, out_dir, cnn=None):
+    """
+    Write the checkpoint and, for the nucleus and CNN+LSTM models, the TorchScript export of a quantized network.
+    """
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    networks.save_checkpoint(quantized, out_dir.joinpath("checkpoint.pt"))
+
+    meta = None
+    if model_name in ["nucleus", "nucleus_smotenc"]:
+        meta = export.export_nucleus(quantized, out_dir)
+    elif model_name == "cnn_lstm":
+        meta = export.export_cnn_lstm(cnn, quantized, out_dir)
+
+    if meta is not None:
+        meta["quantized"] = "dynamic_int8"
+        export.write_meta(meta, out_dir)
+
+    return meta
+
+
+# ANCILLARY FUNCTIONS
+def state_dict_size(model):
+    """
+    Size of the stored weights of a network in bytes.
+    """
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+
+    return buffer.getbuffer().nbytes
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Quantize a trained classifier to int8 and compare it with the float32 model."
+    )
+    parser.add_argument("model_name", choices=list(training.MODEL_DEFINITIONS))
+    parser.add_argument(
+        "model", help="Trained model, the word-level LSTM for the CNN+LSTM model"
+    )
+    parser.add_argument("out_dir", help="Directory to write the quantized model to")
+    parser.add_argument("--cnn-model", help="Trained CNN for the CNN+LSTM model")
+    parser.add_argument("--config", default=str(training.CFG_FILE))
+    parser.add_argument("--data-dir", help="Directory containing the data sets")
+    parser.add_argument(
+        "--no-eval",
+        dest="evaluate",
+        action="store_false",
+        help="Only quantize and export, without the validation data",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    config = training.load_config(args.config)
+
+    # Quantized networks run on the CPU only
+    config["device"] = "cpu"
+    if args.data_dir is not None:
+        config["data_dir"] = args.data_dir
+    if args.cnn_model is not None:
+        config["models"][args.model_name]["cnn_model"] = args.cnn_model
+
+    network = networks.load_model(args.model).eval()
+    quantized = networks.quantize(network)
+
+    cnn = None
+    if args.model_name == "cnn_lstm":
+        if not args.cnn_model:
+            raise ValueError("The CNN+LSTM model requires a trained CNN (--cnn-model).")
+        cnn = networks.load_model(args.cnn_model).eval()
+
+    export_quantized(args.model_name, quantized, args.out_dir, cnn)
+
+    if args.evaluate:
+        trainer = training.Trainer(config, args.model_name)
+        results = compare(trainer, network, quantized)
+
+        with open(Path(args.out_dir).joinpath("quantization.json"), "w") as out_file:
+            json.dump(results, out_file, indent=4)
+
+        for key, value in results.items():
+            print(f"{key}: {value}")
+
+    print(f"Wrote the quantized model to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Lightweight runtime for classifiers exported with `promdetect.models.export`.
+
+Only numpy and the backend of the exported model are imported: torch for TorchScript, onnxruntime for ONNX.
+No network definitions, training or feature extraction code is needed.
+
+Example:
+    model = runtime.load("exported/nucleus")
+    probs = model.predict(features, lengths)
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+class TorchScriptSession(object):
+    """
+    Run a TorchScript module on numpy arrays.
+    """
+
+    def __init__(self, path, num_threads=None):
+        import torch
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        self.torch = torch
+        self.module = torch.jit.load(str(path), map_location="cpu").eval()
+
+    def run(self, feeds):
+        with self.torch.inference_mode():
+            output = self.module(
+                *[self.torch.from_numpy(arr) for arr in feeds.values()]
+            )
+
+        return output.numpy()
+
+
+class OnnxSession(object):
+    """
+    Run an ONNX model on numpy arrays with onnxruntime.
+    """
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+
+        self.session = onnxruntime.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def run(self, feeds):
+        # Inputs not used by the graph, e.g. empty word features, are dropped on export
+        feeds = {name: feeds[name] for name in self.input_names}
+
+        return self.session.run(None, feeds)[0]
+
+
+SESSIONS = {"torchscript": TorchScriptSession, "onnx": OnnxSession}
+
+
+class NucleusRuntime(object):
+    """
+    Exported nucleus-level classifier.
+    """
+
+    def __init__(self, directory, meta, num_threads=None):
+        self.meta = meta
+        self.model = SESSIONS[meta["format"]](
+            Path(directory).joinpath(meta["files"]["model"]), num_threads
+        )
+
+    def predict(self, features, lengths=None):
+        """
+        features: (recordings x nuclei x features) array, padded with zeroes.
+        lengths: Number of nuclei per recording, defaults to the full padded length.
+        Returns a (recordings x nuclei) array of prominence probabilities.
+        """
+
+        features = np.asarray(features, dtype="float32")
+        if lengths is None:
+            lengths = np.full(features.shape[0], features.shape[1])
+
+        return self.model.run(
+            {"inputs": features, "lengths": np.asarray(lengths, dtype="int64")}
+        )
+
+
+class CNNLSTMRuntime(object):
+    """
+    Exported CNN+LSTM classifier.
+    """
+
+    def __init__(self, directory, meta, num_threads=None):
+        self.meta = meta
+        self.model = SESSIONS[meta["format"]](
+            Path(directory).joinpath(meta["files"]["model"]), num_threads
+        )
+
+    def predict(self, frames, times, lengths, words=None):
+        """
+        frames: (utterances x features x frames) array of frame-level features, padded with zeroes.
+        times: (utterances x words x 2) array of the first and last frame of each word, padded with zeroes.
+        lengths: Number of words per utterance.
+        words: (utterances x words x features) array of word-level features, if the model uses them.
+        Returns a (utterances x words) array of prominence probabilities.
+        """
+
+        times = np.asarray(times, dtype="int64")
+
+        if words is None:
+            if self.meta["num_word_features"] > 0:
+                raise ValueError("This model requires word-level features.")
+            words = np.zeros(times.shape[:2] + (0,))
+
+        return self.model.run(
+            {
+                "frames": np.asarray(frames, dtype="float32"),
+                "times": times,
+                "words": np.asarray(words, dtype="float32"),
+                "lengths": np.asarray(lengths, dtype="int64"),
+            }
+        )
+
+
+RUNTIMES = {"nucleus": NucleusRuntime, "cnn_lstm": CNNLSTMRuntime}
+
+
+def load(directory, num_threads=None):
+    """
+    Load a classifier exported to `directory`.
+    """
+
+    with open(Path(directory).joinpath("meta.json"), "r") as meta_file:
+        meta = json.load(meta_file)
+
+    return RUNTIMES[meta["model"]](directory, meta, num_threads)
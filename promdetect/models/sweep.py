@@ -0,0 +1,350 @@
+"""
+Cross-validated hyperparameter sweeps for the prominence classifiers.
+
+Each combination of the swept parameters is trained and evaluated on k folds of the training sets.
+Folds are grouped by speaker, so no speaker is in the training and validation part of the same fold.
+Speakers are taken from the sequence table of the sets (see `prep.build_sets`) or given as groups.
+Sets without a sequence table, e.g. the frame sets, can only be split by sequence when this is explicitly requested (`--ungrouped`).
+
+The sets are loaded once and stored as memory-mapped ragged arrays (see `prep.build_sets.write_ragged()`),
+from which the folds are run in parallel worker processes. The scores of all folds are written to one results table.
+
+Usage: promdetect-sweep nucleus sweeps/nucleus --param learning_rate=0.001,0.0005 --param epochs=30,50 --folds 5 --num-workers 4
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.metrics import precision_recall_fscore_support
+from sklearn.model_selection import GroupKFold
+
+from promdetect.models import datasets, forest, networks, training
+from promdetect.prep.build_sets import offsets_file, write_ragged
+from promdetect.prep.oversampling import speaker_groups
+
+MODELS = list(training.MODEL_DEFINITIONS) + [forest.MODEL_NAME]
+
+
+class Sweep(object):
+    """
+    Speaker-grouped k-fold cross-validation of one model for each combination of parameter values.
+    config: Full configuration, see `config.json`.
+    model_name: Key of the model in the "models" section of the configuration.
+    out_dir: Directory for the shared sets, the models of each fold and the results table.
+    grid: Dictionary of model parameters and the list of values to try for each of them.
+    folds: Number of cross-validation folds.
+    sequences: Sequence table of the sets with a "recording" column, defaults to `<level>_sequences.csv` next to the features.
+    groups: Group of each sequence, e.g. the speaker, used instead of the speakers in the sequence table.
+    ungrouped: Split by sequence if there is neither a sequence table nor groups, instead of raising a ValueError.
+    """
+
+    def __init__(
+        self,
+        config,
+        model_name,
+        out_dir,
+        grid=None,
+        folds=5,
+        sequences=None,
+        groups=None,
+        ungrouped=False,
+    ):
+        if model_name not in MODELS:
+            raise ValueError(f"Argument 'model_name' must be one of {MODELS}")
+
+        self.config = config
+        self.model_name = model_name
+        self.out_dir = Path(out_dir)
+        self.grid = grid or {}
+        self.folds = folds
+        self.groups = groups
+        self.cfg = config["models"][model_name]
+
+        if sequences is None:
+            features = Path(config["data_dir"]).joinpath(self.cfg["features"])
+            sequences = features.with_name(
+                f"{features.stem.split('_')[0]}_sequences.csv"
+            )
+        self.sequences = Path(sequences)
+
+        self.ungrouped = groups is None and not self.sequences.exists()
+        if self.ungrouped and not ungrouped:
+            raise ValueError(
+                f"No sequence table at {self.sequences} to group the folds by speaker, "
+                "give the sequence table or the groups, or allow folds split by sequence (--ungrouped)"
+            )
+
+    def runs(self):
+        """
+        Parameter combinations of the grid, as dictionaries.
+        """
+
+        keys = list(self.grid)
+        return [
+            dict(zip(keys, values)) for values in itertools.product(*self.grid.values())
+        ]
+
+    def share_sets(self):
+        """
+        Store the sets of the model as memory-mapped ragged arrays in the output directory, unless they already are.
+        Returns the model configuration with the paths of the shared sets.
+        """
+
+        cfg = dict(self.cfg)
+        share_dir = self.out_dir.joinpath("sets")
+        share_dir.mkdir(parents=True, exist_ok=True)
+
+        for key, file in self.cfg.items():
+            if not (isinstance(file, str) and file.endswith(".npy")):
+                continue
+
+            path = Path(self.config["data_dir"]).joinpath(file)
+            if offsets_file(path).exists():
+                cfg[key] = str(path.resolve())
+                continue
+
+            sequences = datasets.load_set(self.config["data_dir"], file)
+            shared = share_dir.joinpath(f"{key}.npy")
+            write_ragged(
+                shared,
+                np.concatenate(sequences),
+                [len(seq) for seq in sequences],
+            )
+            cfg[key] = str(shared.resolve())
+
+        return cfg
+
+    def split(self, num_sequences):
+        """
+        Training and validation sequence indices of each fold.
+        """
+
+        if self.groups is not None:
+            groups = list(self.groups)
+        elif self.ungrouped:
+            groups = np.arange(num_sequences)
+        else:
+            groups = speaker_groups(pd.read_csv(self.sequences))
+
+        if len(groups) != num_sequences:
+            raise ValueError(
+                f"The sequence table has {len(groups)} rows, but the sets have {num_sequences} sequences"
+            )
+
+        return list(
+            GroupKFold(n_splits=self.folds).split(
+                np.zeros(num_sequences), groups=groups
+            )
+        )
+
+    def run(self, num_workers=1):
+        """
+        Train and evaluate all runs on all folds, in parallel worker processes with num_workers > 1.
+        Returns the results table with one row per run and fold, which is also written to `results.csv`.
+        """
+
+        cfg = self.share_sets()
+        num_sequences = len(datasets.load_set(self.config["data_dir"], cfg["labels"]))
+        splits = self.split(num_sequences)
+
+        # Workers share the cores, each one trains with its share of the threads
+        threads = max(1, (os.cpu_count() or 1) // max(1, num_workers))
+
+        tasks = []
+        for run_num, params in enumerate(self.runs(), start=1):
+            for fold, split in enumerate(splits, start=1):
+                run_dir = Path(f"run-{run_num}", f"fold-{fold}")
+                run_config = dict(
+                    self.config,
+                    model_store=str(self.out_dir.joinpath("models", run_dir)),
+                    eval_dir=str(self.out_dir.joinpath("eval", run_dir)),
+                    models={self.model_name: dict(cfg, **params)},
+                )
+                tasks.append(
+                    (run_config, self.model_name, run_num, fold, params, split, threads)
+                )
+
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                rows = list(executor.map(run_fold, tasks))
+        else:
+            rows = [run_fold(task) for task in tasks]
+
+        results = pd.DataFrame(rows)
+        results.to_csv(self.out_dir.joinpath("results.csv"), index=False)
+
+        return results
+
+
+def run_fold(task):
+    """
+    Train one run on the training part of a fold and score it on the validation part.
+    Returns a row of the results table.
+    """
+
+    config, model_name, run_num, fold, params, split, threads = task
+    torch.set_num_threads(threads)
+    start = time.perf_counter()
+
+    if model_name == forest.MODEL_NAME:
+        precision, recall, f1, accuracy = score_forest(config, split, n_jobs=threads)
+    else:
+        trainer = training.Trainer(config, model_name, split=split)
+        best_model = trainer.train()
+        network = (
+            networks.load_checkpoint(best_model, trainer.device)
+            if best_model is not None
+            else trainer.network
+        )
+        report = trainer.validate(network).report()
+        precision = report["1"]["precision"]
+        recall = report["1"]["recall"]
+        f1 = report["1"]["f1-score"]
+        accuracy = report["accuracy"]
+
+    return dict(
+        {"run": run_num, "fold": fold},
+        **{f"param_{key}": value for key, value in params.items()},
+        precision=precision,
+        recall=recall,
+        f1=f1,
+        accuracy=accuracy,
+        seconds=time.perf_counter() - start,
+    )
+
+
+# ANCILLARY FUNCTIONS
+def score_forest(config, split, n_jobs=1):
+    """
+    Precision, recall and F1 score of the prominent class and accuracy of the random forest on one fold.
+    """
+
+    cfg = config["models"][forest.MODEL_NAME]
+    features = datasets.load_set(config["data_dir"], cfg["features"])
+    labels = datasets.load_set(config["data_dir"], cfg["labels"])
+    train_idx, val_idx = split
+
+    model = forest.NucleusForest(
+        cfg["n_estimators"],
+        cfg["criterion"],
+        cfg["min_samples_split"],
+        cfg["min_samples_leaf"],
+        cfg["random_state"],
+        n_jobs,
+        cfg["batch_size"],
+    )
+    model.fit(features[train_idx], labels[train_idx], chunk_size=cfg.get("chunk_size"))
+
+    val_labels = np.concatenate(labels[val_idx])
+    preds = (np.concatenate(model.predict_sequences(features[val_idx])) > 0.5).astype(
+        "int8"
+    )
+    precision, recall, f1, support = precision_recall_fscore_support(
+        val_labels, preds, labels=[1], zero_division=0
+    )
+
+    return precision[0], recall[0], f1[0], (preds == val_labels).mean()
+
+
+def summarize(results):
+    """
+    Mean and standard deviation of the scores of each run over its folds, best F1 score first.
+    """
+
+    params = [col for col in results.columns if col.startswith("param_")]
+    scores = ["precision", "recall", "f1", "accuracy"]
+
+    summary = results.groupby(["run"] + params, dropna=False)[scores].agg(
+        ["mean", "std"]
+    )
+    summary.columns = [f"{score}_{stat}" for score, stat in summary.columns]
+
+    return summary.sort_values("f1_mean", ascending=False).reset_index()
+
+
+def parse_grid(params):
+    """
+    Parse "name=value1,value2" arguments into a grid, values are read as JSON where possible (numbers, null, true).
+    """
+
+    grid = {}
+    for param in params:
+        if "=" not in param:
+            raise ValueError(
+                f"Parameters must be given as name=value1,value2, not '{param}'"
+            )
+
+        name, values = param.split("=", 1)
+        grid[name] = []
+        for value in values.split(","):
+            try:
+                grid[name].append(json.loads(value))
+            except json.JSONDecodeError:
+                grid[name].append(value)
+
+    return grid
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Cross-validated hyperparameter sweep for one of the promdetect classifiers."
+    )
+    parser.add_argument("model", choices=MODELS)
+    parser.add_argument(
+        "out_dir", help="Directory to write the shared sets, models and results to"
+    )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="Swept parameter as name=value1,value2, can be repeated",
+    )
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument(
+        "--sequences", help="Sequence table of the sets, for grouping by speaker"
+    )
+    parser.add_argument(
+        "--ungrouped",
+        action="store_true",
+        help="Split the folds by sequence if the sets have no sequence table",
+    )
+    parser.add_argument("--config", default=str(training.CFG_FILE))
+    parser.add_argument("--data-dir", help="Directory containing the data sets")
+    parser.add_argument("--device", help="e.g. 'cpu' or 'cuda:0', default: auto")
+    parser.add_argument("--num-workers", type=int, default=1)
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    config = training.load_config(args.config)
+
+    for key in ["data_dir", "device"]:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    sweep = Sweep(
+        config,
+        args.model,
+        args.out_dir,
+        parse_grid(args.param),
+        args.folds,
+        args.sequences,
+        ungrouped=args.ungrouped,
+    )
+    results = sweep.run(args.num_workers)
+
+    print(summarize(results).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
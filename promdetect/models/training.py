@@ -0,0 +1,436 @@
+"""
+Training engine for the prominence classifiers.
+
+The model definitions in this module specify how the training sets for each classifier are loaded and how batches are run through the network.
+`Trainer` runs the shared training and evaluation loops for all of them, with settings taken from `config.json`.
+
+Usage: promdetect-train nucleus --data-dir data/features --epochs 50 --num-workers 4
+"""
+
+import argparse
+import json
+import os
+from glob import glob
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.utils.rnn import pack_padded_sequence
+from torch.utils.data import DataLoader
+
+from promdetect.models import datasets, metrics, networks
+
+CFG_FILE = Path(__file__).resolve().parent.joinpath("config.json")
+
+
+def load_config(cfg_file=CFG_FILE):
+    with open(cfg_file, "r") as cfg:
+        return json.load(cfg)
+
+
+class ModelDefinition(object):
+    """
+    Base class for the pluggable model definitions.
+    cfg: Model section of the configuration, see the "models" entries in `config.json`.
+    data_dir: Directory the data set paths in `cfg` are relative to.
+    split: (training, validation) sequence indices, e.g. of a cross-validation fold; defaults to the split of the thesis models.
+
+    Subclasses implement loading the data sets, building the network and running a batch through it.
+    `run_batch()` returns the logits, the targets and the number of valid positions for each sequence in the batch.
+    """
+
+    def __init__(self, cfg, data_dir, split=None):
+        self.cfg = cfg
+        self.data_dir = data_dir
+        self.split = split
+
+    def load_datasets(self):
+        raise NotImplementedError
+
+    def build_network(self, train_set):
+        raise NotImplementedError
+
+    def run_batch(self, network, batch, device):
+        raise NotImplementedError
+
+    def load_set(self, key):
+        return datasets.load_set(self.data_dir, self.cfg[key])
+
+    def split_sets(self, *sets):
+        if self.split is None:
+            return datasets.split_sets(*sets)
+
+        return tuple(tuple(data[idx] for data in sets) for idx in self.split)
+
+
+class NucleusDefinition(ModelDefinition):
+    """
+    Bidirectional LSTM over the syllable nuclei of each recording.
+    """
+
+    def load_datasets(self):
+        train, val = self.split_sets(self.load_set("features"), self.load_set("labels"))
+
+        total_length = max(len(seq) for seq in np.concatenate([train[0], val[0]]))
+
+        return (
+            datasets.SequenceDataset(*train, total_length=total_length),
+            datasets.SequenceDataset(*val, total_length=total_length),
+        )
+
+    def build_network(self, train_set):
+        return networks.NucleusClassifier(
+            train_set.num_features, train_set.total_length
+        )
+
+    def run_batch(self, network, batch, device):
+        feature_batch, label_batch, lengths = batch
+        feature_batch = feature_batch.to(device, non_blocking=True)
+        label_batch = label_batch.to(device, non_blocking=True)
+
+        input_features = pack_padded_sequence(
+            feature_batch, lengths, batch_first=True, enforce_sorted=False
+        )
+
+        return network(input_features), label_batch.unsqueeze(2), lengths
+
+
+class SmotencNucleusDefinition(NucleusDefinition):
+    """
+    Nucleus LSTM trained on the SMOTENC-balanced set, validated on the unbalanced set.
+    """
+
+    def load_datasets(self):
+        train, discard = self.split_sets(
+            self.load_set("features"), self.load_set("labels")
+        )
+        discard, val = self.split_sets(
+            self.load_set("features_unbalanced"), self.load_set("labels_unbalanced")
+        )
+
+        total_length = max(len(seq) for seq in np.concatenate([train[0], val[0]]))
+
+        return (
+            datasets.SequenceDataset(*train, total_length=total_length),
+            datasets.SequenceDataset(*val, total_length=total_length),
+        )
+
+
+class FrameCNNDefinition(ModelDefinition):
+    """
+    Strided CNN over the frames of each utterance, predictions are summed over word spans.
+    """
+
+    def load_datasets(self):
+        train, val = self.split_sets(
+            self.load_set("features"),
+            self.load_set("labels"),
+            self.load_set("times"),
+            self.load_set("words"),
+            self.load_set("words_labels"),
+        )
+
+        total_words = max(len(seq) for seq in np.concatenate([train[3], val[3]]))
+
+        return (
+            datasets.FrameWordDataset(*train, total_words=total_words),
+            datasets.FrameWordDataset(*val, total_words=total_words),
+        )
+
+    def build_network(self, train_set):
+        return networks.FrameClassifier(
+            train_set.num_features, self.cfg.get("kernel_size", 11)
+        )
+
+    def run_batch(self, network, batch, device):
+        feature_batch = batch["features"].to(device, non_blocking=True)
+        label_batch = batch["labels"].to(device, non_blocking=True)
+        time_batch = batch["times"].to(device, non_blocking=True)
+
+        pred_labels = network(feature_batch, time_batch)
+        networks.sum_labels(time_batch, label_batch)
+
+        return pred_labels, label_batch, batch["frames_lengths"]
+
+
+class CNNLSTMDefinition(FrameCNNDefinition):
+    """
+    Word-level LSTM on top of a trained frame CNN.
+    The CNN predictions summed over each word span serve as word input, optionally together with the word-level features.
+    """
+
+    def build_network(self, train_set):
+        if not self.cfg.get("cnn_model"):
+            raise ValueError("The CNN+LSTM model requires a trained CNN ('cnn_model').")
+
+        # The CNN is not trained any further
+        self.cnn = networks.load_checkpoint(self.cfg["cnn_model"]).eval()
+        for param in self.cnn.parameters():
+            param.requires_grad = False
+        self.pipeline = None
+
+        num_features = 1
+        if self.cfg.get("use_word_features", True):
+            num_features += train_set.num_word_features
+
+        return networks.WordClassifier(num_features, train_set.total_words)
+
+    def run_batch(self, network, batch, device):
+        self.cnn.to(device)
+
+        feature_batch = batch["features"].to(device, non_blocking=True)
+        time_batch = batch["times"].to(device, non_blocking=True)
+        word_feature_batch = batch["words"].to(device, non_blocking=True)
+        word_label_batch = batch["words_labels"].to(device, non_blocking=True)
+        lengths = batch["words_lengths"]
+
+        # Both stages run on the device in one pass, `network` is trained through the shared LSTM.
+        # The pipeline is only rebuilt when batches of another network arrive, e.g. a stored model to evaluate
+        if self.pipeline is None or self.pipeline.lstm is not network:
+            self.pipeline = networks.CNNLSTMClassifier(self.cnn, network)
+        preds = self.pipeline(feature_batch, time_batch, word_feature_batch, lengths)
+
+        return preds, word_label_batch, lengths
+
+
+MODEL_DEFINITIONS = {
+    "nucleus": NucleusDefinition,
+    "nucleus_smotenc": SmotencNucleusDefinition,
+    "frame_cnn": FrameCNNDefinition,
+    "cnn_lstm": CNNLSTMDefinition,
+}
+
+
+class Trainer(object):
+    """
+    Train and evaluate one of the models in MODEL_DEFINITIONS.
+    config: Full configuration, see `config.json`.
+    model_name: Key of the model in MODEL_DEFINITIONS and in the "models" section of the configuration.
+    model_num: Number of the training run, used in the file names of stored models.
+    split: (training, validation) sequence indices, see `ModelDefinition`.
+    """
+
+    def __init__(self, config, model_name, model_num=1, split=None):
+        if model_name not in MODEL_DEFINITIONS:
+            raise ValueError(
+                "Model must be one of {}".format(", ".join(MODEL_DEFINITIONS))
+            )
+
+        self.config = config
+        self.model_name = model_name
+        self.model_num = model_num
+        self.cfg = config["models"][model_name]
+        self.definition = MODEL_DEFINITIONS[model_name](
+            self.cfg, config["data_dir"], split
+        )
+
+        if config.get("device", "auto") == "auto":
+            self.device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+        else:
+            self.device = torch.device(config["device"])
+
+        self.store_dir = Path(config["model_store"]).joinpath(self.cfg["store"])
+        self.eval_dir = Path(config["eval_dir"]).joinpath(self.cfg["store"], "eval")
+
+        self.train_set, self.val_set = self.definition.load_datasets()
+        self.network = self.definition.build_network(self.train_set).to(self.device)
+
+    def build_loader(self, dataset, shuffle):
+        """
+        Create a DataLoader with the loader settings from the configuration.
+        Memory is only pinned when training on a GPU, workers are only kept alive if there are any.
+        """
+
+        loader_cfg = self.config.get("loader", {})
+        num_workers = loader_cfg.get("num_workers", 0)
+
+        loader_args = {
+            "batch_size": self.cfg["batch_size"],
+            "shuffle": shuffle,
+            "num_workers": num_workers,
+            "pin_memory": loader_cfg.get("pin_memory", False)
+            and self.device.type == "cuda",
+        }
+
+        if num_workers > 0:
+            loader_args["persistent_workers"] = loader_cfg.get(
+                "persistent_workers", False
+            )
+            loader_args["prefetch_factor"] = loader_cfg.get("prefetch_factor", 2)
+
+        return DataLoader(dataset, **loader_args)
+
+    def build_loss(self):
+        if self.cfg.get("pos_weight") is not None:
+            pos_weight = torch.tensor([float(self.cfg["pos_weight"])])
+            return nn.BCEWithLogitsLoss(pos_weight=pos_weight).to(self.device)
+        else:
+            return nn.BCEWithLogitsLoss().to(self.device)
+
+    def train(self, epochs=None):
+        """
+        Train the network, storing it whenever the F1 score for the prominent class improves.
+        Returns the path of the best stored model.
+        """
+
+        epochs = epochs or self.cfg["epochs"]
+        train_loader = self.build_loader(self.train_set, shuffle=True)
+        loss_func = self.build_loss()
+        optimizer = optim.Adam(
+            filter(lambda p: p.requires_grad, self.network.parameters()),
+            lr=self.cfg["learning_rate"],
+        )
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        best_model = None
+        max_e_f1 = 0
+
+        for e in range(1, epochs + 1):
+            self.network.train()
+            # Loss and confusion counts stay on the device until the end of the epoch
+            e_loss = torch.zeros((), device=self.device)
+            e_metrics = metrics.ConfusionMatrix(self.device)
+
+            for batch in train_loader:
+                optimizer.zero_grad()
+
+                preds, labels, lengths = self.definition.run_batch(
+                    self.network, batch, self.device
+                )
+
+                loss = loss_func(preds, labels)
+                loss.backward()
+                optimizer.step()
+
+                e_loss += loss.detach()
+                e_metrics.update(preds, labels, lengths)
+
+            print(e_metrics.format_report(digits=4))
+            e_f1 = e_metrics.f1()
+
+            print(f"Epoch {e+0:03}: | Loss: {e_loss.item()/len(train_loader):.5f}")
+
+            if e_f1 > max_e_f1:
+                for file in glob(f"{self.store_dir}/model-{self.model_num}_*"):
+                    os.remove(file)
+
+                best_model = self.store_dir.joinpath(
+                    f"model-{self.model_num}_epoch-{e}_f1-{e_f1:.3f}.pt"
+                )
+                networks.save_checkpoint(self.network, best_model)
+                max_e_f1 = e_f1
+
+        return best_model
+
+    def validate(self, network):
+        """
+        Confusion matrix of a network on the validation set.
+        """
+
+        network.eval()
+        val_loader = self.build_loader(self.val_set, shuffle=False)
+        val_metrics = metrics.ConfusionMatrix(self.device)
+
+        with torch.no_grad():
+            for batch in val_loader:
+                preds, labels, lengths = self.definition.run_batch(
+                    network, batch, self.device
+                )
+                val_metrics.update(preds, labels, lengths)
+
+        return val_metrics
+
+    def evaluate(self, model_file=None):
+        """
+        Evaluate a stored model (or the current network) on the validation set and write the classification report to the eval directory.
+        """
+
+        if model_file is not None:
+            network = networks.load_checkpoint(model_file, self.device)
+            report_name = f"{Path(model_file).name}.txt"
+        else:
+            network = self.network
+            report_name = f"model-{self.model_num}.txt"
+
+        report = self.validate(network).format_report(digits=4)
+
+        self.eval_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.eval_dir.joinpath(report_name), "w") as reportfile:
+            reportfile.write(report)
+
+        return report
+
+
+# ANCILLARY FUNCTIONS
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Train and evaluate the promdetect classifiers."
+    )
+    parser.add_argument("model", choices=list(MODEL_DEFINITIONS))
+    parser.add_argument("--config", default=str(CFG_FILE))
+    parser.add_argument("--data-dir", help="Directory containing the data sets")
+    parser.add_argument("--model-store", help="Directory to store trained models in")
+    parser.add_argument("--eval-dir", help="Directory to write evaluation reports to")
+    parser.add_argument("--cnn-model", help="Trained CNN for the CNN+LSTM model")
+    parser.add_argument("--model-num", type=int, default=1)
+    parser.add_argument("--epochs", type=int)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--learning-rate", type=float)
+    parser.add_argument("--device", help="e.g. 'cpu' or 'cuda:0', default: auto")
+    parser.add_argument("--num-workers", type=int)
+    parser.add_argument("--pin-memory", dest="pin_memory", action="store_true")
+    parser.add_argument("--no-pin-memory", dest="pin_memory", action="store_false")
+    parser.add_argument(
+        "--persistent-workers", dest="persistent_workers", action="store_true"
+    )
+    parser.add_argument(
+        "--no-persistent-workers", dest="persistent_workers", action="store_false"
+    )
+    parser.set_defaults(pin_memory=None, persistent_workers=None)
+    parser.add_argument(
+        "--evaluate", metavar="MODEL_FILE", help="Only evaluate a stored model"
+    )
+
+    return parser.parse_args(args)
+
+
+def apply_args(config, args):
+    """
+    Override the configuration with the command line arguments that were given.
+    """
+
+    for key in ["data_dir", "model_store", "eval_dir", "device"]:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    model_cfg = config["models"][args.model]
+    for key in ["epochs", "batch_size", "learning_rate", "cnn_model"]:
+        if getattr(args, key) is not None:
+            model_cfg[key] = getattr(args, key)
+
+    loader_cfg = config.setdefault("loader", {})
+    for key in ["num_workers", "pin_memory", "persistent_workers"]:
+        if getattr(args, key) is not None:
+            loader_cfg[key] = getattr(args, key)
+
+    return config
+
+
+def main(args=None):
+    args = parse_args(args)
+    config = apply_args(load_config(args.config), args)
+
+    trainer = Trainer(config, args.model, args.model_num)
+
+    if args.evaluate:
+        print(trainer.evaluate(args.evaluate))
+    else:
+        best_model = trainer.train()
+        if best_model is not None:
+            print(trainer.evaluate(best_model))
+
+
+if __name__ == "__main__":
+    main()
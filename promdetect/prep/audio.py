@@ -0,0 +1,257 @@
+"""
+Memory-mapped access to WAV recordings, shared by the extractors of all pipelines.
+
+`pm.Sound(path)` decodes a whole recording into a new float64 buffer for every extractor.
+`WavFile` instead maps the sample data of a PCM or IEEE float WAV file into memory and converts only the samples that are
+requested to float32, so queries on short segments (RMS, zero crossings) do not need the whole recording in memory.
+A Praat Sound object of the recording is built only when a Praat analysis needs it, and then once per recording:
+`open_wav()` returns the same `WavFile` for the same path, keeping the most recently used recordings open.
+The pipelines call `WavFile.release()` once their Praat analyses are done, so open recordings keep only the mapped samples.
+"""
+
+import os
+import struct
+from functools import lru_cache
+
+import numpy as np
+import parselmouth as pm
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Number of recordings kept open by `open_wav()`, e.g. for the frame, word and nucleus pipelines of one recording
+CACHE_SIZE = 2
+
+
+class WavFile(object):
+    """
+    Memory-mapped WAV file.
+    path: Path to a WAV file with 8, 16, 24 or 32 bit PCM or 32/64 bit float samples.
+    Sample times follow Praat, i.e. sample i lies at (i + 0.5) / sample_rate.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+
+        with open(self.path, "rb") as wav:
+            header = read_header(wav)
+
+        (
+            self.format,
+            self.num_channels,
+            self.sample_rate,
+            self.sample_width,
+            data_offset,
+            data_size,
+        ) = header
+
+        # Size of the data chunk is not always set in streamed recordings
+        data_size = min(data_size, os.path.getsize(self.path) - data_offset)
+        self.num_samples = data_size // (self.num_channels * self.sample_width)
+        self.x1 = 0.5 / self.sample_rate
+        self.dx = 1 / self.sample_rate
+
+        shape = (self.num_samples, self.num_channels)
+        if self.sample_width == 3:
+            # No numpy type for 24 bit samples, bytes are combined when samples are read
+            dtype, shape = "u1", shape + (3,)
+        else:
+            dtype = sample_type(self.format, self.sample_width)
+
+        self.data = np.memmap(
+            self.path, dtype=dtype, mode="r", offset=data_offset, shape=shape
+        )
+        self._sound = None
+
+    @property
+    def duration(self):
+        return self.num_samples / self.sample_rate
+
+    def samples(self, start=0, end=None, channel=None, dtype="float32"):
+        """
+        Samples `start` to `end` (exclusive) as values in [-1, 1], shaped (channels x samples) like `pm.Sound.values`.
+        channel: Index of a single channel, which is then returned as a one-dimensional array.
+        Float32 samples are returned as views on the mapped file, other formats are converted.
+        dtype: Float type of the returned samples, float64 gives the values of Praat for all formats.
+        """
+
+        data = (
+            self.data[start:end] if channel is None else self.data[start:end, channel]
+        )
+
+        return to_float(data, self.format, self.sample_width, dtype).T
+
+    def segment(self, from_time, to_time, channel=None):
+        """
+        Samples whose time lies within an interval, as selected by Praat's queries and `extract_part()`.
+        """
+
+        first, last = self.window(from_time, to_time)
+
+        return self.samples(first, last + 1, channel)
+
+    def window(self, starts, ends):
+        """
+        First and last sample within each interval.
+        """
+
+        first = np.maximum(np.ceil((np.asarray(starts) - self.x1) / self.dx), 0)
+        last = np.minimum(
+            np.floor((np.asarray(ends) - self.x1) / self.dx), self.num_samples - 1
+        )
+
+        return first.astype("int64"), np.maximum(last, first - 1).astype("int64")
+
+    def rms(self, starts, ends):
+        """
+        Root-mean-square over all channels within each interval, as "Get root-mean-square" in Praat.
+        Intervals without samples are NaN.
+        """
+
+        starts, ends = np.atleast_1d(starts), np.atleast_1d(ends)
+        valid = ~(np.isnan(starts) | np.isnan(ends))
+        first, last = self.window(np.where(valid, starts, 0), np.where(valid, ends, -1))
+
+        rms = np.full(len(first), np.nan)
+        for pos in np.flatnonzero(valid & (last >= first)):
+            segment = self.samples(first[pos], last[pos] + 1, dtype="float64")
+            rms[pos] = np.sqrt(np.sum(segment * segment) / segment.size)
+
+        return rms
+
+    def zero_crossings(self, starts, ends, channel=0):
+        """
+        Number of zero crossings within each interval, in both directions,
+        as "To PointProcess (zeroes)" on the extracted part of the sound in Praat.
+        """
+
+        first, last = self.window(np.atleast_1d(starts), np.atleast_1d(ends))
+
+        counts = np.zeros(len(first), dtype="int64")
+        for pos in np.flatnonzero(last > first):
+            negative = np.signbit(self.samples(first[pos], last[pos] + 1, channel))
+            counts[pos] = np.count_nonzero(negative[1:] != negative[:-1])
+
+        return counts
+
+    def sound(self):
+        """
+        Praat Sound object of the whole recording, built on first use and kept for later analyses.
+        """
+
+        if self._sound is None:
+            self._sound = pm.Sound(
+                self.samples(dtype="float64"), sampling_frequency=self.sample_rate
+            )
+
+        return self._sound
+
+    def release(self):
+        """
+        Drop the Praat Sound object, e.g. once all Praat analyses of a recording are done.
+        """
+
+        self._sound = None
+
+
+def open_wav(path):
+    """
+    `WavFile` of a path, shared by all callers in a process until the file changes.
+    """
+
+    stat = os.stat(path)
+
+    return _open_wav(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def as_wav(wav_file):
+    """
+    `WavFile` of a path, or the object itself if it is one already.
+    """
+
+    if isinstance(wav_file, WavFile):
+        return wav_file
+
+    return open_wav(wav_file)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _open_wav(path, mtime, size):
+    return WavFile(path)
+
+
+# ANCILLARY FUNCTIONS
+def read_header(wav):
+    """
+    Format, channels, sample rate, bytes per sample, and offset and size of the sample data of a WAV file.
+    """
+
+    riff, _, wave = struct.unpack("<4sI4s", wav.read(12))
+    if riff != b"RIFF" or wave != b"WAVE":
+        raise ValueError(f"{wav.name} is not a WAV file")
+
+    fmt = None
+    while True:
+        chunk_header = wav.read(8)
+        if len(chunk_header) < 8:
+            raise ValueError(f"{wav.name} has no data chunk")
+
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+
+        if chunk_id == b"fmt ":
+            chunk = wav.read(chunk_size)
+            audio_format, num_channels, sample_rate, _, _, bits = struct.unpack(
+                "<HHIIHH", chunk[:16]
+            )
+            if audio_format == WAVE_FORMAT_EXTENSIBLE:
+                # Format code in the first two bytes of the sub format GUID
+                audio_format = struct.unpack("<H", chunk[24:26])[0]
+            fmt = (audio_format, num_channels, sample_rate, bits // 8)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError(f"{wav.name} has no format chunk before the data")
+            return fmt + (wav.tell(), chunk_size)
+        else:
+            # Chunks are padded to an even size
+            wav.seek(chunk_size + chunk_size % 2, 1)
+
+        if chunk_id == b"fmt " and chunk_size % 2:
+            wav.seek(1, 1)
+
+
+def sample_type(audio_format, sample_width):
+    types = {
+        (WAVE_FORMAT_PCM, 1): "u1",
+        (WAVE_FORMAT_PCM, 2): "<i2",
+        (WAVE_FORMAT_PCM, 4): "<i4",
+        (WAVE_FORMAT_IEEE_FLOAT, 4): "<f4",
+        (WAVE_FORMAT_IEEE_FLOAT, 8): "<f8",
+    }
+
+    if (audio_format, sample_width) not in types:
+        raise ValueError(
+            f"Unsupported WAV format {audio_format} with {8 * sample_width} bit samples"
+        )
+
+    return types[(audio_format, sample_width)]
+
+
+def to_float(data, audio_format, sample_width, dtype="float32"):
+    """
+    Scale samples to [-1, 1] like Praat.
+    """
+
+    dtype = np.dtype(dtype)
+
+    if audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        return data.astype(dtype, copy=False)
+
+    if sample_width == 1:
+        return (data.astype(dtype) - dtype.type(128)) / dtype.type(128)
+    if sample_width == 3:
+        data = data.astype("int32")
+        data = data[..., 0] | (data[..., 1] << 8) | (data[..., 2] << 16)
+        data = np.where(data >= 1 << 23, data - (1 << 24), data)
+
+    return data.astype(dtype) / dtype.type(1 << (8 * sample_width - 1))
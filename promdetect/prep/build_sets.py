@@ -0,0 +1,284 @@
+"""
+Builder for the training sets of the nucleus- and word-level classifiers, from the extracted per-recording feature tables.
+
+Each recording is processed on its own, in a pool of worker processes with num_workers > 1:
+- Word-level accent labels are aligned with the words by a sorted interval join of the accent times,
+  nucleus tables already carry the accent label of each nucleus (see `find_syllable_nuclei.assign_points_labels()`)
+- Features are pre-processed as for the thesis models (see the `process_features` modules)
+- Rows are split into sequences: words into utterances between two pauses (<P>),
+  nuclei into one sequence per recording or per intonation phrase
+
+Each set is written as one array of all rows and an offsets array, see `write_ragged()`.
+`models.datasets.load_set()` splits them back into one array per sequence.
+A table of the sequences (recording, start and end time, number of rows) is written next to the sets.
+
+Usage: promdetect-build-sets word data/features/word_based data/features/word_based/sets --annotations-dir DIRNDL-prosody --num-workers 4
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from promdetect.prep import process_annotations, process_features
+from promdetect.word_based import process_features as word_features
+from promdetect.word_based.extract_word_features import find_spans
+
+LEVELS = ["nucleus", "word"]
+
+
+class SetBuilder(object):
+    """
+    Build the training sets of one level from a directory of feature tables.
+    level: "nucleus" for the tables of `prepare_data.py`, "word" for the tables of `word_based/prep_data.py`.
+    feature_dir: Directory with one feature table (CSV) per recording, named after the recording.
+    annotations_dir: Directory with the `.accents` annotations of the recordings, required on the word level.
+    by_ip: Split nuclei into intonation phrases instead of one sequence per recording.
+    """
+
+    def __init__(self, level, feature_dir, annotations_dir=None, by_ip=False):
+        if level not in LEVELS:
+            raise ValueError(f"Argument 'level' must be one of {LEVELS}")
+        if level == "word" and annotations_dir is None:
+            raise ValueError("Word-level sets require the accent annotations")
+
+        self.level = level
+        self.annotations_dir = annotations_dir
+        self.by_ip = by_ip
+
+        # Recording IDs are the file names up to the first dot, e.g. `<recording>.csv`
+        self.files = {
+            Path(file).name.split(".")[0]: file
+            for file in sorted(glob(f"{feature_dir}/dlf*"))
+        }
+
+    def build(self, recordings=None, num_workers=1):
+        """
+        Build the sequences of all recordings, or of the given ones.
+        Returns the rows of all sequences as (features, labels) arrays and a table of the sequences.
+        """
+
+        if recordings is None:
+            recordings = list(self.files)
+
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = list(executor.map(self.build_recording, recordings))
+        else:
+            results = [self.build_recording(recording) for recording in recordings]
+
+        features = np.concatenate([result[0] for result in results])
+        labels = np.concatenate([result[1] for result in results])
+        sequences = pd.concat([result[2] for result in results], ignore_index=True)
+
+        return features, labels, sequences
+
+    def build_recording(self, recording):
+        """
+        Features, labels and sequence table of one recording.
+        """
+
+        table = pd.read_csv(self.files[recording], index_col=0)
+
+        if self.level == "nucleus":
+            gender = process_annotations.speaker_registry().gender(recording)
+            features, labels, sequences = nucleus_sequences(table, gender, self.by_ip)
+        else:
+            accents = process_annotations.AnnotationReader(
+                str(Path(self.annotations_dir).joinpath(f"{recording}.accents"))
+            ).get_annotation_data()
+            features, labels, sequences = word_sequences(table, accents)
+
+        sequences.insert(0, "recording", recording)
+
+        return features, labels, sequences
+
+    def write(self, out_dir, recordings=None, num_workers=1):
+        """
+        Build the sets and write `<level>_features.npy`, `<level>_labels.npy` with their offsets,
+        and `<level>_sequences.csv` to `out_dir`.
+        """
+
+        features, labels, sequences = self.build(recordings, num_workers)
+
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        lengths = sequences["length"].to_numpy()
+        write_ragged(out_dir.joinpath(f"{self.level}_features.npy"), features, lengths)
+        write_ragged(out_dir.joinpath(f"{self.level}_labels.npy"), labels, lengths)
+        sequences.to_csv(out_dir.joinpath(f"{self.level}_sequences.csv"), index=False)
+
+        return sequences
+
+
+def nucleus_sequences(table, gender, by_ip=False):
+    """
+    Pre-processed features and binary accent labels of the nuclei of one recording.
+    Returns (features, labels, sequences), with the start and end time and number of nuclei of each sequence.
+    """
+
+    nuclei, features = process_features.to_sequence(table, gender)
+    labels = nuclei["has_accent"].to_numpy(dtype="int8")
+
+    if by_ip:
+        # Nuclei outside of intonation phrases are not part of any sequence
+        ip_starts = nuclei["ip_start"].to_numpy(dtype="float64")
+        ip_ends = nuclei["ip_end"].to_numpy(dtype="float64")
+        in_ip = ~(np.isnan(ip_starts) | np.isnan(ip_ends))
+
+        features, labels = features[in_ip], labels[in_ip]
+        bounds = split_points(ip_starts[in_ip], ip_ends[in_ip])
+        starts, ends = ip_starts[in_ip][bounds[:-1]], ip_ends[in_ip][bounds[:-1]]
+    else:
+        bounds = np.array([0, len(nuclei)])
+        starts = nuclei["start_est"].to_numpy(dtype="float64")[:1]
+        ends = nuclei["end"].to_numpy(dtype="float64")[-1:]
+
+    sequences = pd.DataFrame({"start": starts, "end": ends, "length": np.diff(bounds)})
+
+    return features, labels, sequences
+
+
+def word_sequences(table, accents):
+    """
+    Pre-processed features and binary accent labels of the words of one recording, split into utterances at pauses.
+    Returns (features, labels, sequences), with the start and end time and number of words of each utterance.
+    """
+
+    labels = accent_labels(table, accents)
+
+    words, rows = word_features.to_rows(table)
+    labels = labels[table.index.get_indexer(words.index)]
+
+    # Utterances lie between two consecutive pauses, or the start or end of the recording
+    is_pause = (words["label"] == word_features.PAUSE).to_numpy()
+    utterance = np.cumsum(is_pause)[~is_pause]
+    rows, labels = rows[~is_pause], labels[~is_pause]
+
+    bounds = np.flatnonzero(np.diff(utterance, prepend=-1, append=-1))
+    sequences = pd.DataFrame(
+        {
+            "start": words["start"].to_numpy(dtype="float64")[~is_pause][bounds[:-1]],
+            "end": words["end"].to_numpy(dtype="float64")[~is_pause][bounds[1:] - 1],
+            "length": np.diff(bounds),
+        }
+    )
+
+    return rows, labels, sequences
+
+
+# ANCILLARY FUNCTIONS
+def accent_labels(words, accents):
+    """
+    Binary accent label of each word: 1 if an accent annotation lies within the word, using a sorted interval join.
+    Pauses and words without timestamps are not labelled.
+    """
+
+    is_word = (
+        words["start"].notna()
+        & words["end"].notna()
+        & (words["label"] != word_features.PAUSE)
+    ).to_numpy()
+    word_pos = np.flatnonzero(is_word)
+
+    times = accents["time"].to_numpy(dtype="float64")
+    word_idx = find_spans(
+        times,
+        times,
+        words["start"].to_numpy(dtype="float64")[word_pos],
+        words["end"].to_numpy(dtype="float64")[word_pos],
+    )
+
+    labels = np.zeros(len(words), dtype="int8")
+    labels[word_pos[word_idx[word_idx >= 0]]] = 1
+
+    return labels
+
+
+def split_points(starts, ends):
+    """
+    Boundaries of the runs of consecutive rows with the same (start, end) span, including 0 and the number of rows.
+    """
+
+    changed = np.ones(len(starts), dtype=bool)
+    changed[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1])
+
+    return np.append(np.flatnonzero(changed), len(starts))
+
+
+def offsets_file(path):
+    return Path(path).with_name(f"{Path(path).stem}_offsets.npy")
+
+
+def write_ragged(path, values, lengths):
+    """
+    Store sequences of rows as one `.npy` array of all rows and an `<name>_offsets.npy` array,
+    in which sequence i covers rows offsets[i] to offsets[i + 1].
+    The rows can be memory-mapped, unlike an object array of one array per sequence, and are stored without pickling.
+    """
+
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype("int64")
+    if offsets[-1] != len(values):
+        raise ValueError(
+            f"Sequence lengths add up to {offsets[-1]} rows, but {len(values)} were given"
+        )
+
+    np.save(path, values)
+    np.save(offsets_file(path), offsets)
+
+
+def read_ragged(path):
+    """
+    Sequences stored by `write_ragged()`, as an object array of views on the memory-mapped rows.
+    """
+
+    rows = np.load(path, mmap_mode="r")
+    offsets = np.load(offsets_file(path))
+
+    sequences = np.empty(len(offsets) - 1, dtype=object)
+    for i in range(len(sequences)):
+        sequences[i] = rows[offsets[i] : offsets[i + 1]]
+
+    return sequences
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Build the training sets from the extracted feature tables."
+    )
+    parser.add_argument("level", choices=LEVELS)
+    parser.add_argument(
+        "feature_dir", help="Directory with one feature table per recording"
+    )
+    parser.add_argument("out_dir", help="Directory to write the sets to")
+    parser.add_argument(
+        "--annotations-dir", help="Directory with the .accents annotations (word level)"
+    )
+    parser.add_argument(
+        "--by-ip",
+        action="store_true",
+        help="One nucleus sequence per intonation phrase",
+    )
+    parser.add_argument("--num-workers", type=int, default=1)
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    builder = SetBuilder(args.level, args.feature_dir, args.annotations_dir, args.by_ip)
+    sequences = builder.write(args.out_dir, num_workers=args.num_workers)
+
+    print(
+        f"Wrote {len(sequences)} sequences with {sequences['length'].sum()} rows "
+        f"from {sequences['recording'].nunique()} recordings to {args.out_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,11 @@ Import necessary packages:
 
 import numpy as np
 import pandas as pd
-import parselmouth as pm
 from parselmouth import praat
 
+from promdetect.prep import audio
+from promdetect.prep.pitch_range import gender_range
+
 
 # ANCILLARY FUNCTION
 def check_input_df(input_df, expected_cols):
@@ -31,25 +33,38 @@ def check_input_df(input_df, expected_cols):
 class Extractor(object):
     """
     Acoustic feature extractor.
-    wav_file: Obligatory, path to a wav-file recording has to be supplied.
+    wav_file: Obligatory, path to a wav-file recording (or a memory-mapped `audio.WavFile`) has to be supplied.
     nuclei: Processed DIRNDL annotation DataFrame on a syllable nucleus basis.
     gender: Gender of the speaker in the recording.
+    pitch_range: (floor, ceiling) of the pitch analysis, e.g. estimated for the speaker (see `pitch_range.PitchRangeCache`).
+    Defaults to the range for the speaker gender.
 
     The class specifies a large number of methods for the individual extraction of features for all nuclei in the provided DataFrame.
     Methods usually call Praat extraction functions that do the main work.
     """
 
-    def __init__(self, wav_file, nuclei="", gender="f"):
+    def __init__(self, wav_file, nuclei="", gender="f", pitch_range=None):
         self.wav_file = wav_file
-        self.snd_obj = pm.Sound(self.wav_file)
+        self.audio = audio.as_wav(wav_file)
         self.nuclei = nuclei
         self.gender = gender
 
         # Different pitch ranges for female and male speakers
-        if gender == "f":
-            self.__pitch_range = (75, 500)
-        else:
-            self.__pitch_range = (50, 300)
+        if pitch_range is None:
+            pitch_range = gender_range(gender)
+        self.__pitch_range = tuple(pitch_range)
+
+        # Positions of the nuclei with values in given columns, see `valid_rows()`
+        self._valid_rows = {}
+        self._valid_nuclei = nuclei
+
+    @property
+    def snd_obj(self):
+        """
+        Praat sound object of the recording, only built once a Praat analysis needs it.
+        """
+
+        return self.audio.sound()
 
     # EXTRACTION FUNCTIONS
     def calc_pitch_parts(self):
@@ -58,20 +73,19 @@ class Extractor(object):
         """
 
         # Only run on nuclei with duration > 60 ms
-        nuclei_filtered = self.nuclei[(self.nuclei["end"] - self.nuclei["start_est"]) >= 0.06].copy()
-
-        nuclei_filtered["part_pitch"] = np.array(
-            [
-                row.part_obj.to_pitch_cc(
-                    pitch_floor=self.__pitch_range[0],
-                    pitch_ceiling=self.__pitch_range[1],
-                )
-                for row in nuclei_filtered.itertuples()
-            ]
+        long_rows = np.flatnonzero(
+            ((self.nuclei["end"] - self.nuclei["start_est"]) >= 0.06).to_numpy()
         )
+        parts = self.nuclei["part_obj"].to_numpy()
 
-        # Consolidate DataFrames
-        self.nuclei["part_pitch"] = nuclei_filtered["part_pitch"]
+        part_pitch = np.full(len(self.nuclei), np.nan, dtype=object)
+        for pos in long_rows:
+            part_pitch[pos] = parts[pos].to_pitch_cc(
+                pitch_floor=self.__pitch_range[0],
+                pitch_ceiling=self.__pitch_range[1],
+            )
+
+        self.nuclei["part_pitch"] = part_pitch
 
     def get_rms(self):
         """
@@ -80,11 +94,9 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        rms_vals = np.array(
-            [
-                self.snd_obj.get_rms(from_time=row.start_est, to_time=row.end)
-                for row in self.nuclei.itertuples()
-            ]
+        rms_vals = self.audio.rms(
+            self.nuclei["start_est"].to_numpy(dtype="float64"),
+            self.nuclei["end"].to_numpy(dtype="float64"),
         )
 
         return rms_vals
@@ -100,22 +112,13 @@ class Extractor(object):
             self.nuclei["end"] - self.nuclei["start_est"], dtype="float64"
         )
 
-        if list(self.nuclei["duration"]) != []:
-
-            # Group IPs and get each one's mean duration
-            ip_mean = (
-                self.nuclei[["ip_start", "ip_end", "duration"]]
-                .groupby(["ip_start", "ip_end"], as_index=False)
-                .mean()
+        if len(self.nuclei) > 0:
+            # Mean duration of each nucleus' IP, NaN for nuclei outside of IPs
+            ip_mean = self.nuclei.groupby(["ip_start", "ip_end"])["duration"].transform(
+                "mean"
             )
-            ip_mean = ip_mean.rename(columns={"duration": "mean_ip_dur"})
 
-            # Consolidate IP mean and nucleus DataFrames, so each nucleus row has info on the corresponding IP's mean duration
-            durs_df = pd.merge(
-                self.nuclei, ip_mean, how="left", on=["ip_start", "ip_end"]
-            )
-
-            normed_durs = (durs_df["duration"] / durs_df["mean_ip_dur"]).to_numpy()
+            normed_durs = (self.nuclei["duration"] / ip_mean).to_numpy()
         else:
             normed_durs = np.empty([])
 
@@ -139,17 +142,12 @@ class Extractor(object):
             else:
                 pass
 
-        nuclei_filtered = self.nuclei[self.nuclei["part_pitch"].notna()].copy()
-
-        nuclei_filtered["pitch_slope"] = np.array(
-            [
-                part_pitch.get_slope_without_octave_jumps()
-                for part_pitch in nuclei_filtered["part_pitch"]
-            ]
+        return self.nucleus_values(
+            lambda part_pitch: part_pitch.get_slope_without_octave_jumps(),
+            columns=("part_pitch",),
+            name="pitch_slope",
         )
 
-        return nuclei_filtered["pitch_slope"]
-
     def get_min_intensity_nuclei(self):
         """
         Extract the minimum intensity value in each syllable nucleus
@@ -157,19 +155,13 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["intens_min"] = np.array(
-            [
-                praat.call(self.int_obj, "Get minimum", row.start_est, row.end, "None")
-                for row in nuclei_filtered.itertuples()
-            ]
+        return self.nucleus_values(
+            lambda start, end: praat.call(
+                self.int_obj, "Get minimum", start, end, "None"
+            ),
+            name="intens_min",
         )
 
-        return nuclei_filtered["intens_min"]
-
     def get_max_intensity_nuclei(self):
         """
         Extract the maximum intensity value in each syllable nucleus
@@ -177,19 +169,13 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["intens_max"] = np.array(
-            [
-                praat.call(self.int_obj, "Get maximum", row.start_est, row.end, "None")
-                for row in nuclei_filtered.itertuples()
-            ]
+        return self.nucleus_values(
+            lambda start, end: praat.call(
+                self.int_obj, "Get maximum", start, end, "None"
+            ),
+            name="intens_max",
         )
 
-        return nuclei_filtered["intens_max"]
-
     def get_mean_intensity_nuclei(self):
         """
         Extract the mean intensity value for each nucleus
@@ -197,19 +183,13 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["intens_mean"] = np.array(
-            [
-                praat.call(self.int_obj, "Get mean", row.start_est, row.end, "energy")
-                for row in nuclei_filtered.itertuples()
-            ]
+        return self.nucleus_values(
+            lambda start, end: praat.call(
+                self.int_obj, "Get mean", start, end, "energy"
+            ),
+            name="intens_mean",
         )
 
-        return nuclei_filtered["intens_mean"]
-
     def get_intensity_std_nuclei(self):
         """
         Extract the standard deviation for intensity values across each syllable nucleus
@@ -217,21 +197,13 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["intens_std"] = np.array(
-            [
-                praat.call(
-                    self.int_obj, "Get standard deviation", row.start_est, row.end
-                )
-                for row in nuclei_filtered.itertuples()
-            ]
+        return self.nucleus_values(
+            lambda start, end: praat.call(
+                self.int_obj, "Get standard deviation", start, end
+            ),
+            name="intens_std",
         )
 
-        return nuclei_filtered["intens_std"]
-
     def get_min_intensity_pos(self):
         """
         Extract the relative position of the intensity minimum within the syllable nucleus
@@ -239,19 +211,13 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["intens_min_pos"] = np.array(
-            [
-                self.relative_position("minimum", "intensity", row.start_est, row.end)
-                for row in nuclei_filtered.itertuples()
-            ]
+        return self.nucleus_values(
+            lambda start, end: self.relative_position(
+                "minimum", "intensity", start, end
+            ),
+            name="intens_min_pos",
         )
 
-        return nuclei_filtered["intens_min_pos"]
-
     def get_max_intensity_pos(self):
         """
         Extract the relative position of the intensity maximum within the syllable nucleus
@@ -259,19 +225,13 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["intens_max_pos"] = np.array(
-            [
-                self.relative_position("maximum", "intensity", row.start_est, row.end)
-                for row in nuclei_filtered.itertuples()
-            ]
+        return self.nucleus_values(
+            lambda start, end: self.relative_position(
+                "maximum", "intensity", start, end
+            ),
+            name="intens_max_pos",
         )
 
-        return nuclei_filtered["intens_max_pos"]
-
     def get_intensity_ip(self):
         """
         Extract the mean intensity value for each intonation phrase
@@ -279,21 +239,15 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["ip_start", "ip_end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["ip_start"].notna()) & (self.nuclei["ip_end"].notna())
-        ].copy()
-
-        nuclei_filtered[
-            "intens_avg"
-        ] = np.array(  # TODO: this runs for each row, not for each IP
-            [
-                praat.call(self.int_obj, "Get mean", row.ip_start, row.ip_end, "energy")
-                for row in nuclei_filtered.itertuples()
-            ]
+        # TODO: this runs for each row, not for each IP
+        return self.nucleus_values(
+            lambda start, end: praat.call(
+                self.int_obj, "Get mean", start, end, "energy"
+            ),
+            columns=("ip_start", "ip_end"),
+            name="intens_avg",
         )
 
-        return nuclei_filtered["intens_avg"]
-
     def get_f0_max_nuclei(self):
         """
         Extract the F0 peak value in each syllable nucleus
@@ -301,18 +255,12 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["f0_max"] = [
-            praat.call(
-                self.pitch_obj, "Get maximum", row.start_est, row.end, "Hertz", "None",
-            )
-            for row in nuclei_filtered.itertuples()
-        ]
-
-        f0_max = nuclei_filtered["f0_max"]
+        f0_max = self.nucleus_values(
+            lambda start, end: praat.call(
+                self.pitch_obj, "Get maximum", start, end, "Hertz", "None"
+            ),
+            name="f0_max",
+        )
 
         # Add to main DataFrame for other functions to use
         self.nuclei["f0_max"] = f0_max
@@ -326,18 +274,12 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["f0_min"] = [
-            praat.call(
-                self.pitch_obj, "Get minimum", row.start_est, row.end, "Hertz", "None",
-            )
-            for row in nuclei_filtered.itertuples()
-        ]
-
-        f0_min = nuclei_filtered["f0_min"]
+        f0_min = self.nucleus_values(
+            lambda start, end: praat.call(
+                self.pitch_obj, "Get minimum", start, end, "Hertz", "None"
+            ),
+            name="f0_min",
+        )
 
         # Add to main DataFrame for other functions to use
         self.nuclei["f0_min"] = f0_min
@@ -351,18 +293,12 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["f0_mean"] = [
-            praat.call(self.pitch_obj, "Get mean", row.start_est, row.end, "Hertz")
-            for row in nuclei_filtered.itertuples()
-        ]
-
-        f0_mean = nuclei_filtered["f0_mean"]
-
-        return f0_mean
+        return self.nucleus_values(
+            lambda start, end: praat.call(
+                self.pitch_obj, "Get mean", start, end, "Hertz"
+            ),
+            name="f0_mean",
+        )
 
     def get_f0_range_nuclei(self):
         """
@@ -382,22 +318,12 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["f0_std"] = [
-            praat.call(
-                self.pitch_obj,
-                "Get standard deviation",
-                row.start_est,
-                row.end,
-                "Hertz",
-            )
-            for row in nuclei_filtered.itertuples()
-        ]
-
-        f0_std = nuclei_filtered["f0_std"]
+        f0_std = self.nucleus_values(
+            lambda start, end: praat.call(
+                self.pitch_obj, "Get standard deviation", start, end, "Hertz"
+            ),
+            name="f0_std",
+        )
 
         # Add to main DataFrame for other functions to use
         self.nuclei["f0_std"] = f0_std
@@ -411,16 +337,10 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["f0_min_pos"] = [
-            self.relative_position("minimum", "pitch", row.start_est, row.end)
-            for row in nuclei_filtered.itertuples()
-        ]
-
-        return nuclei_filtered["f0_min_pos"]
+        return self.nucleus_values(
+            lambda start, end: self.relative_position("minimum", "pitch", start, end),
+            name="f0_min_pos",
+        )
 
     def get_f0_max_pos(self):
         """
@@ -429,16 +349,10 @@ class Extractor(object):
 
         check_input_df(self.nuclei, ["start_est", "end"])
 
-        nuclei_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        nuclei_filtered["f0_max_pos"] = [
-            self.relative_position("maximum", "pitch", row.start_est, row.end)
-            for row in nuclei_filtered.itertuples()
-        ]
-
-        return nuclei_filtered["f0_max_pos"]
+        return self.nucleus_values(
+            lambda start, end: self.relative_position("maximum", "pitch", start, end),
+            name="f0_max_pos",
+        )
 
     def get_excursion(self, level=""):
         """
@@ -447,59 +361,35 @@ class Extractor(object):
 
         if level == "word":
             check_input_df(self.nuclei, ["word_start", "word_end", "f0_max"])
-
-            timestamps_filtered = self.nuclei[
-                (self.nuclei["word_start"].notna()) & (self.nuclei["word_end"].notna())
-            ].copy()
-
-            # Calculate 10th percentile of the pitch contour during nucleus
-            timestamps_filtered["f0_q10"] = [
-                praat.call(
-                    self.pitch_obj,
-                    "Get quantile",
-                    row.word_start,
-                    row.word_end,
-                    0.1,
-                    "Hertz",
-                )
-                for row in timestamps_filtered.itertuples()
-            ]
-
-            norm_df = pd.merge(self.nuclei, timestamps_filtered, how="left")
-
+            columns = ("word_start", "word_end")
         elif level == "ip":
             check_input_df(self.nuclei, ["ip_start", "ip_end", "f0_max"])
+            columns = ("ip_start", "ip_end")
+        else:
+            raise ValueError("Argument 'level' must be one of ['word', 'ip']")
 
-            nuclei_filtered = self.nuclei[
-                (self.nuclei["ip_start"].notna()) & (self.nuclei["ip_end"].notna())
-            ].copy()
-
-            timestamps_filtered = nuclei_filtered[
-                ["ip_start", "ip_end"]
-            ].drop_duplicates()
-
-            # Calculate 10th percentile of the pitch contour during nucleus
-            timestamps_filtered["f0_q10"] = [
-                praat.call(
-                    self.pitch_obj,
-                    "Get quantile",
-                    row.ip_start,
-                    row.ip_end,
-                    0.1,
-                    "Hertz",
-                )
-                for row in timestamps_filtered.itertuples()
-            ]
+        rows = self.valid_rows(*columns)
+        spans = np.stack(
+            [self.nuclei[column].to_numpy(dtype="float64")[rows] for column in columns],
+            axis=1,
+        )
 
-            norm_df = pd.merge(
-                self.nuclei, timestamps_filtered, on=["ip_start", "ip_end"], how="left"
-            )
+        # Calculate 10th percentile of the pitch contour once per word or IP
+        unique_spans, span_idx = np.unique(spans, axis=0, return_inverse=True)
+        span_q10 = np.array(
+            [
+                praat.call(self.pitch_obj, "Get quantile", start, end, 0.1, "Hertz")
+                for start, end in unique_spans
+            ]
+        )
 
-        else:
-            raise ValueError("Argument 'level' must be one of ['word', 'ip']")
+        f0_q10 = np.full(len(self.nuclei), np.nan)
+        f0_q10[rows] = span_q10[span_idx.reshape(-1)]
 
         # Calculate excursion: 12 * log2(F0_max/F0_10%)
-        excursions = np.array(12 * np.log2(norm_df["f0_max"] / norm_df["f0_q10"]))
+        excursions = np.array(
+            12 * np.log2(self.nuclei["f0_max"].to_numpy(dtype="float64") / f0_q10)
+        )
 
         return excursions
 
@@ -517,34 +407,11 @@ class Extractor(object):
         if "part_obj" not in self.nuclei.columns:
             self.extract_parts()
 
-        timestamps_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        def calc_tilt(
-            part_obj, start, end
-        ):  # ancillary function to calculcate spectral tilt as mean C1 value over syllable nucleus
-
-            # nucleus length needs to be at least 30 ms for analysis (2 * analysis frame length)
-            if (end - start) > 0.03:
-                nucl_mfcc = part_obj.to_mfcc(
-                    number_of_coefficients=1, window_length=0.01
-                )
-                # C1 is second element in MFCC array
-                nucl_tilt = np.mean(nucl_mfcc.to_array()[1])
-
-            else:
-                nucl_tilt = np.nan
-            return nucl_tilt
-
-        timestamps_filtered["tilt_mean"] = [
-            calc_tilt(row.part_obj, row.start_est, row.end)
-            for row in timestamps_filtered.itertuples()
-        ]
-
-        tilt_mean = timestamps_filtered["tilt_mean"]
-
-        return tilt_mean
+        return self.nucleus_values(
+            lambda start, end, part_obj: np.mean(part_c1(part_obj, start, end)),
+            inputs=("start_est", "end", "part_obj"),
+            name="tilt_mean",
+        )
 
     def get_spectral_tilt_range(self):
         """
@@ -559,36 +426,15 @@ class Extractor(object):
         if "part_obj" not in self.nuclei.columns:
             self.extract_parts()
 
-        timestamps_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        def calc_tilt_range(
-            part_obj, start, end
-        ):  # ancillary function to calculcate spectral tilt as mean C1 value over syllable nucleus
-
-            # Nucleus length needs to be at least 30 ms for analysis (2 * analysis frame length)
-            if (end - start) > 0.03:
-                nucl_mfcc = part_obj.to_mfcc(
-                    number_of_coefficients=1, window_length=0.01
-                ).to_array()[
-                    1
-                ]  # C1 is second element in MFCC array
-                nucl_tilt = max(nucl_mfcc) - min(nucl_mfcc)
-
-            else:
-                nucl_tilt = np.nan
-
-            return nucl_tilt
-
-        timestamps_filtered["tilt_range"] = [
-            calc_tilt_range(row.part_obj, row.start_est, row.end)
-            for row in timestamps_filtered.itertuples()
-        ]
+        def calc_tilt_range(start, end, part_obj):
+            nucl_mfcc = part_c1(part_obj, start, end)
+            return max(nucl_mfcc) - min(nucl_mfcc)
 
-        tilt_range = timestamps_filtered["tilt_range"]
-
-        return tilt_range
+        return self.nucleus_values(
+            calc_tilt_range,
+            inputs=("start_est", "end", "part_obj"),
+            name="tilt_range",
+        )
 
     def get_min_spectral_tilt(self):
         """
@@ -603,36 +449,11 @@ class Extractor(object):
         if "part_obj" not in self.nuclei.columns:
             self.extract_parts()
 
-        timestamps_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        def calc_min_tilt(
-            part_obj, start, end
-        ):  # ancillary function to calculcate spectral tilt as minimum C1 value over syllable nucleus
-
-            # Nucleus length needs to be at least 30 ms for analysis (2 * analysis frame length)
-            if (end - start) > 0.03:
-                nucl_mfcc = part_obj.to_mfcc(
-                    number_of_coefficients=1, window_length=0.01
-                ).to_array()[
-                    1
-                ]  # C1 is second element in MFCC array
-                nucl_tilt = min(nucl_mfcc)
-
-            else:
-                nucl_tilt = np.nan
-
-            return nucl_tilt
-
-        timestamps_filtered["min_tilt"] = [
-            calc_min_tilt(row.part_obj, row.start_est, row.end)
-            for row in timestamps_filtered.itertuples()
-        ]
-
-        min_tilt = timestamps_filtered["min_tilt"]
-
-        return min_tilt
+        return self.nucleus_values(
+            lambda start, end, part_obj: min(part_c1(part_obj, start, end)),
+            inputs=("start_est", "end", "part_obj"),
+            name="min_tilt",
+        )
 
     def get_max_spectral_tilt(self):
         """
@@ -647,36 +468,11 @@ class Extractor(object):
         if "part_obj" not in self.nuclei.columns:
             self.extract_parts()
 
-        timestamps_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        def calc_max_tilt(
-            part_obj, start, end
-        ):  # ancillary function to calculcate spectral tilt as maximum C1 value over syllable nucleus
-
-            # Nucleus length needs to be at least 30 ms for analysis (2 * analysis frame length)
-            if (end - start) > 0.03:
-                nucl_mfcc = part_obj.to_mfcc(
-                    number_of_coefficients=1, window_length=0.01
-                ).to_array()[
-                    1
-                ]  # C1 is second element in MFCC array
-                nucl_tilt = max(nucl_mfcc)
-
-            else:
-                nucl_tilt = np.nan
-
-            return nucl_tilt
-
-        timestamps_filtered["max_tilt"] = [
-            calc_max_tilt(row.part_obj, row.start_est, row.end)
-            for row in timestamps_filtered.itertuples()
-        ]
-
-        max_tilt = timestamps_filtered["max_tilt"]
-
-        return max_tilt
+        return self.nucleus_values(
+            lambda start, end, part_obj: max(part_c1(part_obj, start, end)),
+            inputs=("start_est", "end", "part_obj"),
+            name="max_tilt",
+        )
 
     def get_spectral_cog(self):
         """
@@ -689,23 +485,12 @@ class Extractor(object):
         if "part_obj" not in self.nuclei.columns:
             self.extract_parts()
 
-        timestamps_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
         # Requires spectrum object for each nucleus slice
-        timestamps_filtered["spec_part"] = [
-            row.part_obj.to_spectrum() for row in timestamps_filtered.itertuples()
-        ]
-
-        timestamps_filtered["cog"] = [
-            row.spec_part.get_center_of_gravity()
-            for row in timestamps_filtered.itertuples()
-        ]
-
-        cog = timestamps_filtered["cog"]
-
-        return cog
+        return self.nucleus_values(
+            lambda part_obj: part_obj.to_spectrum().get_center_of_gravity(),
+            inputs=("part_obj",),
+            name="cog",
+        )
 
     def get_h1_h2(self):
         """
@@ -725,22 +510,16 @@ class Extractor(object):
             else:
                 pass
 
-        timestamps_filtered = self.nuclei[
-            (self.nuclei["start_est"].notna()) & (self.nuclei["end"].notna())
-        ].copy()
-
-        def calc_h1_h2(row):
+        def calc_h1_h2(start, end, part_obj):
             # Calculate bounds for more accurate Pitch object
             q25 = 0.75 * praat.call(
-                self.pitch_obj, "Get quantile", row.start_est, row.end, 0.25, "Hertz"
+                self.pitch_obj, "Get quantile", start, end, 0.25, "Hertz"
             )
             q75 = 2.5 * praat.call(
-                self.pitch_obj, "Get quantile", row.start_est, row.end, 0.75, "Hertz"
+                self.pitch_obj, "Get quantile", start, end, 0.75, "Hertz"
             )
             try:
-                pitch_part = row.part_obj.to_pitch_cc(
-                    pitch_floor=q25, pitch_ceiling=q75
-                )
+                pitch_part = part_obj.to_pitch_cc(pitch_floor=q25, pitch_ceiling=q75)
 
                 # Get H1 (F0) and H2 frequencies, calculate their bandwidths.
                 h1_freq = praat.call(pitch_part, "Get mean", 0, 0, "Hertz")
@@ -751,10 +530,10 @@ class Extractor(object):
 
                 # Filter sound signal for area around H1 and H2
                 h1_filt_snd = praat.call(
-                    row.part_obj, "Filter (one formant)", h1_freq, h1_bw
+                    part_obj, "Filter (one formant)", h1_freq, h1_bw
                 )
                 h2_filt_snd = praat.call(
-                    row.part_obj, "Filter (one formant)", h2_freq, h2_bw
+                    part_obj, "Filter (one formant)", h2_freq, h2_bw
                 )
 
                 # Get intensity of filter bands
@@ -768,15 +547,46 @@ class Extractor(object):
             except Exception:
                 return np.nan
 
-        timestamps_filtered["h1_h2"] = [
-            calc_h1_h2(row) for row in timestamps_filtered.itertuples()
-        ]
+        return self.nucleus_values(
+            calc_h1_h2, inputs=("start_est", "end", "part_obj"), name="h1_h2"
+        )
 
-        h1_h2 = timestamps_filtered["h1_h2"]
+    # ANCILLARY FUNCTIONS
+    def valid_rows(self, *columns):
+        """
+        Positions of the nuclei with values in all of the given columns, e.g. both timestamps.
+        Computed once per combination of columns, as the nuclei of an extractor do not change.
+        """
 
-        return h1_h2
+        if self._valid_nuclei is not self.nuclei:
+            self._valid_rows = {}
+            self._valid_nuclei = self.nuclei
+
+        if columns not in self._valid_rows:
+            self._valid_rows[columns] = np.flatnonzero(
+                self.nuclei[list(columns)].notna().all(axis=1).to_numpy()
+            )
+
+        return self._valid_rows[columns]
+
+    def nucleus_values(
+        self, func, columns=("start_est", "end"), inputs=None, name=None
+    ):
+        """
+        Evaluate `func` for each nucleus with values in all `columns`, passing the values of `inputs` (defaults to `columns`).
+        Values are written into a preallocated array instead of a column of a filtered copy of `self.nuclei`.
+        Returns a Series on the index of the evaluated nuclei.
+        """
+
+        rows = self.valid_rows(*columns)
+        args = [self.nuclei[column].to_numpy()[rows] for column in inputs or columns]
+
+        values = np.empty(len(rows), dtype="float64")
+        for pos in range(len(rows)):
+            values[pos] = func(*(arg[pos] for arg in args))
+
+        return pd.Series(values, index=self.nuclei.index[rows], name=name)
 
-    # ANCILLARY FUNCTIONS
     def relative_position(self, extremum, type, start, end):
         """
         Calculate the relative position of either a maximum or minimum value within a timespan delimited by start and end timestamps
@@ -810,7 +620,10 @@ class Extractor(object):
         Calculate Praat intensity object from sound object
         """
 
-        self.int_obj = self.snd_obj.to_intensity(minimum_pitch=self.__pitch_range[0])
+        # Intensity smoothing depends on the gender only, not on a narrowed pitch range
+        self.int_obj = self.snd_obj.to_intensity(
+            minimum_pitch=gender_range(self.gender)[0]
+        )
 
     def calc_pitch(self):
         """
@@ -831,3 +644,18 @@ class Extractor(object):
             self.snd_obj.extract_part(from_time=row.start_est, to_time=row.end)
             for row in self.nuclei.itertuples()
         ]
+
+
+def part_c1(part_obj, start, end):
+    """
+    C1 values of the MFCC frames of a nucleus sound slice, as a measure of spectral tilt.
+    Nucleus length needs to be at least 30 ms for analysis (2 * analysis frame length), NaN otherwise.
+    """
+
+    if (end - start) > 0.03:
+        # C1 is second element in MFCC array
+        return part_obj.to_mfcc(
+            number_of_coefficients=1, window_length=0.01
+        ).to_array()[1]
+
+    return np.array([np.nan])
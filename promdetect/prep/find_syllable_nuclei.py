@@ -16,9 +16,10 @@ Import necessary packages:
 `pandas` to manage and output data in a nice format
 """
 from pandas import DataFrame
-import parselmouth as pm
 from parselmouth import praat
 
+from promdetect.prep import audio, schemas
+
 SAMPA_VOWELS = [  # Vowel symbols in SAMPA, to separate vowel timestamps from consonant timestamps
     "a:",
     "e:",
@@ -62,7 +63,7 @@ def get_nucleus_points(sound_file):
     This function determines syllable nuclei in an input sound file.
     """
 
-    snd_raw = pm.Sound(sound_file)
+    snd_raw = audio.as_wav(sound_file).sound()
 
     # Clean parselmouth sound obj object by removing noise using a Praat function.
     # ["Remove noise"] from start [0] to end [0] of the Sound, work with overlapping windows with length [0.025] seconds, filter everything between frequencies [50] Hz to [10_000] Hz with [40] Hz smoothing factor using the ["Spectral subtraction"] noise reduction method.
@@ -167,7 +168,7 @@ def assign_points_labels(nuclei, phones, words, tones, accents):
         assigned_df["duration_est"] = assigned_df["end"] - assigned_df["start_est"]
         assigned_df.round({"duration_est": 4})
 
-    return assigned_df
+    return schemas.enforce(assigned_df, schemas.NUCLEI)
 
 
 def filter_labels(annotation_df, annotation_type):
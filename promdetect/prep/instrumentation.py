@@ -0,0 +1,213 @@
+"""
+Opt-in instrumentation of the extraction pipelines.
+
+For every feature or stage of a recording, the wall time, the number of `praat.call()` invocations,
+the memory allocated by Python and numpy (with `tracemalloc`) and the number of rows processed are recorded.
+Records are appended to a JSON lines file, so the files of a corpus run (including parallel workers) can be
+concatenated and aggregated with `aggregate()`.
+
+Instrumentation is enabled by passing an `Instrumentation` object to `FeatureSet`, by wrapping an extractor with
+`instrument()`, or for the prep_data scripts by setting the environment variable `PROMDETECT_INSTRUMENTATION`
+to the path of the output file.
+Praat calls are counted by replacing `praat.call` while a stage runs, so counts of stages running in parallel threads mix.
+Stages may be nested, e.g. an instrumented method calling another one; the inner stage is then included in the outer one.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+import pandas as pd
+from parselmouth import praat
+
+ENV_VARIABLE = "PROMDETECT_INSTRUMENTATION"
+
+# Methods of the extractors that are instrumented by `instrument()`
+STAGE_PREFIXES = ("get_", "calc_", "extract_parts")
+STAGE_SUFFIXES = ("_extraction",)
+
+_praat_call = praat.call
+_praat_calls = 0
+_active_stages = 0
+
+
+def _counting_call(*args, **kwargs):
+    global _praat_calls
+    _praat_calls += 1
+    return _praat_call(*args, **kwargs)
+
+
+class Instrumentation(object):
+    """
+    Collect measurements of the stages of one recording.
+    recording: Recording ID stored with each record.
+    pipeline: Name of the pipeline, e.g. "nucleus", "frame" or "word".
+    path: JSON lines file the records are appended to by `write()`.
+    trace_memory: Measure allocations with `tracemalloc`, which slows down the extraction.
+    """
+
+    def __init__(self, recording, pipeline, path=None, trace_memory=True):
+        self.recording = recording
+        self.pipeline = pipeline
+        self.path = path
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        Measure the code run within the context as stage `name`.
+        rows: Number of rows processed, either a number or a function called after the stage.
+        """
+
+        global _active_stages
+
+        if _active_stages == 0:
+            praat.call = _counting_call
+        _active_stages += 1
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        calls_before = _praat_calls
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record = {
+                "recording": self.recording,
+                "pipeline": self.pipeline,
+                "stage": name,
+                "seconds": seconds,
+                "praat_calls": _praat_calls - calls_before,
+                "bytes_allocated": None,
+                "peak_bytes": None,
+                "rows": rows() if callable(rows) else rows,
+            }
+
+            if self.trace_memory:
+                memory_after, memory_peak = tracemalloc.get_traced_memory()
+                record["bytes_allocated"] = memory_after - memory_before
+                record["peak_bytes"] = memory_peak - memory_before
+            if started_tracing:
+                tracemalloc.stop()
+
+            _active_stages -= 1
+            if _active_stages == 0:
+                praat.call = _praat_call
+
+            self.records.append(record)
+
+    def write(self, path=None):
+        """
+        Append the records to a JSON lines file, one record per line.
+        """
+
+        path = path or self.path
+        with open(path, "a") as out_file:
+            for record in self.records:
+                out_file.write(json.dumps(record) + "\n")
+
+        self.records = []
+
+
+def stage(instrumentation, name, rows=None):
+    """
+    `Instrumentation.stage()` if instrumentation is enabled, otherwise a context that does nothing.
+    """
+
+    if instrumentation is None:
+        return nullcontext()
+
+    return instrumentation.stage(name, rows)
+
+
+def from_env(recording, pipeline):
+    """
+    Instrumentation writing to the file given by the environment variable `PROMDETECT_INSTRUMENTATION`, None if it is not set.
+    """
+
+    path = os.environ.get(ENV_VARIABLE)
+    if not path:
+        return None
+
+    return Instrumentation(recording, pipeline, path)
+
+
+def instrument(extractor, instrumentation):
+    """
+    Record the extraction methods of an extractor object as stages, e.g. `get_pitch_features()` of a `WordLevelExtractor`.
+    Rows are counted in the feature (or nucleus) table of the extractor after each method.
+    Returns the extractor, whose class is left unchanged.
+    """
+
+    if instrumentation is None:
+        return extractor
+
+    for name in dir(type(extractor)):
+        if name.startswith(STAGE_PREFIXES) or name.endswith(STAGE_SUFFIXES):
+            method = getattr(extractor, name)
+            if callable(method):
+                setattr(
+                    extractor,
+                    name,
+                    _instrumented(method, name, extractor, instrumentation),
+                )
+
+    return extractor
+
+
+def aggregate(records):
+    """
+    Sum the measurements per pipeline and stage over all recordings.
+    records: List of records or paths of JSON lines files written by `Instrumentation.write()`.
+    Returns a table sorted by total time, with the share of each stage in the time of its pipeline.
+    """
+
+    if records and isinstance(records[0], (str, os.PathLike)):
+        records = pd.concat(
+            [pd.read_json(path, lines=True) for path in records], ignore_index=True
+        )
+    else:
+        records = pd.DataFrame(records)
+
+    totals = records.groupby(["pipeline", "stage"]).agg(
+        recordings=("recording", "nunique"),
+        seconds=("seconds", "sum"),
+        praat_calls=("praat_calls", "sum"),
+        bytes_allocated=("bytes_allocated", "sum"),
+        peak_bytes=("peak_bytes", "max"),
+        rows=("rows", "sum"),
+    )
+    totals["share"] = totals["seconds"] / totals.groupby(level="pipeline")[
+        "seconds"
+    ].transform("sum")
+
+    return totals.sort_values("seconds", ascending=False)
+
+
+# ANCILLARY FUNCTIONS
+def _instrumented(method, name, extractor, instrumentation):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with instrumentation.stage(name, rows=lambda: _rows(extractor)):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def _rows(extractor):
+    # Feature table of the frame- and word-level extractors, nucleus table of the nucleus-level extractor
+    table = getattr(extractor, "features", getattr(extractor, "nuclei", None))
+
+    return None if table is None else len(table)
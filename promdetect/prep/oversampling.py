@@ -0,0 +1,361 @@
+"""
+SMOTENC oversampling of the training sets, as used for the balanced nucleus set (`nucleus_features_smotenc.npy`).
+
+Minority-class rows are interpolated with one of their k nearest minority-class neighbours (SMOTE),
+categorical features (e.g. the speaker gender) take the most frequent value among the neighbours (SMOTENC).
+Neighbours are found with a KD-tree or ball tree, in which the categorical features are one-hot encoded
+and scaled by half the median standard deviation of the continuous features, as in imbalanced-learn.
+
+Sequences are oversampled in groups, e.g. per sequence (as for the thesis sets) or per speaker, in a pool of worker processes.
+Synthetic rows are appended to the sequence of the row they were interpolated from.
+Results are cached by a hash of the input sets and the parameters, so unchanged sets are not resampled.
+
+Usage: promdetect-oversample nucleus data/features/nucleus_based/sets --groups speaker --cache-dir cache --num-workers 4
+"""
+
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+
+from promdetect.prep import process_annotations
+from promdetect.prep.build_sets import read_ragged, write_ragged
+from promdetect.prep.process_features import NUCLEUS_FEATURES
+
+ALGORITHMS = ["kd_tree", "ball_tree"]
+
+# Categorical feature columns of the sets of each level, see `build_sets`
+CATEGORICAL = {"nucleus": [NUCLEUS_FEATURES.index("gender")], "word": []}
+
+# Increased when the sampling changes, so cached results of earlier versions are not used
+VERSION = 1
+
+
+class Oversampler(object):
+    """
+    SMOTENC oversampling of ragged (sequences x rows x features) sets.
+    categorical: Indices of the categorical feature columns, none for plain SMOTE.
+    k_neighbors: Number of nearest neighbours to interpolate with.
+    algorithm: Neighbour index, one of "kd_tree" or "ball_tree".
+    seed: Seed of the random generator, each group gets an independent stream derived from it.
+    cache_dir: Directory to store results in, none to disable caching.
+    """
+
+    def __init__(
+        self,
+        categorical=(),
+        k_neighbors=5,
+        algorithm="kd_tree",
+        seed=0,
+        cache_dir=None,
+    ):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Argument 'algorithm' must be one of {ALGORITHMS}")
+
+        self.categorical = list(categorical)
+        self.k_neighbors = k_neighbors
+        self.algorithm = algorithm
+        self.seed = seed
+        self.cache_dir = cache_dir
+
+    def fit_resample(self, features, labels, groups=None, num_workers=1):
+        """
+        Balance the classes within each group of sequences.
+        features, labels: Sequences of (rows x features) and (rows) arrays.
+        groups: Group of each sequence, e.g. the speaker; defaults to one group per sequence.
+        Returns object arrays of the balanced feature and label sequences.
+        """
+
+        if groups is None:
+            groups = np.arange(len(features))
+        groups = np.asarray(groups)
+
+        cache_files = self.cache_files(features, labels, groups)
+        if cache_files is not None and cache_files[0].exists():
+            return read_ragged(cache_files[0]), read_ragged(cache_files[1])
+
+        group_ids = list(dict.fromkeys(groups.tolist()))
+        seeds = np.random.SeedSequence(self.seed).spawn(len(group_ids))
+        tasks = [
+            (
+                [features[i] for i in np.flatnonzero(groups == group)],
+                [labels[i] for i in np.flatnonzero(groups == group)],
+                seed,
+            )
+            for group, seed in zip(group_ids, seeds)
+        ]
+
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = list(executor.map(self.resample_group, tasks))
+        else:
+            results = [self.resample_group(task) for task in tasks]
+
+        balanced_features = np.empty(len(features), dtype=object)
+        balanced_labels = np.empty(len(features), dtype=object)
+        for group, (group_features, group_labels) in zip(group_ids, results):
+            for pos, i in enumerate(np.flatnonzero(groups == group)):
+                balanced_features[i] = group_features[pos]
+                balanced_labels[i] = group_labels[pos]
+
+        if cache_files is not None:
+            cache_files[0].parent.mkdir(parents=True, exist_ok=True)
+            lengths = [len(seq) for seq in balanced_labels]
+            write_ragged(cache_files[0], np.concatenate(balanced_features), lengths)
+            write_ragged(cache_files[1], np.concatenate(balanced_labels), lengths)
+
+        return balanced_features, balanced_labels
+
+    def resample_group(self, task):
+        """
+        Oversample the rows of the sequences of one group, appending the synthetic rows to their source sequence.
+        """
+
+        seq_features, seq_labels, seed = task
+
+        features = np.concatenate(seq_features)
+        labels = np.concatenate(seq_labels)
+        sequence = np.repeat(
+            np.arange(len(seq_labels)), [len(seq) for seq in seq_labels]
+        )
+
+        synthetic, synthetic_labels, sources = smotenc(
+            features,
+            labels,
+            self.categorical,
+            self.k_neighbors,
+            self.algorithm,
+            np.random.default_rng(seed),
+        )
+
+        synthetic_sequence = sequence[sources]
+        balanced_features = []
+        balanced_labels = []
+        for i in range(len(seq_labels)):
+            in_seq = synthetic_sequence == i
+            balanced_features.append(
+                np.concatenate(
+                    [seq_features[i], synthetic[in_seq].astype(features.dtype)]
+                )
+            )
+            balanced_labels.append(
+                np.concatenate([seq_labels[i], synthetic_labels[in_seq]])
+            )
+
+        return balanced_features, balanced_labels
+
+    def cache_files(self, features, labels, groups):
+        """
+        Paths of the cached features and labels for the input sets and parameters, none without a cache directory.
+        """
+
+        if self.cache_dir is None:
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(
+            repr(
+                (
+                    VERSION,
+                    self.categorical,
+                    self.k_neighbors,
+                    self.algorithm,
+                    self.seed,
+                    groups.tolist(),
+                )
+            ).encode()
+        )
+        for sequences in [features, labels]:
+            for seq in sequences:
+                seq = np.ascontiguousarray(seq)
+                digest.update(f"{seq.dtype}{seq.shape}".encode())
+                digest.update(seq.tobytes())
+
+        name = f"smotenc-{digest.hexdigest()[:16]}"
+
+        return (
+            Path(self.cache_dir).joinpath(f"{name}_features.npy"),
+            Path(self.cache_dir).joinpath(f"{name}_labels.npy"),
+        )
+
+
+def smotenc(
+    features, labels, categorical=(), k_neighbors=5, algorithm="kd_tree", rng=None
+):
+    """
+    Synthetic rows that bring each class to the size of the largest class.
+    Returns the synthetic rows, their labels and the index of the row each one was interpolated from.
+    Classes with fewer than two rows are not oversampled.
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    features = np.asarray(features, dtype="float64")
+    labels = np.asarray(labels)
+    categorical = list(categorical)
+    continuous = [col for col in range(features.shape[1]) if col not in categorical]
+
+    classes, counts = np.unique(labels, return_counts=True)
+
+    synthetic = [np.empty((0, features.shape[1]))]
+    synthetic_labels = [labels[:0]]
+    sources = [np.empty(0, dtype="int64")]
+
+    for label, count in zip(classes, counts):
+        num_new = counts.max() - count
+        if num_new == 0 or count < 2:
+            continue
+
+        rows = np.flatnonzero(labels == label)
+        class_features = features[rows]
+        k = min(k_neighbors, count - 1)
+
+        # Neighbours of each row among the other rows of the class
+        index = NearestNeighbors(n_neighbors=k + 1, algorithm=algorithm)
+        index.fit(encode(class_features, continuous, categorical))
+        neighbors = index.kneighbors(return_distance=False)[:, :k]
+
+        # Random row, one of its neighbours and a step between them for each new row
+        source = rng.integers(count, size=num_new)
+        neighbor = neighbors[source, rng.integers(k, size=num_new)]
+        steps = rng.uniform(size=(num_new, 1))
+
+        new_rows = class_features[source] + steps * (
+            class_features[neighbor] - class_features[source]
+        )
+        if categorical:
+            new_rows[:, categorical] = most_frequent(
+                class_features[:, categorical][neighbors]
+            )[source]
+
+        synthetic.append(new_rows)
+        synthetic_labels.append(np.full(num_new, label, dtype=labels.dtype))
+        sources.append(rows[source])
+
+    return (
+        np.concatenate(synthetic),
+        np.concatenate(synthetic_labels),
+        np.concatenate(sources),
+    )
+
+
+# ANCILLARY FUNCTIONS
+def encode(features, continuous, categorical):
+    """
+    Continuous features with one-hot encoded categorical features, scaled by half the median standard deviation
+    of the continuous features, so a differing category counts like a typical difference in a continuous feature.
+    """
+
+    if not categorical:
+        return features
+
+    median_std = np.median(np.std(features[:, continuous], axis=0)) if continuous else 1
+
+    encoded = [features[:, continuous]]
+    for col in categorical:
+        values = np.unique(features[:, col])
+        encoded.append((features[:, [col]] == values) * median_std / 2)
+
+    return np.hstack(encoded)
+
+
+def most_frequent(values):
+    """
+    Most frequent value in each row of a (rows x neighbours x columns) array, the smallest one in case of ties.
+    """
+
+    result = np.empty((values.shape[0], values.shape[2]))
+    for col in range(values.shape[2]):
+        categories, codes = np.unique(values[:, :, col], return_inverse=True)
+        codes = codes.reshape(values.shape[:2])
+        counts = np.zeros((values.shape[0], len(categories)), dtype="int64")
+        np.add.at(counts, (np.arange(values.shape[0])[:, None], codes), 1)
+        result[:, col] = categories[np.argmax(counts, axis=1)]
+
+    return result
+
+
+def speaker_groups(sequences):
+    """
+    Speaker of each sequence in a sequence table of `build_sets`, sequences of unknown speakers form a group per recording.
+    """
+
+    speakers = process_annotations.speaker_registry()
+
+    groups = []
+    for recording in sequences["recording"]:
+        speaker = speakers.get(recording)[0]
+        groups.append(recording if speaker == "unknown" else speaker)
+
+    return groups
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Balance the training sets written by promdetect-build-sets with SMOTENC."
+    )
+    parser.add_argument("level", choices=list(CATEGORICAL))
+    parser.add_argument("set_dir", help="Directory containing the sets of the level")
+    parser.add_argument(
+        "--groups",
+        choices=["sequence", "speaker"],
+        default="sequence",
+        help="Oversample each sequence separately or the sequences of each speaker together",
+    )
+    parser.add_argument("--k-neighbors", type=int, default=5)
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="kd_tree")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", help="Directory to cache results in")
+    parser.add_argument("--num-workers", type=int, default=1)
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    set_dir = Path(args.set_dir)
+
+    features = read_ragged(set_dir.joinpath(f"{args.level}_features.npy"))
+    labels = read_ragged(set_dir.joinpath(f"{args.level}_labels.npy"))
+
+    groups = None
+    if args.groups == "speaker":
+        groups = speaker_groups(
+            pd.read_csv(set_dir.joinpath(f"{args.level}_sequences.csv"))
+        )
+
+    oversampler = Oversampler(
+        CATEGORICAL[args.level],
+        args.k_neighbors,
+        args.algorithm,
+        args.seed,
+        args.cache_dir,
+    )
+    balanced_features, balanced_labels = oversampler.fit_resample(
+        features, labels, groups, args.num_workers
+    )
+
+    lengths = [len(seq) for seq in balanced_labels]
+    write_ragged(
+        set_dir.joinpath(f"{args.level}_features_smotenc.npy"),
+        np.concatenate(balanced_features),
+        lengths,
+    )
+    write_ragged(
+        set_dir.joinpath(f"{args.level}_labels_smotenc.npy"),
+        np.concatenate(balanced_labels),
+        lengths,
+    )
+
+    print(
+        f"Balanced {len(lengths)} sequences from {sum(len(seq) for seq in labels)} to {sum(lengths)} rows"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Per-speaker pitch range estimation for a two-pass pitch analysis.
+
+The default pitch ranges only depend on speaker gender and are wide, which makes pitch tracking slower and
+more prone to octave errors. A coarse first pass with the default range and a large time step estimates the
+F0 quartiles of a speaker, from which a narrower range for the final pitch analysis is derived
+(floor = 0.75 * Q1, ceiling = 1.5 * Q3, following De Looze & Hirst).
+The quartiles of a speaker are taken over all of their recordings in the corpus directory, so a speaker's range
+does not depend on which recording, worker process or thread asks for it first.
+Ranges are cached per speaker, optionally in a directory with one JSON file per speaker shared by runs and processes.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import parselmouth as pm
+
+from promdetect.prep import audio, process_annotations
+
+# Default pitch ranges for female and male speakers
+GENDER_RANGES = {"f": (75, 500), "m": (50, 300)}
+
+# Narrowed ranges stay within the union of the default ranges
+RANGE_LIMITS = (50, 500)
+
+COARSE_TIME_STEP = 0.05
+MIN_VOICED_FRAMES = 20
+
+
+def gender_range(gender):
+    """
+    Default pitch range for a speaker gender, the male range for anything but "f".
+    """
+
+    return GENDER_RANGES["f"] if gender == "f" else GENDER_RANGES["m"]
+
+
+def estimate_range(snd_obj, gender="f"):
+    """
+    Coarse pitch pass over a recording, returning a pitch range narrowed to the speaker.
+    snd_obj: Praat sound object, path to a WAV file or `audio.WavFile`.
+    Falls back to the default range of the gender if too few frames are voiced.
+    """
+
+    return range_from_f0(voiced_f0(snd_obj, gender), gender)
+
+
+def estimate_speaker_range(wav_files, gender="f"):
+    """
+    Pitch range of a speaker from the voiced frames of the coarse pass over all of their recordings.
+    wav_files: Paths to WAV files or Praat sound objects, WAV files are read without caching their sound objects.
+    """
+
+    f0 = [
+        voiced_f0(
+            wav if isinstance(wav, pm.Sound) else audio.WavFile(wav).sound(), gender
+        )
+        for wav in wav_files
+    ]
+
+    return range_from_f0(np.concatenate(f0), gender)
+
+
+class PitchRangeCache(object):
+    """
+    Pitch ranges per speaker, estimated with `estimate_speaker_range()` on all recordings of the speaker
+    next to the first recording the range is asked for. Speakers with unknown ID are estimated per recording and not cached.
+    path: Optional directory with one JSON file per speaker, to share the ranges between runs and worker processes.
+    Files are written atomically, and all processes estimate the same range for a speaker.
+    registry: `process_annotations.SpeakerRegistry` to find the recordings of a speaker, defaults to the corpus speaker list.
+    """
+
+    def __init__(self, path=None, registry=None):
+        self.path = path
+        self.registry = registry
+        self.ranges = {}
+        self.lock = threading.Lock()
+
+        if path is not None:
+            Path(path).mkdir(parents=True, exist_ok=True)
+
+    def get(self, speaker, snd_obj):
+        """
+        Pitch range of a speaker (ID, gender) tuple, estimated for the speaker of `snd_obj` if it is not cached yet.
+        snd_obj: Path to a WAV file or `audio.WavFile` of a recording of the speaker,
+        a Praat sound object is estimated on its own.
+        """
+
+        speaker_id, gender = speaker
+
+        if speaker_id == "unknown":
+            return estimate_range(snd_obj, gender)
+
+        key = f"{speaker_id}{gender}"
+        with self.lock:
+            if key not in self.ranges:
+                speaker_range = self.load(key)
+
+                if speaker_range is None:
+                    speaker_range = estimate_speaker_range(
+                        self.speaker_recordings(speaker, snd_obj), gender
+                    )
+                    if self.path is not None:
+                        self.save(key, speaker_range)
+
+                self.ranges[key] = speaker_range
+
+        return self.ranges[key]
+
+    def speaker_recordings(self, speaker, snd_obj):
+        """
+        WAV files of all recordings of a speaker in the directory of `snd_obj`, in sorted order.
+        """
+
+        if isinstance(snd_obj, pm.Sound):
+            return [snd_obj]
+
+        wav_file = Path(audio.as_wav(snd_obj).path)
+        if self.registry is None:
+            self.registry = process_annotations.speaker_registry()
+
+        keys = [
+            key
+            for key, key_speaker in self.registry.speakers.items()
+            if key_speaker is not None and key_speaker[0] == speaker[0]
+        ]
+        recordings = sorted(
+            wav
+            for key in keys
+            for wav in wav_file.parent.glob(f"*nachrichten-{key}.wav")
+        )
+
+        return recordings or [wav_file]
+
+    def range_file(self, key):
+        return Path(self.path).joinpath(f"{key}.json")
+
+    def load(self, key):
+        """
+        Range of a speaker stored in the range directory, None if there is none.
+        """
+
+        if self.path is None or not self.range_file(key).is_file():
+            return None
+
+        with open(self.range_file(key), "r") as range_file:
+            return tuple(json.load(range_file))
+
+    def save(self, key, speaker_range):
+        """
+        Write the range of a speaker to its own file, replacing it in one step so readers never see a partial file.
+        """
+
+        handle, tmp_file = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(handle, "w") as range_file:
+            json.dump(list(speaker_range), range_file)
+        os.replace(tmp_file, self.range_file(key))
+
+
+@lru_cache(maxsize=None)
+def speaker_ranges(path=None):
+    """
+    Pitch range cache shared by all extractions in a process, `path` is the directory of the per-speaker files.
+    """
+
+    return PitchRangeCache(path)
+
+
+def recording_range(recording, wav_file, gender, config):
+    """
+    Pitch range of a recording for the frame- and word-level pipelines, following the prep configuration:
+    narrowed to the speaker if "adaptive_pitch" is set, with the speaker ID from the corpus speaker list
+    and the ranges shared in "pitch_range_dir", otherwise the default range of the gender.
+    config: Feature extraction configuration, see `promdetect/prep/config.json`.
+    """
+
+    if not config.get("adaptive_pitch", False):
+        return gender_range(gender)
+
+    speaker_id = process_annotations.speaker_registry().get(recording)[0]
+
+    return speaker_ranges(config.get("pitch_range_dir") or None).get(
+        (speaker_id, gender), wav_file
+    )
+
+
+# ANCILLARY FUNCTIONS
+def voiced_f0(snd_obj, gender="f"):
+    """
+    F0 of the voiced frames of the coarse pitch pass with the default range of the gender.
+    """
+
+    if not isinstance(snd_obj, pm.Sound):
+        snd_obj = audio.as_wav(snd_obj).sound()
+
+    floor, ceiling = gender_range(gender)
+    pitch_obj = snd_obj.to_pitch_cc(
+        time_step=COARSE_TIME_STEP, pitch_floor=floor, pitch_ceiling=ceiling
+    )
+
+    f0 = pitch_obj.selected_array["frequency"]
+
+    return f0[f0 > 0]
+
+
+def range_from_f0(f0, gender="f"):
+    """
+    Pitch range narrowed to the quartiles of voiced F0 values, the default range of the gender if there are too few.
+    """
+
+    if len(f0) < MIN_VOICED_FRAMES:
+        return gender_range(gender)
+
+    q1, q3 = np.quantile(f0, [0.25, 0.75])
+
+    return (
+        float(max(0.75 * q1, RANGE_LIMITS[0])),
+        float(min(1.5 * q3, RANGE_LIMITS[1])),
+    )
@@ -1,7 +1,16 @@
 from pathlib import Path
 import json
 from glob import glob
-from promdetect.prep import process_annotations, find_syllable_nuclei, extract_features
+from pandas import DataFrame
+from promdetect.prep import (
+    audio,
+    process_annotations,
+    find_syllable_nuclei,
+    extract_features,
+    pitch_range,
+    schemas,
+)
+from promdetect.prep import instrumentation as instr
 
 """
 The functions in this module reformat the data from the DIRNDL corpus in order
@@ -11,56 +20,85 @@ This file coordinates and collects data by running functions defined in some of
 the other files in this directory.
 """
 
-CFG_FILE = "/home/lukas/Dokumente/Uni/ma_thesis/promdetect/promdetect/prep/config.json"
-with open(CFG_FILE, "r") as cfg:
-    CONFIG = json.load(cfg)
+CFG_FILE = Path(__file__).resolve().parent.joinpath("config.json")
 
 
 class FeatureSet:
-    def __init__(self, config, recording):
+    def __init__(self, config, recording, speaker=None, instrumentation=None):
         self.config = config
         self.recording = recording
         self.wav_file = str(
             Path(self.config["directory"]).joinpath(f"{self.recording}.wav")
         )
-        self.speaker = process_annotations.AnnotationReader(
-            self.recording
-        ).get_speaker_info()
+
+        # Speaker (ID, gender) tuple, looked up in the corpus speaker list if not supplied
+        if speaker is None:
+            speaker = process_annotations.speaker_registry().get(self.recording)
+        self.speaker = speaker
+
+        # Opt-in measurements of each stage, see `instrumentation.py`
+        if instrumentation is None:
+            instrumentation = instr.from_env(self.recording, "nucleus")
+        self.instrumentation = instrumentation
 
     def run_config(self):
-        self.accents = self.collect_annotations("accents")
+        if self.config.get("accents", True):
+            self.accents = self.collect_annotations("accents")
+        else:
+            # Unlabelled recordings, e.g. for prediction
+            self.accents = DataFrame(columns=["time", "label"], dtype="float64")
         self.phones = self.collect_annotations("phones")
         self.tones = self.collect_annotations("tones")
         self.words = self.collect_annotations("words")
 
         if self.config["find_nuclei"]:
-            points = find_syllable_nuclei.get_nucleus_points(self.wav_file)
-            self.nuclei_raw = find_syllable_nuclei.assign_points_labels(
-                points, self.phones, self.words, self.tones, self.accents
-            )
-
-        self.nuclei = self.nuclei_raw.loc[
-            self.nuclei_raw["phone"].notna()
-        ].reset_index()
+            with instr.stage(self.instrumentation, "get_nucleus_points"):
+                points = find_syllable_nuclei.get_nucleus_points(self.wav_file)
+            with instr.stage(
+                self.instrumentation, "assign_points_labels", rows=len(points)
+            ):
+                self.nuclei_raw = find_syllable_nuclei.assign_points_labels(
+                    points, self.phones, self.words, self.tones, self.accents
+                )
+
+        self.nuclei = schemas.enforce(
+            self.nuclei_raw.loc[self.nuclei_raw["phone"].notna()].reset_index(),
+            schemas.NUCLEI,
+        )
 
         to_extract = [
             func for func, to_run in self.config["features"].items() if to_run
         ]  # compile list of functions that should be run according to the config
 
         if to_extract:
+            # Two-pass pitch analysis: pitch range narrowed to the speaker by a coarse first pass
+            if self.config.get("adaptive_pitch", False):
+                speaker_range = pitch_range.speaker_ranges(
+                    self.config.get("pitch_range_dir") or None
+                ).get(self.speaker, self.wav_file)
+            else:
+                speaker_range = None
+
             extractor = extract_features.Extractor(
-                self.wav_file, self.nuclei, self.speaker[1]
+                self.wav_file, self.nuclei, self.speaker[1], speaker_range
             )
             features = self.nuclei.copy()
 
             # Will add extracted feature values to main feature DataFrame
             for func_to_run in to_extract:
-                self.call_function(extractor, features, func_to_run)
+                with instr.stage(self.instrumentation, func_to_run, rows=len(features)):
+                    self.call_function(extractor, features, func_to_run)
 
-            return features
+            # All Praat analyses of the recording are done, the shared recording does not keep its Sound object
+            extractor.audio.release()
 
-        else:
-            pass
+            if self.instrumentation is not None and self.instrumentation.path:
+                self.instrumentation.write()
+
+            return schemas.enforce(features, schemas.NUCLEI)
+
+        elif self.config["find_nuclei"]:
+            audio.as_wav(self.wav_file).release()
 
     def call_function(self, extractor, features_df, func_to_run):
         """
@@ -124,6 +162,9 @@ if __name__ == "__main__":
     """
     Call for all recordings
     """
+    with open(CFG_FILE, "r") as cfg:
+        CONFIG = json.load(cfg)
+
     directory = CONFIG["directory"]
     recordings = [Path(file).stem for file in glob(f"{directory}/*.wav")]
 
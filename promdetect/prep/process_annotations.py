@@ -8,12 +8,19 @@ Import necessary packages:
 """
 
 import re
+import json
 import pandas as pd
+from functools import lru_cache
 from io import StringIO
 from pathlib import Path
 from numpy import nan
 import logging
 
+SPEAKER_LIST = "/home/lukas/Dokumente/Uni/ma_thesis/quelldaten/DIRNDL-prosody/speakers-prosodically-annotated-part.txt"
+SPEAKER_JSON = (
+    "/home/lukas/Dokumente/Uni/ma_thesis/promdetect/data/dirndl/speakers.json"
+)
+
 
 class AnnotationReader(str):
     def __init__(self, annotation_file):
@@ -56,43 +63,110 @@ class AnnotationReader(str):
         """
         This functions reads the file "speakers-prosodically-annotated-part.txt" and finds the supplied recording ID in that file, returning a tuple with the corresponding speaker's ID and gender.
         The ID will later be used to investigate cross-speaker similarities and differences, the gender is relevant to the calculation of acoustical features.
+        The file is only parsed on the first call, see `speaker_registry()`.
         """
-        try:
-            recording_id = self.annotation_file.split("nachrichten-")[1]
 
-        except Exception:
+        if recording_key(self.annotation_file) is None:
             logging.warning("Supplied recording ID has the wrong format.")
             return ("unknown", "f")
 
-        with open(
-            Path(
-                "/home/lukas/Dokumente/Uni/ma_thesis/quelldaten/DIRNDL-prosody/speakers-prosodically-annotated-part.txt"
-            ).resolve(),
-            "r",
-        ) as speakerFile:
-            found_id = False
-
-            for line in speakerFile:
-                if recording_id in line:
-                    found_id = True
-                    # Extract ID number of the speaker
-                    speaker_id = re.findall(r"[0-9 \t]+SP([0-9]?)[fm]", line)[0]
-                    speaker_gender = re.sub(r"[^a-z]*", "", line)
-
-                    if speaker_id != "" and speaker_gender in ["m", "f"]:
-                        return (speaker_id, speaker_gender)
-                    else:
-                        logging.warning(
-                            "Speaker ID and/or gender could not be determined."
-                        )
-                        return ("unknown", "f")
-
-            if not found_id:
-                logging.warning("Supplied recording ID could not be found.")
-                return ("unknown", "f")
+        return speaker_registry().get(self.annotation_file)
+
+
+class SpeakerRegistry(object):
+    """
+    Speaker (ID, gender) tuples of all recordings, parsed once from a speaker file.
+    Recordings are identified by the part of their ID after "nachrichten-", lookups are dictionary accesses.
+    The registry only holds a dictionary, so it can be pickled and passed to worker processes.
+    """
+
+    def __init__(self, speakers):
+        self.speakers = speakers
+
+    @classmethod
+    def from_speaker_list(cls, path=SPEAKER_LIST):
+        """
+        Parse the corpus file "speakers-prosodically-annotated-part.txt".
+        If a recording is listed more than once, the first line counts.
+        """
+
+        speakers = {}
+        with open(Path(path).resolve(), "r") as speaker_file:
+            for line in speaker_file:
+                speaker_id = re.findall(r"[0-9 \t]+SP([0-9]?)[fm]", line)
+                speaker_gender = re.sub(r"[^a-z]*", "", line)
+
+                if speaker_id and speaker_id[0] != "" and speaker_gender in ["m", "f"]:
+                    speaker = (speaker_id[0], speaker_gender)
+                else:
+                    speaker = None
+
+                for recording_id in re.findall(r"[0-9]{8,}", line):
+                    speakers.setdefault(recording_id, speaker)
+
+        return cls(speakers)
+
+    @classmethod
+    def from_json(cls, path=SPEAKER_JSON):
+        """
+        Read a JSON file mapping full recording IDs to speaker gender, as used for the frame-level features.
+        Speaker IDs are not included there and set to "unknown".
+        """
+
+        with open(Path(path).resolve(), "r") as speaker_file:
+            genders = json.load(speaker_file)
+
+        return cls(
+            {
+                recording_key(recording): ("unknown", gender)
+                for recording, gender in genders.items()
+            }
+        )
+
+    def get(self, recording):
+        """
+        Speaker (ID, gender) tuple of a recording, ("unknown", "f") if it is not found.
+        """
+
+        recording_id = recording_key(recording)
+
+        if recording_id is None:
+            logging.warning("Supplied recording ID has the wrong format.")
+            return ("unknown", "f")
+
+        if recording_id not in self.speakers:
+            logging.warning("Supplied recording ID could not be found.")
+            return ("unknown", "f")
+
+        if self.speakers[recording_id] is None:
+            logging.warning("Speaker ID and/or gender could not be determined.")
+            return ("unknown", "f")
+
+        return self.speakers[recording_id]
+
+    def gender(self, recording):
+        return self.get(recording)[1]
+
+
+@lru_cache(maxsize=None)
+def speaker_registry(path=SPEAKER_LIST):
+    """
+    Registry of the speaker list, parsed on the first call and cached for the process.
+    """
+
+    return SpeakerRegistry.from_speaker_list(path)
 
 
 # ANCILLARY FUNCTIONS
+def recording_key(recording):
+    """
+    Part of a recording ID after "nachrichten-", which identifies the recording in the speaker list.
+    """
+
+    try:
+        return recording.split("nachrichten-")[1]
+    except (AttributeError, IndexError):
+        return None
 
 
 def clean_text(raw_text, annotation_type) -> str:
@@ -0,0 +1,127 @@
+"""
+Pre-processing of the extracted nucleus feature tables, as done in `manage_extraction_output.ipynb`:
+- Cleans out duplicates found by the syllable nucleus detection algorithm
+- Imputes missing data by replacing NAs with the recording-internal mean feature values
+- Standardizes data with 3 different standardizers, fitted per recording
+- Reshapes the table to a sequence of nucleus feature vectors
+"""
+
+import numpy as np
+from sklearn import preprocessing
+
+# Feature columns in the order of the nucleus-level training sets
+NUCLEUS_FEATURES = [
+    "duration_est",
+    "rms",
+    "duration_normed",
+    "pitch_slope",
+    "max_intensity_nuclei",
+    "min_intensity_nuclei",
+    "mean_intensity_nuclei",
+    "intensity_std_nuclei",
+    "min_intensity_pos",
+    "max_intensity_pos",
+    "f0_max_nuclei",
+    "f0_min_nuclei",
+    "f0_mean_nuclei",
+    "f0_range_nuclei",
+    "f0_std_nuclei",
+    "f0_min_pos",
+    "f0_max_pos",
+    "excursion_word",
+    "excursion_ip",
+    "spectral_tilt_mean",
+    "spectral_tilt_range",
+    "min_spectral_tilt",
+    "max_spectral_tilt",
+    "spectral_cog",
+    "h1_h2",
+    "gender",
+]
+
+COLS_ABS = [
+    "duration_est",
+    "rms",
+    "duration_normed",
+    "min_intensity_nuclei",
+    "max_intensity_nuclei",
+    "intensity_std_nuclei",
+    "mean_intensity_nuclei",
+    "min_intensity_pos",
+    "max_intensity_pos",
+    "f0_max_nuclei",
+    "f0_min_nuclei",
+    "f0_mean_nuclei",
+    "f0_range_nuclei",
+    "f0_std_nuclei",
+    "f0_min_pos",
+    "f0_max_pos",
+]
+COLS_NEG_POS = ["excursion_word", "excursion_ip"]
+COLS_ROBUST = [
+    "pitch_slope",
+    "f0_range_nuclei",
+    "spectral_tilt_mean",
+    "spectral_tilt_range",
+    "min_spectral_tilt",
+    "max_spectral_tilt",
+    "spectral_cog",
+    "h1_h2",
+]
+
+
+def clean_duplicates(features, gender):
+    """
+    Drop nuclei that were found more than once, add the binary accent label and the speaker gender.
+    """
+
+    df = features.drop_duplicates(subset=["start_est", "end"]).copy()
+    df["has_accent"] = np.where(df["accent_label"].notna(), 1, 0)
+    df["gender"] = 1 if gender == "m" else 0
+
+    return df
+
+
+def impute_missing(df):
+    """
+    Replace missing feature values with the mean value of the feature in the recording.
+    Features that are missing for the entire recording are set to 0.
+    """
+
+    df_imp = df[NUCLEUS_FEATURES].astype("float64")
+    df_imp = df_imp.fillna(df_imp.mean()).fillna(0)
+
+    return df_imp
+
+
+def standardize(df):
+    """
+    Scale the features of one recording using sklearn.preprocessing scalers.
+    """
+
+    df_standard = df.copy()
+    abs_scaler = preprocessing.MinMaxScaler()
+    neg_pos_scaler = preprocessing.MinMaxScaler(feature_range=(-1, 1))
+    robust_scaler = preprocessing.RobustScaler()
+
+    df_standard[COLS_ABS] = abs_scaler.fit_transform(df_standard[COLS_ABS].values)
+    df_standard[COLS_NEG_POS] = neg_pos_scaler.fit_transform(
+        df_standard[COLS_NEG_POS].values
+    )
+    df_standard[COLS_ROBUST] = robust_scaler.fit_transform(
+        df_standard[COLS_ROBUST].values
+    )
+
+    return df_standard
+
+
+def to_sequence(features, gender):
+    """
+    Run all pre-processing steps on the feature table of one recording.
+    Returns the cleaned table and the (nuclei x features) input array for the nucleus-level models.
+    """
+
+    df = clean_duplicates(features, gender)
+    df_standard = standardize(impute_missing(df))
+
+    return df, df_standard[NUCLEUS_FEATURES].to_numpy(dtype="float32")
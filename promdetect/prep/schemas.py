@@ -0,0 +1,105 @@
+"""
+Column types of the tables passed between the stages of the extraction pipelines.
+
+Feature values are stored as float32, labels (phones, words, tones, accents) as categoricals and sample, frame and
+row indices as int32, which takes a fraction of the memory of float64 and object columns and keeps copies and
+masks fast. Timestamps stay float64: in float32, times in an hour-long recording are only resolved to 0.25 ms,
+while annotations and Praat queries use 0.1 ms.
+Numeric columns that are not part of a schema are taken to be features.
+"""
+
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_numeric_dtype
+
+TIME = "float64"
+FEATURE = "float32"
+LABEL = "category"
+INDEX = "int32"
+
+# Syllable nuclei with their labels, see `find_syllable_nuclei.assign_points_labels()`
+NUCLEI = {
+    "index": INDEX,
+    "nucl_time": TIME,
+    "phone": LABEL,
+    "word": LABEL,
+    "bound_tone": LABEL,
+    "start_est": TIME,
+    "end": TIME,
+    "duration_est": FEATURE,
+    "word_start": TIME,
+    "word_end": TIME,
+    "ip_start": TIME,
+    "ip_end": TIME,
+    "accent_time": TIME,
+    "accent_label": LABEL,
+}
+
+# Segmented word and tone annotations, see `segmentation.Segmenter`, and the word features derived from them
+SEGMENTS = {
+    "index": INDEX,
+    "end": TIME,
+    "label": LABEL,
+    "start": TIME,
+    "duration": FEATURE,
+    "start_sample": INDEX,
+    "end_sample": INDEX,
+    "start_frame": INDEX,
+    "end_frame": INDEX,
+}
+
+# Frame features, see `FrameLevelExtractor`
+FRAMES = {"time": TIME, "word": LABEL}
+
+# Values of object columns that are converted to features, other object columns (e.g. Praat objects) are kept
+NUMERIC_VALUES = ("floating", "integer", "mixed-integer-float", "decimal", "empty")
+
+
+def enforce(table, schema):
+    """
+    Cast the columns of a table to the types of a schema, numeric columns missing from the schema to float32.
+    Only columns of a different type are converted, in place. Returns the table.
+    """
+
+    for column in table.columns:
+        values = table[column]
+        dtype = schema.get(column)
+
+        if dtype is None:
+            if is_bool_dtype(values):
+                continue
+            if not (
+                is_numeric_dtype(values)
+                or (
+                    values.dtype == object
+                    and infer_dtype(values, skipna=True) in NUMERIC_VALUES
+                )
+            ):
+                continue
+            dtype = FEATURE
+
+        if values.dtype != dtype:
+            table[column] = values.astype(dtype)
+
+    return table
+
+
+def memory_report(tables):
+    """
+    Memory used by each table in a dictionary of tables, including the contents of object columns.
+    """
+
+    report = []
+    for name, table in tables.items():
+        num_bytes = int(table.memory_usage(deep=True).sum())
+        report.append(
+            {
+                "table": name,
+                "rows": len(table),
+                "columns": table.shape[1],
+                "object_columns": int((table.dtypes == object).sum()),
+                "bytes": num_bytes,
+                "bytes_per_row": num_bytes / max(len(table), 1),
+            }
+        )
+
+    return pd.DataFrame(report).set_index("table")
@@ -1,64 +1,78 @@
 import pandas as pd
 import numpy as np
-import parselmouth as pm
 from parselmouth import praat
 
+from promdetect.prep import audio, schemas
+from promdetect.prep.pitch_range import gender_range
+
 
 class WordLevelExtractor:
-    def __init__(self, wav_file, words, tones, gender="f"):
+    """
+    Extract word-level features for one recording.
+    words, tones: Segmented annotations, either CSV files or tables, e.g. `table.loc[recording]` of a corpus table (see `segmentation.load_corpus()`).
+    pitch_range: (floor, ceiling) of the pitch analysis, defaults to the range for the speaker gender.
+    """
+
+    def __init__(self, wav_file, words, tones, gender="f", pitch_range=None):
         self.wav_file = wav_file
-        self.words = pd.read_csv(words)
-        self.tones = pd.read_csv(tones)
-        self.snd_obj = pm.Sound(self.wav_file)
+        self.words = read_table(words)
+        self.tones = read_table(tones)
+        self.audio = audio.as_wav(wav_file)
         self.gender = gender
         self.features = pd.DataFrame(self.words)
 
-        if gender == "f":
-            self.__pitch_range = (75, 500)
-        else:
-            self.__pitch_range = (50, 300)
+        if pitch_range is None:
+            pitch_range = gender_range(gender)
+        self.__pitch_range = tuple(pitch_range)
+
+    @property
+    def snd_obj(self):
+        """
+        Praat sound object of the recording, only built once a Praat analysis needs it.
+        """
+
+        return self.audio.sound()
+
+    def word_rows(self):
+        """
+        Mask of the rows with word labels and timestamps.
+        """
+
+        return (
+            (self.features["start"].notna())
+            & (self.features["end"].notna())
+            & (self.features["label"] != "<P>")
+        )
 
     def get_duration_features(self):
         """
         Get duration features:
         - relative duration compared to IP mean
         """
-        to_add = pd.DataFrame(columns=["dur", "dur_normed"])
-        self.features = pd.concat([self.features, to_add])
 
         self.features["dur"] = self.words["end"] - self.words["start"]
 
-        for row in self.tones.itertuples():
-            if row.start == row.start and row.end == row.end:  # check if NaN
-                ip_mean = np.mean(
-                    self.features.loc[
-                        (self.features["label"] != "<P>")
-                        & (  # get normed duration if word occurs during current IP, and word label is not indicating punctuation
-                            row.start <= self.features["start"]
-                        )
-                        & (self.features["end"] <= row.end),
-                        "dur",
-                    ]
-                )
+        # Assign each word to the IP it occurs in, punctuation labels are not normalized
+        ips = self.tones.loc[self.tones["start"].notna() & self.tones["end"].notna()]
+        ip_idx = find_spans(
+            self.features["start"].to_numpy(dtype="float64"),
+            self.features["end"].to_numpy(dtype="float64"),
+            ips["start"].to_numpy(dtype="float64"),
+            ips["end"].to_numpy(dtype="float64"),
+        )
+        ip_idx[(self.features["label"] == "<P>").to_numpy()] = -1
+        in_ip = ip_idx >= 0
 
-                # Divide all durations by corresponding IP mean
-                self.features.loc[
-                    (self.features["label"] != "<P>")
-                    & (row.start <= self.features["start"])
-                    & (self.features["end"] <= row.end),
-                    "dur_normed",
-                ] = (
-                    self.features.loc[
-                        (self.features["label"] != "<P>")
-                        & (row.start <= self.features["start"])
-                        & (self.features["end"] <= row.end),
-                        "dur",
-                    ]
-                    / ip_mean
-                )
+        # Divide all durations by corresponding IP mean
+        durs = self.features["dur"].to_numpy(dtype="float64")
+        ip_sums = np.bincount(ip_idx[in_ip], weights=durs[in_ip], minlength=len(ips))
+        ip_counts = np.bincount(ip_idx[in_ip], minlength=len(ips))
 
-            else:
-                pass
+        dur_normed = np.full(len(durs), np.nan)
+        dur_normed[in_ip] = durs[in_ip] / (ip_sums / ip_counts)[ip_idx[in_ip]]
+
+        self.features["dur_normed"] = dur_normed
+        schemas.enforce(self.features, schemas.SEGMENTS)
 
     def get_intensity_features(self):
         """
@@ -70,91 +84,54 @@ class WordLevelExtractor:
         - intensity std
         - minimum intensity relative position
         - maximum intensity relative position
+
+        All statistics are computed in one pass over the sample and intensity arrays, with the same results as the
+        corresponding Praat queries ("Get root-mean-square", "Get minimum", ... with "None" interpolation).
         """
 
-        to_add = pd.DataFrame(
-            columns=[
-                "int_rms",
-                "int_min",
-                "int_max",
-                "int_mean",
-                "int_std",
-                "int_min_pos",
-                "int_max_pos",
-            ]
+        self.int_obj = self.snd_obj.to_intensity(
+            minimum_pitch=gender_range(self.gender)[0]
         )
-        self.features = pd.concat([self.features, to_add])
-
-        self.int_obj = self.snd_obj.to_intensity(minimum_pitch=self.__pitch_range[0])
 
-        # Filter main DataFrame for word-label rows with timestamps
-        self.features_has_crit = self.features.copy().loc[
-            (self.features["start"].notna())
-            & (self.features["end"].notna())
-            & (self.features["label"] != "<P>")
-        ]
-
-        self.features_has_crit["int_rms"] = [
-            praat.call(self.snd_obj, "Get root-mean-square", row.start, row.end)
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
-
-        self.features_has_crit["int_min"] = [
-            praat.call(self.int_obj, "Get minimum", row.start, row.end, "None")
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
-
-        self.features_has_crit["int_max"] = [
-            praat.call(self.int_obj, "Get maximum", row.start, row.end, "None")
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
-
-        self.features_has_crit["int_mean"] = [
-            praat.call(self.int_obj, "Get mean", row.start, row.end, "energy")
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
-
-        self.features_has_crit["int_std"] = [
-            praat.call(self.int_obj, "Get standard deviation", row.start, row.end)
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
-
-        self.features_has_crit["int_min_pos"] = [
-            (
-                praat.call(
-                    self.int_obj, "Get time of minimum", row.start, row.end, "None"
+        words = self.features.loc[self.word_rows(), ["start", "end"]]
+        starts = words["start"].to_numpy(dtype="float64")
+        ends = words["end"].to_numpy(dtype="float64")
+
+        int_feats = pd.DataFrame(index=words.index)
+        int_feats["int_rms"] = self.audio.rms(starts, ends)
+
+        stats = interval_stats(self.int_obj, starts, ends)
+        int_feats["int_min"] = stats["min"]
+        int_feats["int_max"] = stats["max"]
+        int_feats["int_mean"] = stats["mean"]
+        int_feats["int_std"] = stats["std"]
+        int_feats["int_min_pos"] = (stats["min_time"] - starts) / (ends - starts)
+        int_feats["int_max_pos"] = (stats["max_time"] - starts) / (ends - starts)
+
+        # Words shorter than an intensity frame: Praat interpolates the values at the word boundaries
+        for pos in np.flatnonzero(stats["frames"] == 0):
+            start, end = starts[pos], ends[pos]
+            int_feats.iloc[pos, 1:] = [
+                praat.call(self.int_obj, "Get minimum", start, end, "None"),
+                praat.call(self.int_obj, "Get maximum", start, end, "None"),
+                praat.call(self.int_obj, "Get mean", start, end, "energy"),
+                np.nan,
+                (
+                    praat.call(self.int_obj, "Get time of minimum", start, end, "None")
+                    - start
                 )
-                - row.start
-            )
-            / (row.end - row.start)
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
-
-        self.features_has_crit["int_max_pos"] = [
-            (
-                praat.call(
-                    self.int_obj, "Get time of maximum", row.start, row.end, "None"
+                / (end - start),
+                (
+                    praat.call(self.int_obj, "Get time of maximum", start, end, "None")
+                    - start
                 )
-                - row.start
-            )
-            / (row.end - row.start)
-            for row in self.features_has_crit.itertuples()
-            if row.start == row.start and row.end == row.end and row.label != "<P>"
-        ]
+                / (end - start),
+            ]
 
-        self.features.loc[
-            (self.features["start"].notna())
-            & (self.features["end"].notna())
-            & (self.features["label"] != "<P>")
-        ] = self.features_has_crit
+        self.features[int_feats.columns] = int_feats
+        schemas.enforce(self.features, schemas.SEGMENTS)
 
-    def get_pitch_features(self):
+    def get_pitch_features(self, word_pitch=False):
         """
         Get pitch features:
         - minimum pitch
@@ -166,187 +143,121 @@ class WordLevelExtractor:
         - pitch excursion relative to utterance (sentence)
         - minimum pitch relative position
         - maximum pitch relative position
-        """
-        to_add = pd.DataFrame(
-            columns=[
-                "f0_min",
-                "f0_max",
-                "f0_mean",
-                "f0_std",
-                "f0_slope",
-                "f0_exc_ip",
-                "f0_exc_utt",
-                "f0_min_pos",
-                "f0_max_pos",
-            ]
-        )
 
-        self.features = pd.concat([self.features, to_add])
+        The pitch slope is computed on the frames of the recording's pitch contour within each word.
+        word_pitch: Track the pitch of each word separately for the slope instead, as in the original extraction (slower).
+        """
 
         self.pitch_obj = self.snd_obj.to_pitch_cc(
             pitch_floor=self.__pitch_range[0], pitch_ceiling=self.__pitch_range[1]
         )
 
-        # Filter main DataFrame for word-label rows with timestamps
-        self.features_has_crit = self.features.copy().loc[  # TODO: Filter function to call in all `get` blocks
-            (self.features["start"].notna())
-            & (self.features["end"].notna())
-            & (self.features["label"] != "<P>")
-        ]
-
-        # Requires separate sound slice for each word
-        self.features_has_crit["snd_part"] = [  # 10ms padding
-            self.snd_obj.extract_part(
-                from_time=row.start - 0.01, to_time=row.end + 0.01
-            )
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        # Requires separate pitch contour for each word
-        self.features_has_crit["pitch_part"] = [
-            row.snd_part.to_pitch_cc(
-                pitch_floor=self.__pitch_range[0], pitch_ceiling=self.__pitch_range[1]
-            )
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        self.features_has_crit["f0_min"] = [
-            praat.call(
-                self.pitch_obj, "Get minimum", row.start, row.end, "Hertz", "None"
+        # Word-label rows with timestamps
+        rows = np.flatnonzero(self.word_rows().to_numpy())
+        word_starts = self.features["start"].to_numpy(dtype="float64")[rows]
+        word_ends = self.features["end"].to_numpy(dtype="float64")[rows]
+
+        pitch_feats = {
+            "f0_min": self.word_values(
+                lambda start, end: praat.call(
+                    self.pitch_obj, "Get minimum", start, end, "Hertz", "None"
+                ),
+                word_starts,
+                word_ends,
+            ),
+            "f0_max": self.word_values(
+                lambda start, end: praat.call(
+                    self.pitch_obj, "Get maximum", start, end, "Hertz", "None"
+                ),
+                word_starts,
+                word_ends,
+            ),
+            "f0_mean": self.word_values(
+                lambda start, end: praat.call(
+                    self.pitch_obj, "Get mean", start, end, "Hertz"
+                ),
+                word_starts,
+                word_ends,
+            ),
+            "f0_std": self.word_values(
+                lambda start, end: praat.call(
+                    self.pitch_obj, "Get standard deviation", start, end, "Hertz"
+                ),
+                word_starts,
+                word_ends,
+            ),
+        }
+
+        if word_pitch:
+            # Separate sound slice (10 ms padding) and pitch contour for each word
+            pitch_feats["f0_slope"] = self.word_values(
+                lambda start, end: self.snd_obj.extract_part(
+                    from_time=start - 0.01, to_time=end + 0.01
+                )
+                .to_pitch_cc(
+                    pitch_floor=self.__pitch_range[0],
+                    pitch_ceiling=self.__pitch_range[1],
+                )
+                .get_slope_without_octave_jumps(),
+                word_starts,
+                word_ends,
             )
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        self.features_has_crit["f0_max"] = [
-            praat.call(
-                self.pitch_obj, "Get maximum", row.start, row.end, "Hertz", "None"
+        else:
+            pitch_feats["f0_slope"] = pitch_slopes(
+                self.pitch_obj, word_starts, word_ends
             )
-            for row in self.features_has_crit.itertuples()
-        ]
 
-        self.features_has_crit["f0_mean"] = [
-            praat.call(self.pitch_obj, "Get mean", row.start, row.end, "Hertz")
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        self.features_has_crit["f0_std"] = [
-            praat.call(
-                self.pitch_obj, "Get standard deviation", row.start, row.end, "Hertz"
-            )
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        self.features_has_crit["f0_slope"] = [
-            row.pitch_part.get_slope_without_octave_jumps()
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        for ip in self.tones.itertuples():
-            if ip.start == ip.start and ip.end == ip.end:
-                f0_q10 = praat.call(
-                    self.pitch_obj, "Get quantile", ip.start, ip.end, 0.1, "Hertz"
-                )
+        # Excursions in semitones relative to the 10% F0 quantile of the IP and the utterance: 12 * log2(F0_max / F0_10%)
+        f0_max = pitch_feats["f0_max"]
 
-                # Semitone scale: 12 * log2(F0_max / F0_10%)
-                self.features_has_crit.loc[
-                    (ip.start <= self.features_has_crit["start"])
-                    & (self.features_has_crit["end"] <= ip.end),
-                    "f0_exc_ip",
-                ] = (
-                    12
-                    * np.log2(
-                        self.features_has_crit.loc[
-                            (ip.start <= self.features_has_crit["start"])
-                            & (self.features_has_crit["end"] <= ip.end),
-                            "f0_max",
-                        ]
-                        / f0_q10
-                    )
-                )
+        ips = self.tones.loc[self.tones["start"].notna() & self.tones["end"].notna()]
+        ip_starts = ips["start"].to_numpy(dtype="float64")
+        ip_ends = ips["end"].to_numpy(dtype="float64")
 
-        # Create copy of feature DataFrame to separately save 10th pitch percentile of entire sentence as low end
-        bounds = (
-            self.features.copy()
-            .loc[
-                (self.features["start"].notna())
-                & (self.features["end"].notna())
-                & (self.features["label"] == "<P>")
-            ]
-            .reset_index()
+        pitch_feats["f0_exc_ip"] = excursions(
+            f0_max,
+            find_spans(word_starts, word_ends, ip_starts, ip_ends),
+            pitch_quantiles(self.pitch_obj, ip_starts, ip_ends, 0.1),
         )
 
-        for row in bounds.itertuples():
-            if row.start == row.start and row.end == row.end:
-
-                if row.level_0 < len(bounds):
-                    utt_start = row.end
-                    try:  # find sentence boundaries
-                        utt_end = bounds.loc[bounds.index == int(row.Index) + 1][
-                            "start"
-                        ].item()
-                    except Exception:
-                        continue
-                else:
-                    utt_start = row.start
-                    utt_end = row.end
-
-                f0_q10 = praat.call(
-                    self.pitch_obj, "Get quantile", utt_start, utt_end, 0.1, "Hertz"
-                )
-
-                self.features_has_crit.loc[
-                    (row.start <= self.features_has_crit["start"])
-                    & (self.features_has_crit["end"] <= utt_end),
-                    "f0_exc_utt",
-                ] = (
-                    12
-                    * np.log2(
-                        self.features_has_crit.loc[
-                            (row.start <= self.features_has_crit["start"])
-                            & (self.features_has_crit["end"] <= utt_end),
-                            "f0_max",
-                        ]
-                        / f0_q10
-                    )
-                )
+        # Utterances (sentences) lie between two consecutive pauses (<P>)
+        bounds = self.features.loc[
+            (self.features["start"].notna())
+            & (self.features["end"].notna())
+            & (self.features["label"] == "<P>")
+        ].sort_values("start")
+        utt_starts = bounds["end"].to_numpy(dtype="float64")[:-1]
+        utt_ends = bounds["start"].to_numpy(dtype="float64")[1:]
+
+        pitch_feats["f0_exc_utt"] = excursions(
+            f0_max,
+            find_spans(word_starts, word_ends, utt_starts, utt_ends),
+            pitch_quantiles(self.pitch_obj, utt_starts, utt_ends, 0.1),
+        )
 
-        self.features_has_crit["f0_min_pos"] = [
-            (
-                praat.call(
-                    self.pitch_obj,
-                    "Get time of minimum",
-                    row.start,
-                    row.end,
-                    "Hertz",
-                    "None",
-                )
-                - row.start
+        pitch_feats["f0_min_pos"] = (
+            self.word_values(
+                lambda start, end: praat.call(
+                    self.pitch_obj, "Get time of minimum", start, end, "Hertz", "None"
+                ),
+                word_starts,
+                word_ends,
             )
-            / (row.end - row.start)
-            for row in self.features_has_crit.itertuples()
-        ]
-
-        self.features_has_crit["f0_max_pos"] = [
-            (
-                praat.call(
-                    self.pitch_obj,
-                    "Get time of maximum",
-                    row.start,
-                    row.end,
-                    "Hertz",
-                    "None",
-                )
-                - row.start
+            - word_starts
+        ) / (word_ends - word_starts)
+
+        pitch_feats["f0_max_pos"] = (
+            self.word_values(
+                lambda start, end: praat.call(
+                    self.pitch_obj, "Get time of maximum", start, end, "Hertz", "None"
+                ),
+                word_starts,
+                word_ends,
             )
-            / (row.end - row.start)
-            for row in self.features_has_crit.itertuples()
-        ]
+            - word_starts
+        ) / (word_ends - word_starts)
 
-        self.features.loc[
-            (self.features["start"].notna())
-            & (self.features["end"].notna())
-            & (self.features["label"] != "<P>")
-        ] = self.features_has_crit
+        self.set_word_features(rows, pitch_feats)
 
     def get_spectral_features(self):
         """
@@ -359,99 +270,371 @@ class WordLevelExtractor:
         - H1-H2
         """
 
-        to_add = pd.DataFrame(
-            columns=["tilt_min", "tilt_max", "tilt_mean", "tilt_range", "cog", "h1_h2"]
-        )
-
-        self.features = pd.concat([self.features, to_add])
-
-        # Filter main DataFrame for word-label rows with timestamps
-        self.features_has_crit = self.features.copy().loc[
-            (self.features["start"].notna())
-            & (self.features["end"].notna())
-            & (self.features["label"] != "<P>")
-        ]
-
         if not hasattr(self, "pitch_obj"):
             self.pitch_obj = self.snd_obj.to_pitch_cc(
                 pitch_floor=self.__pitch_range[0], pitch_ceiling=self.__pitch_range[1]
             )
 
-        # Requires separate sound slice for each word
-        if "snd_part" not in self.features_has_crit.columns:
-            self.features_has_crit["snd_part"] = [  # 10ms padding
-                self.snd_obj.extract_part(
-                    from_time=row.start - 0.01, to_time=row.end + 0.01
-                )
-                for row in self.features_has_crit.itertuples()
-            ]
+        # Word-label rows with timestamps
+        rows = np.flatnonzero(self.word_rows().to_numpy())
+        word_starts = self.features["start"].to_numpy(dtype="float64")[rows]
+        word_ends = self.features["end"].to_numpy(dtype="float64")[rows]
 
-        self.features_has_crit["mfcc_part"] = [
-            row.snd_part.to_mfcc(number_of_coefficients=1).to_array()[1]
-            for row in self.features_has_crit.itertuples()
-        ]
+        spec_feats = {
+            column: np.full(len(rows), np.nan)
+            for column in ["tilt_min", "tilt_max", "tilt_mean", "cog", "h1_h2"]
+        }
 
-        self.features_has_crit["spec_part"] = [
-            row.snd_part.to_spectrum() for row in self.features_has_crit.itertuples()
-        ]
+        for pos in range(len(rows)):
+            start, end = word_starts[pos], word_ends[pos]
 
-        self.features_has_crit["tilt_min"] = [
-            np.min(row.mfcc_part) for row in self.features_has_crit.itertuples()
-        ]
+            # Separate sound slice for each word, 10 ms padding
+            snd_part = self.snd_obj.extract_part(
+                from_time=start - 0.01, to_time=end + 0.01
+            )
 
-        self.features_has_crit["tilt_max"] = [
-            np.max(row.mfcc_part) for row in self.features_has_crit.itertuples()
-        ]
+            mfcc_part = snd_part.to_mfcc(number_of_coefficients=1).to_array()[1]
+            spec_feats["tilt_min"][pos] = np.min(mfcc_part)
+            spec_feats["tilt_max"][pos] = np.max(mfcc_part)
+            spec_feats["tilt_mean"][pos] = np.mean(mfcc_part)
+
+            spec_feats["cog"][pos] = snd_part.to_spectrum().get_center_of_gravity()
+
+            spec_feats["h1_h2"][pos] = self.h1_h2(snd_part, start, end)
+
+        spec_feats["tilt_range"] = spec_feats["tilt_max"] - spec_feats["tilt_min"]
+
+        self.set_word_features(
+            rows,
+            {
+                column: spec_feats[column]
+                for column in [
+                    "tilt_min",
+                    "tilt_max",
+                    "tilt_mean",
+                    "tilt_range",
+                    "cog",
+                    "h1_h2",
+                ]
+            },
+        )
 
-        self.features_has_crit["tilt_mean"] = [
-            np.mean(row.mfcc_part) for row in self.features_has_crit.itertuples()
-        ]
+    def h1_h2(self, snd_part, start, end):
+        """
+        H1-H2 of a word's sound slice, refer to promdetect/prep/extract_features.py::Extractor.get_h1_h2
+        """
 
-        self.features_has_crit["tilt_range"] = (
-            self.features_has_crit["tilt_max"] - self.features_has_crit["tilt_min"]
+        q25 = 0.75 * praat.call(
+            self.pitch_obj, "Get quantile", start, end, 0.25, "Hertz"
         )
+        q75 = 2.5 * praat.call(
+            self.pitch_obj, "Get quantile", start, end, 0.75, "Hertz"
+        )
+        try:
+            pitch_part = snd_part.to_pitch_cc(pitch_floor=q25, pitch_ceiling=q75)
 
-        self.features_has_crit["cog"] = [
-            row.spec_part.get_center_of_gravity()
-            for row in self.features_has_crit.itertuples()
-        ]
+            h1_freq = praat.call(pitch_part, "Get mean", 0, 0, "Hertz")
+            h2_freq = h1_freq * 2
 
-        # Refer to promdetect/prep/extract_features.py::Extractor.calc_h1_h2
-        for row in self.features_has_crit.itertuples():
-            q25 = 0.75 * praat.call(
-                self.pitch_obj, "Get quantile", row.start, row.end, 0.25, "Hertz"
-            )
-            q75 = 2.5 * praat.call(
-                self.pitch_obj, "Get quantile", row.start, row.end, 0.75, "Hertz"
+            h1_bw = 80 + 120 * h1_freq / 5_000
+            h2_bw = 80 + 120 * h2_freq / 5_000
+
+            h1_filt_snd = praat.call(snd_part, "Filter (one formant)", h1_freq, h1_bw)
+            h2_filt_snd = praat.call(snd_part, "Filter (one formant)", h2_freq, h2_bw)
+
+            h1 = praat.call(h1_filt_snd, "Get intensity (dB)")
+            h2 = praat.call(h2_filt_snd, "Get intensity (dB)")
+
+            return h1 - h2
+
+        except Exception:
+            return np.nan
+
+    def word_values(self, func, starts, ends):
+        """
+        Evaluate `func` on the start and end of each word, into a preallocated array.
+        """
+
+        values = np.empty(len(starts), dtype="float64")
+        for pos in range(len(starts)):
+            values[pos] = func(starts[pos], ends[pos])
+
+        return values
+
+    def set_word_features(self, rows, word_feats):
+        """
+        Write features computed for the word rows at positions `rows` into `self.features`, NaN for all other rows.
+        Each column is written once from a full-length float32 array instead of assigning a filtered copy of the table.
+        """
+
+        for column, values in word_feats.items():
+            column_values = np.full(len(self.features), np.nan, dtype="float32")
+            column_values[rows] = values
+            self.features[column] = column_values
+
+        schemas.enforce(self.features, schemas.SEGMENTS)
+
+
+# ANCILLARY FUNCTIONS
+def read_table(table):
+    """
+    Read annotations from a CSV file, tables are copied so that added features do not change them.
+    """
+
+    if isinstance(table, pd.DataFrame):
+        table = table.reset_index(drop=True)
+    else:
+        table = pd.read_csv(table)
+
+    return schemas.enforce(table, schemas.SEGMENTS)
+
+
+def find_spans(starts, ends, span_starts, span_ends):
+    """
+    Find the span (e.g. IP) that each interval (e.g. word) lies within, using a sorted interval join.
+    Spans are expected not to overlap, as produced by `Segmenter`.
+    Returns the position of the span in `span_starts`/`span_ends` for each interval, -1 if there is none.
+    """
+
+    if len(span_starts) == 0:
+        return np.full(len(starts), -1)
+
+    order = np.argsort(span_starts, kind="stable")
+    sorted_starts = span_starts[order]
+
+    # Last span starting at or before the interval start
+    pos = np.searchsorted(sorted_starts, starts, side="right") - 1
+    pos_valid = np.clip(pos, 0, None)
+    span_idx = order[pos_valid]
+
+    # Comparisons with missing timestamps are False, so such intervals are not assigned
+    with np.errstate(invalid="ignore"):
+        inside = (
+            (pos >= 0)
+            & (sorted_starts[pos_valid] <= starts)
+            & (ends <= span_ends[span_idx])
+        )
+
+    return np.where(inside, span_idx, -1)
+
+
+def pitch_quantiles(pitch_obj, starts, ends, quantile):
+    """
+    F0 quantile (in Hertz) of the voiced frames within each span, as "Get quantile" in Praat.
+    """
+
+    f0 = pitch_obj.selected_array["frequency"]
+    first, last = window_frames(pitch_obj.x1, pitch_obj.dx, len(f0), starts, ends)
+
+    quantiles = np.full(len(starts), np.nan)
+    for pos in range(len(starts)):
+        voiced = np.sort(f0[first[pos] : last[pos] + 1])
+        voiced = voiced[voiced > 0]
+        num_voiced = len(voiced)
+
+        if num_voiced == 1:
+            quantiles[pos] = voiced[0]
+        elif num_voiced > 1:
+            place = quantile * num_voiced + 0.5
+            left = int(min(max(np.floor(place), 1), num_voiced - 1))
+            quantiles[pos] = voiced[left] * (place - left) + voiced[left - 1] * (
+                left + 1 - place
             )
-            try:
-                pitch_part = row.snd_part.to_pitch_cc(
-                    pitch_floor=q25, pitch_ceiling=q75
-                )
 
-                h1_freq = praat.call(pitch_part, "Get mean", 0, 0, "Hertz")
-                h2_freq = h1_freq * 2
+    return quantiles
 
-                h1_bw = 80 + 120 * h1_freq / 5_000
-                h2_bw = 80 + 120 * h2_freq / 5_000
 
-                h1_filt_snd = praat.call(
-                    row.snd_part, "Filter (one formant)", h1_freq, h1_bw
-                )
-                h2_filt_snd = praat.call(
-                    row.snd_part, "Filter (one formant)", h2_freq, h2_bw
-                )
+def pitch_slopes(pitch_obj, starts, ends):
+    """
+    Mean absolute pitch slope (semitones per second) within each interval, without octave jumps,
+    computed as `get_slope_without_octave_jumps()` on the frames of the pitch contour within the interval.
+    """
 
-                h1 = praat.call(h1_filt_snd, "Get intensity (dB)")
-                h2 = praat.call(h2_filt_snd, "Get intensity (dB)")
+    f0 = pitch_obj.selected_array["frequency"]
+    first, last = window_frames(pitch_obj.x1, pitch_obj.dx, len(f0), starts, ends)
 
-                self.features_has_crit.loc[row.Index, "h1_h2"] = h1 - h2
+    voiced = np.flatnonzero(f0 > 0)
+    semitones = 12 * np.log2(f0[voiced] / 100)
 
-            except Exception:
-                continue
+    # Steps between consecutive voiced frames, jumps larger than half an octave are folded back
+    steps = np.diff(semitones)
+    steps = np.abs(steps - 12 * np.round(steps / 12))
+    cum_steps = np.concatenate([[0], np.cumsum(steps)])
 
-        self.features.loc[
-            (self.features["start"].notna())
-            & (self.features["end"].notna())
-            & (self.features["label"] != "<P>")
-        ] = self.features_has_crit
+    # First and last voiced frame of each interval
+    lo = np.searchsorted(voiced, first, side="left")
+    hi = np.searchsorted(voiced, last, side="right") - 1
+    has_slope = hi > lo
+
+    slopes = np.full(len(starts), np.nan)
+    lo, hi = lo[has_slope], hi[has_slope]
+    slopes[has_slope] = (cum_steps[hi] - cum_steps[lo]) / (
+        (voiced[hi] - voiced[lo]) * pitch_obj.dx
+    )
+
+    return slopes
+
+
+def excursions(f0_max, span_idx, span_quantiles):
+    """
+    F0 excursion of each word in semitones, relative to the F0 quantile of the span it lies within.
+    Words outside all spans get NaN.
+    """
+
+    exc = np.full(len(f0_max), np.nan)
+    in_span = span_idx >= 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exc[in_span] = 12 * np.log2(f0_max[in_span] / span_quantiles[span_idx[in_span]])
+
+    return exc
+
+
+def window_frames(x1, dx, num_frames, starts, ends):
+    """
+    First and last frame (or sample) whose time lies within each interval, as selected by Praat's queries.
+    """
+
+    first = np.maximum(np.ceil((starts - x1) / dx), 0).astype("int64")
+    last = np.minimum(np.floor((ends - x1) / dx), num_frames - 1).astype("int64")
+
+    return first, np.maximum(last, first - 1)
+
+
+def sound_rms(snd_obj, starts, ends):
+    """
+    Root-mean-square of a sound within each interval, as "Get root-mean-square" in Praat.
+    """
+
+    samples = snd_obj.values
+    first, last = window_frames(snd_obj.x1, snd_obj.dx, samples.shape[1], starts, ends)
+
+    rms = np.full(len(starts), np.nan)
+    for pos in np.flatnonzero(last >= first):
+        segment = samples[:, first[pos] : last[pos] + 1]
+        rms[pos] = np.sqrt(np.sum(segment * segment) / segment.size)
+
+    return rms
+
+
+def interval_stats(int_obj, starts, ends):
+    """
+    Minimum, maximum, their times, energy mean and standard deviation of an intensity contour within each interval,
+    computed over the frames of all intervals at once.
+    Returns a dictionary of arrays, "frames" holds the number of frames per interval.
+    Statistics of intervals without frames are NaN.
+    """
+
+    values = int_obj.values[0]
+    x1, dx, num_frames = int_obj.x1, int_obj.dx, len(values)
+    first, last = window_frames(x1, dx, num_frames, starts, ends)
+    counts = last - first + 1
+
+    stats = {
+        key: np.full(len(starts), np.nan)
+        for key in ["min", "max", "min_time", "max_time", "mean", "std"]
+    }
+    stats["frames"] = counts
+
+    has_frames = np.flatnonzero(counts > 0)
+    if len(has_frames) == 0:
+        return stats
+
+    # Frame indices of all intervals concatenated, with the interval each one belongs to
+    seg_counts = counts[has_frames]
+    offsets = np.concatenate([[0], np.cumsum(seg_counts)[:-1]])
+    seg_ids = np.repeat(np.arange(len(has_frames)), seg_counts)
+    frame_idx = (
+        np.arange(seg_counts.sum()) - offsets[seg_ids] + first[has_frames][seg_ids]
+    )
+    seg_values = values[frame_idx]
+
+    # Sorting by interval, then value, puts each interval's minimum at its offset, first occurrence first
+    seg_first, seg_last = first[has_frames], last[has_frames]
+    for key, order in [
+        ("min", np.lexsort((seg_values, seg_ids))),
+        ("max", np.lexsort((-seg_values, seg_ids))),
+    ]:
+        extreme = seg_values[order[offsets]]
+        extreme_idx = frame_idx[order[offsets]]
+
+        # Praat checks the first and the last frame before the ones in between, so a tied extremum
+        # in the last frame wins over earlier occurrences, unless the first frame holds it as well
+        last_wins = (values[seg_last] == extreme) & (values[seg_first] != extreme)
+        extreme_idx = np.where(last_wins, seg_last, extreme_idx)
+
+        stats[key][has_frames] = extreme
+        stats[f"{key}_time"][has_frames] = x1 + extreme_idx * dx
+
+    # Energy mean, interpolated over the partial frames at the interval edges as in Praat
+    energy = 10 ** (values / 10)
+    sums = np.add.reduceat(energy[frame_idx], offsets)
+    ranges = seg_counts.astype("float64")
+    sums, ranges = edge_corrections(
+        energy,
+        sums,
+        ranges,
+        x1,
+        dx,
+        first[has_frames],
+        last[has_frames],
+        starts[has_frames],
+        ends[has_frames],
+    )
+    stats["mean"][has_frames] = 10 * np.log10(sums / ranges)
+
+    # Standard deviation of the frame values around the interpolated mean
+    sums, ranges = edge_corrections(
+        values,
+        np.add.reduceat(seg_values, offsets),
+        seg_counts.astype("float64"),
+        x1,
+        dx,
+        first[has_frames],
+        last[has_frames],
+        starts[has_frames],
+        ends[has_frames],
+    )
+    deviations = seg_values - (sums / ranges)[seg_ids]
+    squares = np.add.reduceat(deviations * deviations, offsets)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["std"][has_frames] = np.where(
+            seg_counts > 1, np.sqrt(squares / (seg_counts - 1)), np.nan
+        )
+
+    return stats
+
+
+def edge_corrections(values, sums, ranges, x1, dx, first, last, starts, ends):
+    """
+    Replace the half frames at both ends of each interval by the part of the sampling interval that lies inside it,
+    linearly interpolated towards the neighbouring frame, as Praat does for the mean of a sampled contour.
+    """
+
+    num_frames = len(values)
+    sums = sums.copy()
+    ranges = ranges.copy()
+
+    # Left edge
+    left = starts > x1 - 0.5 * dx
+    phi = (x1 + first * dx - starts) / dx
+    near = values[first]
+    far = values[np.maximum(first - 1, 0)]
+    has_far = first - 1 >= 0
+    phi = np.where(has_far, phi, np.minimum(phi, 0.5))
+    part = np.where(has_far, phi * (near + 0.5 * phi * (far - near)), phi * near)
+    sums = np.where(left, sums - 0.5 * near + part, sums)
+    ranges = np.where(left, ranges - 0.5 + phi, ranges)
+
+    # Right edge
+    right = ends < x1 + (num_frames - 0.5) * dx
+    phi = (ends - (x1 + last * dx)) / dx
+    near = values[last]
+    far = values[np.minimum(last + 1, num_frames - 1)]
+    has_far = last + 1 < num_frames
+    phi = np.where(has_far, phi, np.minimum(phi, 0.5))
+    part = np.where(has_far, phi * (near + 0.5 * phi * (far - near)), phi * near)
+    sums = np.where(right, sums - 0.5 * near + part, sums)
+    ranges = np.where(right, ranges - 0.5 + phi, ranges)
+
+    return sums, ranges
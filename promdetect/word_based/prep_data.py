@@ -1,11 +1,47 @@
-from promdetect.word_based import extract_word_features
-from promdetect.prep.process_annotations import AnnotationReader
+from promdetect.word_based import extract_word_features, segmentation
+from promdetect.prep.process_annotations import speaker_registry
+from promdetect.prep.prepare_data import CFG_FILE
+from promdetect.prep import pitch_range
+from promdetect.prep import instrumentation as instr
+from promdetect.prep import schemas
+import json
 import os
 
 """
 Coordinate feature extraction with annotation processing steps, run for all recordings.
 """
 
+# Segmented word and tone annotations of the whole corpus, see `Segmenter.save_corpus()`
+annot_dir = "/home/lukas/Dokumente/Uni/ma_thesis/promdetect/data/dirndl/word_based"
+corpus_dir = "/home/lukas/Dokumente/Uni/ma_thesis/quelldaten/DIRNDL-prosody"
+speakers = speaker_registry()
+
+# Pitch ranges narrowed to the speakers if "adaptive_pitch" is set in the prep configuration
+with open(CFG_FILE, "r") as cfg:
+    prep_config = json.load(cfg)
+
+corpus = {}
+for level in ["words", "tones"]:
+    if not os.path.exists(f"{annot_dir}/{level}.pkl"):
+        segmenter = segmentation.Segmenter(level, corpus_dir)
+        segmenter.read_annotations(num_workers=os.cpu_count())
+        # Frame indices for the pitch floor of the frame-level extraction
+        segmenter.add_frame_info(
+            pitch_floors={
+                recording: pitch_range.recording_range(
+                    recording,
+                    f"{corpus_dir}/{recording}.wav",
+                    speakers.gender(recording),
+                    prep_config,
+                )[0]
+                for recording in segmenter.annotations
+            }
+        )
+        segmenter.save_corpus(f"{annot_dir}/{level}.pkl")
+    corpus[level] = segmentation.load_corpus(f"{annot_dir}/{level}.pkl")
+
+print(schemas.memory_report(corpus))
+
 with open(
     "/home/lukas/Dokumente/Uni/ma_thesis/promdetect/data/dirndl/list_recordings.txt",
     "r",
@@ -20,23 +56,34 @@ with open(
         else:
             pass
 
-        wav_file = f"/home/lukas/Dokumente/Uni/ma_thesis/quelldaten/DIRNDL-prosody/{recording}.wav"
+        wav_file = f"{corpus_dir}/{recording}.wav"
 
-        annot_dir = (
-            "/home/lukas/Dokumente/Uni/ma_thesis/promdetect/data/dirndl/word_based"
+        words = corpus["words"].loc[recording]
+        tones = corpus["tones"].loc[recording]
+        gender = speakers.gender(recording)
+        speaker_range = pitch_range.recording_range(
+            recording, wav_file, gender, prep_config
         )
-        words = f"{annot_dir}/{recording}_words.csv"
-        tones = f"{annot_dir}/{recording}_tones.csv"
-        gender = AnnotationReader(recording).get_speaker_info()[1]
 
-        extractor = extract_word_features.WordLevelExtractor(
-            wav_file, words, tones, gender="m"
-        )
+        # Opt-in measurements, enabled by the environment variable PROMDETECT_INSTRUMENTATION
+        instrumentation = instr.from_env(recording, "word")
+
+        with instr.stage(instrumentation, "__init__"):
+            extractor = extract_word_features.WordLevelExtractor(
+                wav_file, words, tones, gender=gender, pitch_range=speaker_range
+            )
+        instr.instrument(extractor, instrumentation)
+
         extractor.get_duration_features()
         extractor.get_intensity_features()
         extractor.get_pitch_features()
         extractor.get_spectral_features()
+        # Praat analyses are done, drop the Sound object of the shared recording
+        extractor.audio.release()
 
         extractor.features.to_csv(
             f"/home/lukas/Dokumente/Uni/ma_thesis/promdetect/data/features/word_based/{recording}.csv"
         )
+
+        if instrumentation is not None:
+            instrumentation.write()
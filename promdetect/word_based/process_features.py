@@ -0,0 +1,119 @@
+"""
+Pre-processing of the extracted word feature tables, as done in `manage_feature_tables.ipynb`:
+- Imputes missing data by replacing NAs with the recording-internal mean feature values
+- Standardizes data with 3 different standardizers, fitted per recording
+- Drops repeated pause labels (<P>) and rows without a label or timestamps
+"""
+
+import numpy as np
+from sklearn import preprocessing
+
+# Feature columns in the order of the word-level training sets
+WORD_FEATURES = [
+    "dur_normed",
+    "int_rms",
+    "int_min",
+    "int_max",
+    "int_mean",
+    "int_std",
+    "int_min_pos",
+    "int_max_pos",
+    "f0_min",
+    "f0_max",
+    "f0_mean",
+    "f0_std",
+    "f0_slope",
+    "f0_exc_ip",
+    "f0_exc_utt",
+    "f0_min_pos",
+    "f0_max_pos",
+    "tilt_min",
+    "tilt_max",
+    "tilt_mean",
+    "tilt_range",
+    "cog",
+    "h1_h2",
+]
+
+COLS_ABS = [
+    "dur_normed",
+    "int_rms",
+    "int_min",
+    "int_max",
+    "int_mean",
+    "int_std",
+    "f0_min",
+    "f0_max",
+    "f0_mean",
+    "f0_exc_ip",
+    "f0_exc_utt",
+    "tilt_max",
+    "tilt_mean",
+    "tilt_range",
+    "cog",
+]
+COLS_NEG_POS = ["tilt_min"]
+COLS_ROBUST = ["f0_std", "f0_slope", "h1_h2"]
+
+PAUSE = "<P>"
+
+
+def impute_missing(df):
+    """
+    Replace missing feature values with the mean value of the feature in the recording.
+    Features that are missing for the entire recording are set to 0.
+    """
+
+    df_imp = df[WORD_FEATURES].astype("float64")
+    df_imp = df_imp.fillna(df_imp.mean()).fillna(0)
+
+    return df_imp
+
+
+def standardize(df):
+    """
+    Scale the features of one recording using sklearn.preprocessing scalers.
+    """
+
+    df_standard = df.copy()
+    abs_scaler = preprocessing.MinMaxScaler()
+    neg_pos_scaler = preprocessing.MinMaxScaler(feature_range=(-1, 1))
+    robust_scaler = preprocessing.RobustScaler()
+
+    df_standard[COLS_ABS] = abs_scaler.fit_transform(df_standard[COLS_ABS].values)
+    df_standard[COLS_NEG_POS] = neg_pos_scaler.fit_transform(
+        df_standard[COLS_NEG_POS].values
+    )
+    df_standard[COLS_ROBUST] = robust_scaler.fit_transform(
+        df_standard[COLS_ROBUST].values
+    )
+
+    return df_standard
+
+
+def drop_repeated_pauses(df):
+    """
+    Keep only the last of consecutive pause labels, and only rows with a label and both timestamps.
+    """
+
+    is_pause = (df["label"] == PAUSE).to_numpy()
+    repeated = is_pause & np.append(is_pause[1:], False)
+
+    return df.loc[
+        ~repeated
+        & df["label"].notna().to_numpy()
+        & df["start"].notna().to_numpy()
+        & df["end"].notna().to_numpy()
+    ]
+
+
+def to_rows(features):
+    """
+    Run all pre-processing steps on the feature table of one recording.
+    Returns the cleaned table and the (words x features) array of its rows, pause rows included.
+    """
+
+    df = drop_repeated_pauses(features)
+    df_standard = standardize(impute_missing(features)).loc[df.index]
+
+    return df, df_standard[WORD_FEATURES].to_numpy(dtype="float32")
@@ -1,10 +1,23 @@
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
 from pathlib import Path
+from promdetect.prep import audio, schemas
 from promdetect.prep.process_annotations import read_file, clean_text
+from promdetect.word_based.extract_word_features import window_frames
 from io import StringIO
+import math
 import numpy as np
 import pandas as pd
 
+# Column types of the segmented annotations, the same for each recording
+COLUMN_TYPES = {
+    column: schemas.SEGMENTS[column]
+    for column in ["index", "end", "label", "start", "duration"]
+}
+
+# Index of labels without a start or end timestamp
+NO_INDEX = -1
+
 
 class Segmenter:
     def __init__(self, level, directory):
@@ -12,31 +25,87 @@ class Segmenter:
         self.directory = directory
         self.files = glob(f"{directory}/*.{level}")
 
-    def read_annotations(self):
-        self.annotations = {}
-        for file in self.files:
-            recording = Path(file).stem
-            raw_content = read_file(file)
+    def read_annotations(self, num_workers=1):
+        """
+        Parse and segment all annotation files of the level.
+        With num_workers > 1, the files are processed in a pool of worker processes.
+        """
+
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                tables = list(executor.map(self.segment_file, self.files, chunksize=16))
+        else:
+            tables = [self.segment_file(file) for file in self.files]
+
+        self.annotations = {
+            Path(file).stem: table for file, table in zip(self.files, tables)
+        }
+
+    def segment_file(self, file):
+        """
+        Parse a single annotation file and add the start and duration of each label.
+        """
+
+        raw_content = read_file(file)
+
+        content = StringIO(clean_text(raw_content, self.level))
+
+        content_as_df = self.content_to_df(content)
+
+        if self.level == "words":
+            content_inf_bounds = self.calc_start_end(content_as_df)
+            content_filt = self.filter_annots(content_inf_bounds)
+            return content_filt.astype(COLUMN_TYPES)
+        else:
+            content_filt = self.filter_annots(content_as_df)
+            content_inf_bounds = self.calc_start_end(content_filt)
+            return content_inf_bounds.astype(COLUMN_TYPES)
+
+    def corpus_table(self):
+        """
+        Combine the annotations of all recordings into one table,
+        indexed by recording and by the position of the label within the recording.
+        `table.loc[recording]` gives the same table as the per-recording CSV file.
+        """
+
+        table = pd.concat(
+            {
+                recording: self.annotations[recording]
+                for recording in sorted(self.annotations)
+            },
+            names=["recording", "position"],
+        )
+
+        # Labels of different recordings have different categories, which are combined as objects by `pd.concat()`
+        return schemas.enforce(table, schemas.SEGMENTS)
+
+    def add_frame_info(self, time_step=0.01, pitch_floors=None):
+        """
+        Add the first and last sample and analysis frame of each label as integer indices, both inclusive.
+        The sample rate and length are read from the WAV file of each recording in the annotation directory.
+        Frames are those of `FrameLevelExtractor` with the given time step, their window length depends on the pitch floor.
+        pitch_floors: Pitch floor for each recording, 75 Hz (female speakers) for recordings not included.
+        Labels without start timestamp get the index `NO_INDEX`, labels without any frame have an end frame before their start frame.
+        """
 
-            content = StringIO(clean_text(raw_content, self.level))
+        if pitch_floors is None:
+            pitch_floors = {}
 
-            content_as_df = self.content_to_df(content)
+        self.indexers = {}
+        for recording, df in self.annotations.items():
+            indexer = FrameIndexer.from_wav(
+                f"{self.directory}/{recording}.wav",
+                time_step,
+                pitch_floors.get(recording, 75),
+            )
+            self.indexers[recording] = indexer
 
-            if self.level == "words":
-                content_inf_bounds = self.calc_start_end(content_as_df)
-                content_filt = self.filter_annots(content_inf_bounds)
-                self.annotations[recording] = content_filt
-            else:
-                content_filt = self.filter_annots(content_as_df)
-                content_inf_bounds = self.calc_start_end(content_filt)
-                self.annotations[recording] = content_inf_bounds
+            starts = df["start"].to_numpy(dtype="float64")
+            ends = df["end"].to_numpy(dtype="float64")
 
-    # Convert timestamps to frame level, for sampling rate 48,000
-    def add_frame_info(self):
-        for df in self.annotations.values():
-            df["start_frame"] = df["start"] * 48_000
-            df["end_frame"] = df["end"] * 48_000
-            df["duration_frames"] = df["duration"] * 48_000
+            df["start_sample"], df["end_sample"] = indexer.samples(starts, ends)
+            df["start_frame"], df["end_frame"] = indexer.frames(starts, ends)
+            schemas.enforce(df, schemas.SEGMENTS)
 
     def save_output(
         self,
@@ -47,6 +116,13 @@ class Segmenter:
 
             content.to_csv(outfile + ".csv", index=False)
 
+    def save_corpus(self, path):
+        """
+        Store the annotations of all recordings in a single file, see `corpus_table()` and `load_corpus()`.
+        """
+
+        self.corpus_table().to_pickle(path)
+
     # ANCILLARY FUNCTIONS
     def filter_annots(self, content):
         if self.level == "words":
@@ -87,31 +163,102 @@ class Segmenter:
         return content_as_df
 
     def calc_start_end(self, content_as_df):
-        content_as_df["start"] = np.nan
-        content_as_df["duration"] = np.nan
-        num_rows = len(content_as_df.index)
-
         # Add data for estimated start timestamps of each word/int.phrase, which are 1ms after the end timestamp of the previous label (to avoid overlap for now). Set the starting time of the first label to N/A.
-        for i in content_as_df.index:
-            if i <= num_rows and i > 0:
-                end_time = content_as_df.loc[i, "end"]
-                start_time = content_as_df.loc[i - 1, "end"] + 0.0001
+        end_time = content_as_df["end"]
+        start_time = end_time.shift(1) + 0.0001
+        duration = end_time - start_time
 
-                duration = end_time - start_time
+        # Words are limited to 3 seconds, counting back from their end
+        if self.level == "words":
+            too_long = duration > 3.0
+            start_time = start_time.mask(too_long, end_time - 3.0)
+            duration = duration.mask(too_long, 3.0)
 
-                if self.level == "words":
-                    if duration > 3.0:
-                        content_as_df.at[i, "start"] = end_time - 3.0
-                        content_as_df.at[i, "duration"] = 3.0
+        content_as_df["start"] = start_time
+        content_as_df["duration"] = duration
 
-                    else:
-                        content_as_df.at[i, "start"] = start_time
-                        content_as_df.at[i, "duration"] = end_time - start_time
+        return content_as_df
 
-                elif self.level == "tones":
-                    content_as_df.at[i, "start"] = start_time
-                    content_as_df.at[i, "duration"] = end_time - start_time
-            else:
-                continue
 
-        return content_as_df
+class FrameIndexer:
+    """
+    Convert timestamps of one recording to integer sample and analysis frame indices.
+    The frames follow Praat's short-term analysis: frames of `time_step` seconds centred on the recording,
+    as many as fit analysis windows of two periods of the pitch floor (see `Sound.to_pitch_cc()`).
+    An interval contains the samples and frames whose time lies within it, as selected by Praat's queries.
+    """
+
+    def __init__(self, sample_rate, num_samples, time_step=0.01, pitch_floor=75):
+        self.sample_rate = sample_rate
+        self.num_samples = num_samples
+        self.time_step = time_step
+
+        duration = num_samples / sample_rate
+        window_length = 2 / pitch_floor
+
+        self.num_frames = max(math.floor((duration - window_length) / time_step) + 1, 0)
+        self.x1 = 0.5 * duration - 0.5 * self.num_frames * time_step + 0.5 * time_step
+
+    @classmethod
+    def from_wav(cls, wav_file, time_step=0.01, pitch_floor=75):
+        """
+        Read sample rate and length from the header of a WAV file.
+        """
+
+        wav = audio.as_wav(wav_file)
+
+        return cls(wav.sample_rate, wav.num_samples, time_step, pitch_floor)
+
+    def frame_times(self):
+        return self.x1 + self.time_step * np.arange(self.num_frames)
+
+    def samples(self, starts, ends):
+        """
+        First and last sample within each interval.
+        """
+
+        return self.indices(
+            0.5 / self.sample_rate, 1 / self.sample_rate, self.num_samples, starts, ends
+        )
+
+    def frames(self, starts, ends):
+        """
+        First and last analysis frame within each interval.
+        """
+
+        return self.indices(self.x1, self.time_step, self.num_frames, starts, ends)
+
+    def indices(self, x1, dx, num_frames, starts, ends):
+        starts = np.asarray(starts, dtype="float64")
+        ends = np.asarray(ends, dtype="float64")
+        valid = ~(np.isnan(starts) | np.isnan(ends))
+
+        first = np.full(len(starts), NO_INDEX, dtype="int64")
+        last = np.full(len(starts), NO_INDEX, dtype="int64")
+        first[valid], last[valid] = window_frames(
+            x1, dx, num_frames, starts[valid], ends[valid]
+        )
+
+        return first, last
+
+
+def span_table(words):
+    """
+    First and last frame of each word that covers at least one frame, as used by the frame CNN.
+    words: Word annotations with frame indices, see `Segmenter.add_frame_info()`.
+    Returns a (words x 2) array of frame indices.
+    """
+
+    first = words["start_frame"].to_numpy(dtype="int64")
+    last = words["end_frame"].to_numpy(dtype="int64")
+    has_frames = (first != NO_INDEX) & (last >= first)
+
+    return np.stack([first[has_frames], last[has_frames]], axis=1)
+
+
+def load_corpus(path):
+    """
+    Load annotations stored with `Segmenter.save_corpus()`.
+    """
+
+    return pd.read_pickle(path)
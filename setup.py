@@ -12,11 +12,30 @@ setuptools.setup(
     long_description=longDescription,
     long_description_content_type="text/markdown",
     url="https://github.com/lhenne/promdetect",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_namespace_packages(include=["promdetect", "promdetect.*"]),
+    package_data={
+        "promdetect.models": ["config.json"],
+        "promdetect.prep": ["config.json"],
+    },
+    entry_points={
+        "console_scripts": [
+            "promdetect-train=promdetect.models.training:main",
+            "promdetect-train-forest=promdetect.models.forest:main",
+            "promdetect-sweep=promdetect.models.sweep:main",
+            "promdetect-predict=promdetect.models.inference:main",
+            "promdetect-accelerate=promdetect.models.acceleration:main",
+            "promdetect-export=promdetect.models.export:main",
+            "promdetect-quantize=promdetect.models.quantization:main",
+            "promdetect-benchmark=promdetect.benchmarks.run:main",
+            "promdetect-build-sets=promdetect.prep.build_sets:main",
+            "promdetect-oversample=promdetect.prep.oversampling:main",
+        ]
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
+    extras_require={"onnx": ["onnx", "onnxruntime"]},
     python_requires='>=3.7.3'
 )
\ No newline at end of file
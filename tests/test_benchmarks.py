@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+
+from promdetect.benchmarks import run, synthetic
+from promdetect.prep import process_annotations
+
+
+class SyntheticRecordingTests(unittest.TestCase):
+    def test_write_recording(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_file, nuclei = synthetic.write_recording(tmp_dir, "rec", 5.0)
+
+            words = process_annotations.AnnotationReader(
+                f"{tmp_dir}/rec.words"
+            ).get_annotation_data()
+            phones = process_annotations.AnnotationReader(
+                f"{tmp_dir}/rec.phones"
+            ).get_annotation_data()
+
+        self.assertTrue(wav_file.name == "rec.wav")
+        self.assertTrue(4.0 < words["end"].max() < 5.5)
+        self.assertEqual(len(nuclei), (phones["label"] == "a:").sum())
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_run_benchmarks(self):
+        results = run.run_benchmarks([3.0], ["word"])
+        stages = [result["stage"] for result in results]
+
+        self.assertTrue("get_pitch_features" in stages)
+        for result in results:
+            self.assertTrue(result["error"] is None, result["stage"])
+            self.assertAlmostEqual(
+                result["rtf"], result["seconds"] / result["audio_seconds"]
+            )
+
+        ratios = run.compare(results, {"results": results})
+        self.assertTrue(all(result["ratio"] == 1.0 for result in ratios))
+
+    def test_nucleus_features(self):
+        results = run.run_benchmarks([3.0], ["nucleus"])
+        errors = {result["stage"]: result["error"] for result in results}
+
+        # Features are timed on the synthetic nuclei, whether or not detection succeeds
+        for stage in ["__init__", "get_f0_max_nuclei", "get_excursion", "get_h1_h2"]:
+            self.assertIn(stage, errors)
+            self.assertIsNone(errors[stage], stage)
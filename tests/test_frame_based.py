@@ -1,6 +1,12 @@
+import tempfile
 import unittest
 import numpy as np
-from promdetect.frame_based import extract_frame_features
+import pandas as pd
+import parselmouth as pm
+import torch
+from promdetect.benchmarks import synthetic
+from promdetect.frame_based import extract_frame_features, streaming
+from promdetect.models import networks
 
 
 class FrameBasedExtractionTests(unittest.TestCase):
@@ -97,3 +103,146 @@ class FrameBasedExtractionTests(unittest.TestCase):
         )
 
         cls.assertTrue(np.array_equal(expected_hnr_vals, true_hnr_vals))
+
+
+class WordInfoTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.wav_file = f"{cls.tmp_dir.name}/synthetic.wav"
+
+        times = np.arange(32_000) / 16_000
+        pm.Sound(0.5 * np.sin(2 * np.pi * 140 * times), 16_000).save(
+            cls.wav_file, "WAV"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_add_word_info(self):
+        for gender in ["f", "m"]:
+            tester = extract_frame_features.FrameLevelExtractor(self.wav_file, gender)
+            indexer = tester.frame_indexer()
+
+            self.assertTrue(np.allclose(indexer.frame_times(), tester.features["time"]))
+
+            words = pd.DataFrame(
+                {"label": ["eins", "zwei"], "start": [0.2, 1.0], "end": [0.8, 1.5]}
+            )
+            words["start_frame"], words["end_frame"] = indexer.frames(
+                words["start"], words["end"]
+            )
+            tester.add_word_info(words)
+
+            for word in words.itertuples():
+                in_word = (tester.features["time"] >= word.start) & (
+                    tester.features["time"] <= word.end
+                )
+                self.assertTrue(
+                    (tester.features.loc[in_word, "word"] == word.label).all()
+                )
+                self.assertTrue(
+                    tester.features.loc[~in_word, "word"].ne(word.label).all()
+                )
+
+
+class StreamingTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        wav_file, _ = synthetic.write_recording(
+            cls.tmp_dir.name, duration=3.0, f0=200.0
+        )
+        cls.wav_file = str(wav_file)
+        cls.samples = pm.Sound(cls.wav_file).values[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def stream(self, block_size):
+        extractor = streaming.StreamingFrameExtractor(16_000, "f")
+        frames = [
+            extractor.push(self.samples[start : start + block_size])
+            for start in range(0, len(self.samples), block_size)
+        ]
+        frames.append(extractor.flush())
+
+        return pd.concat(frames, ignore_index=True)
+
+    def test_block_size_invariance(self):
+        frames_10ms = self.stream(160)
+        frames_100ms = self.stream(1600)
+
+        self.assertEqual(list(frames_10ms.columns), ["time"] + streaming.FRAME_FEATURES)
+        self.assertTrue(np.allclose(np.diff(frames_10ms["time"]), 0.01))
+        pd.testing.assert_frame_equal(frames_10ms, frames_100ms)
+
+    def test_close_to_batch_extraction(self):
+        frames = self.stream(800)
+
+        tester = extract_frame_features.FrameLevelExtractor(
+            self.wav_file, "f", self.tmp_dir.name
+        )
+        tester.rms_extraction()
+        tester.loudness_extraction()
+        tester.zcr_extraction()
+
+        # Frame grids differ by less than one time step
+        batch = pd.merge_asof(
+            frames[["time"]],
+            tester.features.reset_index(drop=True),
+            on="time",
+            direction="nearest",
+        )
+
+        for feature in ["rms", "loudness", "zcr"]:
+            self.assertGreater(np.corrcoef(frames[feature], batch[feature])[0, 1], 0.9)
+
+        self.assertAlmostEqual(
+            (frames["f0"] > 0).mean(), (batch["f0"] > 0).mean(), delta=0.1
+        )
+
+    def test_short_stream(self):
+        """
+        Are streams shorter than the analysis windows flushed without errors?
+        """
+
+        for num_samples in [0, 160, 400, 800]:
+            for gender in ["f", "m"]:
+                extractor = streaming.StreamingFrameExtractor(16_000, gender)
+                frames = pd.concat(
+                    [extractor.push(self.samples[:num_samples]), extractor.flush()],
+                    ignore_index=True,
+                )
+
+                self.assertEqual(
+                    list(frames.columns), ["time"] + streaming.FRAME_FEATURES
+                )
+                self.assertTrue((frames["time"] < num_samples / 16_000).all())
+
+    def test_streaming_cnn(self):
+        torch.manual_seed(0)
+        cnn = networks.FrameClassifier(len(streaming.FRAME_FEATURES)).eval()
+
+        frames = pd.DataFrame(
+            np.random.default_rng(0).normal(size=(301, 6)),
+            columns=streaming.FRAME_FEATURES,
+        )
+        with torch.no_grad():
+            expected = torch.sigmoid(
+                cnn.frame_logits(
+                    torch.tensor(frames.to_numpy(dtype="float32").T).unsqueeze(0)
+                )[0, :, 0]
+            ).numpy()
+
+        for block_size in [1, 7, 40]:
+            classifier = streaming.StreamingFrameClassifier(cnn)
+            scores = [
+                classifier.push(frames.iloc[start : start + block_size])
+                for start in range(0, len(frames), block_size)
+            ]
+            scores.append(classifier.flush())
+
+            self.assertTrue(np.allclose(np.concatenate(scores), expected, atol=1e-6))
@@ -0,0 +1,812 @@
+"""
+Code to test the packaged training engine in the `models` submodule
+"""
+
+import importlib.util
+import json
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+from sklearn.metrics import classification_report
+from promdetect.models import (
+    acceleration,
+    datasets,
+    export,
+    forest,
+    inference,
+    metrics,
+    networks,
+    quantization,
+    runtime,
+    sweep,
+    training,
+)
+from promdetect.prep import process_features
+from promdetect.prep.build_sets import write_ragged
+
+
+def ragged_set(lengths, width=None, seed=0):
+    """
+    Create a ragged object array like the stored training sets.
+    """
+
+    rng = np.random.default_rng(seed)
+    data = np.empty(len(lengths), dtype=object)
+    for i, length in enumerate(lengths):
+        if width is None:
+            data[i] = rng.integers(0, 2, length)
+        else:
+            data[i] = rng.normal(size=(length, width))
+    return data
+
+
+def loop_word_inputs(word_features, preds, times):
+    """
+    Word-level LSTM input as built by `prepare_input()` in the CNN+LSTM notebook.
+    """
+
+    total_input = torch.zeros(
+        word_features.shape[0], word_features.shape[1], word_features.shape[2] + 1
+    )
+    total_input[:, :, :-1] = word_features
+
+    for idx in range(len(times)):
+        for jdx in range(len(times[idx])):
+            span = times[idx][jdx]
+            if span[1] != 0.0 and span[0] != span[1]:
+                start = int(span[0]) + 1
+                end = int(span[1]) + 1
+                total_input[idx, jdx, -1] = sum(preds[idx][start:end])
+
+    return total_input
+
+
+class DatasetTests(unittest.TestCase):
+    """
+    Are the ragged sets padded and reduced correctly?
+    """
+
+    def test_sequence_lengths(self):
+        features = ragged_set([3, 5, 2], width=4)
+        labels = ragged_set([3, 5, 2])
+
+        tester = datasets.SequenceDataset(features, labels, total_length=6)
+
+        self.assertEqual(tester.features.shape, (3, 6, 4))
+        self.assertEqual(tester.labels.shape, (3, 6))
+        self.assertEqual(list(tester.lengths), [3, 5, 2])
+
+    def test_halving_mask(self):
+        """
+        Does the halving mask keep the same elements as deleting every second element in the notebooks?
+        """
+
+        for length in [7, 8]:
+            arr = np.arange(length)
+            expected = np.delete(arr, np.arange(0, arr.size - 1, 2))
+
+            self.assertTrue(
+                np.array_equal(arr[datasets.halving_mask(length).numpy()], expected)
+            )
+
+
+class MetricsTests(unittest.TestCase):
+    """
+    Does the confusion matrix accumulator agree with sklearn on the unpadded positions?
+    """
+
+    def test_masked_report(self):
+        torch.manual_seed(1)
+        lengths = torch.tensor([6, 3, 8])
+        tester = metrics.ConfusionMatrix()
+        y_true = []
+        y_pred = []
+
+        for i in range(3):
+            logits = torch.randn(3, 8, 1)
+            labels = torch.randint(0, 2, (3, 8)).float()
+            tester.update(logits, labels, lengths)
+
+            for j, length in enumerate(lengths):
+                y_true.extend(labels[j, :length].int().tolist())
+                y_pred.extend(
+                    (torch.sigmoid(logits[j, :length, 0]) > 0.5).int().tolist()
+                )
+
+        self.assertEqual(int(tester.counts.sum()), 3 * int(lengths.sum()))
+        self.assertEqual(
+            tester.format_report(digits=4),
+            classification_report(y_true, y_pred, digits=4),
+        )
+
+
+class TrainerTests(unittest.TestCase):
+    """
+    Can the model definitions be trained and evaluated end to end?
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+
+        nucleus_lengths = [12, 9, 15, 7, 11, 10, 8, 14, 13, 6]
+        np.save(
+            self.data_dir.joinpath("nucleus_features.npy"),
+            ragged_set(nucleus_lengths, width=5),
+        )
+        np.save(
+            self.data_dir.joinpath("nucleus_labels.npy"), ragged_set(nucleus_lengths)
+        )
+
+        frame_lengths = [64, 80, 72, 96, 56, 88, 64, 72, 80, 64]
+        word_lengths = [3, 4, 3, 5, 2, 4, 3, 3, 4, 3]
+        times = np.empty(len(frame_lengths), dtype=object)
+        for i, (frames, words) in enumerate(zip(frame_lengths, word_lengths)):
+            bounds = np.linspace(1, frames - 1, words + 1).astype(int)
+            times[i] = np.stack([bounds[:-1], bounds[1:] - 1], axis=1)
+
+        np.save(
+            self.data_dir.joinpath("frame_features.npy"),
+            ragged_set(frame_lengths, width=4),
+        )
+        np.save(self.data_dir.joinpath("frame_labels.npy"), ragged_set(frame_lengths))
+        np.save(self.data_dir.joinpath("frame_times.npy"), times)
+        np.save(
+            self.data_dir.joinpath("word_features.npy"),
+            ragged_set(word_lengths, width=3),
+        )
+        np.save(self.data_dir.joinpath("word_labels.npy"), ragged_set(word_lengths))
+
+        self.config = training.load_config()
+        self.config["data_dir"] = str(self.data_dir)
+        self.config["model_store"] = str(self.data_dir.joinpath("store"))
+        self.config["eval_dir"] = str(self.data_dir.joinpath("eval"))
+        self.config["device"] = "cpu"
+
+        for name, cfg in self.config["models"].items():
+            for key in ["features", "labels", "times", "words", "words_labels"]:
+                if key in cfg:
+                    cfg[key] = Path(cfg[key]).name
+            cfg["features_unbalanced"] = "nucleus_features.npy"
+            cfg["labels_unbalanced"] = "nucleus_labels.npy"
+            cfg["batch_size"] = 4
+            cfg["epochs"] = 2
+
+        self.config["models"]["nucleus_smotenc"]["features"] = "nucleus_features.npy"
+        self.config["models"]["nucleus_smotenc"]["labels"] = "nucleus_labels.npy"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_train_nucleus(self):
+        # Labels follow the sign of the first feature, so a few epochs find a model with a positive F1 score
+        features = ragged_set([12, 9, 15, 7, 11, 10, 8, 14, 13, 6], width=5)
+        labels = np.empty(len(features), dtype=object)
+        for i, seq in enumerate(features):
+            labels[i] = (seq[:, 0] > 0).astype(int)
+        np.save(self.data_dir.joinpath("nucleus_features.npy"), features)
+        np.save(self.data_dir.joinpath("nucleus_labels.npy"), labels)
+        self.config["models"]["nucleus"].update(epochs=10, learning_rate=0.01)
+
+        torch.manual_seed(1)
+        tester = training.Trainer(self.config, "nucleus")
+        best_model = tester.train()
+
+        self.assertTrue(best_model.is_file())
+        report = tester.validate(networks.load_checkpoint(best_model)).report()
+        self.assertEqual(
+            set(report), {"0", "1", "accuracy", "macro avg", "weighted avg"}
+        )
+        self.assertEqual(
+            set(report["1"]), {"precision", "recall", "f1-score", "support"}
+        )
+        self.assertGreater(report["1"]["f1-score"], 0)
+
+        tester.evaluate(best_model)
+        self.assertTrue(tester.eval_dir.joinpath(f"{best_model.name}.txt").is_file())
+
+    def test_train_cnn_lstm(self):
+        cnn_trainer = training.Trainer(self.config, "frame_cnn")
+        cnn_model = self.data_dir.joinpath("cnn.pt")
+        networks.save_checkpoint(cnn_trainer.network, cnn_model)
+
+        self.config["models"]["cnn_lstm"]["cnn_model"] = str(cnn_model)
+        tester = training.Trainer(self.config, "cnn_lstm")
+        tester.train(epochs=1)
+
+        # One pipeline serves all batches of the trained network
+        pipeline = tester.definition.pipeline
+        self.assertIs(pipeline.lstm, tester.network)
+
+        report = tester.evaluate()
+        self.assertTrue("precision" in report)
+        self.assertIs(tester.definition.pipeline, pipeline)
+
+    def test_fused_cnn_lstm(self):
+        """
+        Does the fused module give the same word predictions as running both stages separately?
+        """
+
+        train_set, val_set = training.FrameCNNDefinition(
+            self.config["models"]["frame_cnn"], self.config["data_dir"]
+        ).load_datasets()
+        batch = next(iter(torch.utils.data.DataLoader(train_set, batch_size=4)))
+
+        cnn = networks.FrameClassifier(4).eval()
+        lstm = networks.WordClassifier(4, train_set.total_words).eval()
+
+        with torch.no_grad():
+            word_input = loop_word_inputs(
+                batch["words"], cnn(batch["features"], batch["times"]), batch["times"]
+            )
+            expected, discard = lstm(
+                torch.nn.utils.rnn.pack_padded_sequence(
+                    word_input,
+                    batch["words_lengths"],
+                    batch_first=True,
+                    enforce_sorted=False,
+                )
+            )
+            fused = torch.jit.script(networks.CNNLSTMClassifier(cnn, lstm))
+            preds = fused(
+                batch["features"],
+                batch["times"],
+                batch["words"],
+                batch["words_lengths"],
+            )
+
+        self.assertTrue(torch.allclose(preds, expected, atol=1e-5))
+
+    def test_accelerated_parity(self):
+        tester = training.Trainer(self.config, "nucleus")
+        results = acceleration.parity(tester, tester.network, "bf16")
+
+        self.assertLess(results["max_abs_diff"], 0.05)
+        self.assertGreaterEqual(results["agreement"], 0.9)
+        self.assertIn("f1_bf16", results)
+
+        tester = training.Trainer(self.config, "frame_cnn")
+        results = acceleration.parity(
+            tester, tester.network, "compile", backend="eager", min_agreement=0.9
+        )
+
+        self.assertTrue(results["passed"])
+        self.assertLess(results["max_abs_diff"], 0.05)
+
+    def test_quantize_nucleus(self):
+        torch.manual_seed(1)
+        model_file = self.data_dir.joinpath("nucleus.pt")
+        networks.save_checkpoint(networks.NucleusClassifier(5), model_file)
+        config_file = self.data_dir.joinpath("config.json")
+        with open(config_file, "w") as cfg:
+            json.dump(self.config, cfg)
+        out_dir = self.data_dir.joinpath("int8")
+
+        quantization.main(
+            ["nucleus", str(model_file), str(out_dir), "--config", str(config_file)]
+        )
+
+        with open(out_dir.joinpath("quantization.json"), "r") as results_file:
+            results = json.load(results_file)
+        self.assertLess(results["bytes_int8"], results["bytes_float32"])
+        self.assertGreaterEqual(results["agreement"], 0.9)
+        self.assertLess(abs(results["f1_int8"] - results["f1_float32"]), 0.1)
+
+        quantized = networks.load_model(out_dir.joinpath("checkpoint.pt"))
+        self.assertTrue(quantized.quantized)
+
+        features = torch.randn(2, 8, 5)
+        lengths = torch.tensor([8, 5])
+        with torch.no_grad():
+            expected = torch.sigmoid(
+                quantized(
+                    pack_padded_sequence(
+                        features, lengths, batch_first=True, enforce_sorted=False
+                    )
+                )
+            ).squeeze(2)
+
+        exported = runtime.load(out_dir)
+        probs = exported.predict(features.numpy(), lengths.numpy())
+        self.assertTrue(np.allclose(probs[0], expected[0].numpy(), atol=1e-5))
+        self.assertTrue(np.allclose(probs[1, :5], expected[1, :5].numpy(), atol=1e-5))
+
+    def test_quantize_cnn_lstm(self):
+        torch.manual_seed(1)
+        cnn = networks.FrameClassifier(4).eval()
+        lstm = networks.WordClassifier(4).eval()
+        out_dir = self.data_dir.joinpath("cnn_lstm_int8")
+
+        meta = quantization.export_quantized(
+            "cnn_lstm", networks.quantize(lstm), out_dir, cnn
+        )
+
+        self.assertEqual(meta["quantized"], "dynamic_int8")
+        self.assertTrue(out_dir.joinpath("model.pt").exists())
+        self.assertTrue(
+            networks.load_model(out_dir.joinpath("checkpoint.pt")).quantized
+        )
+
+    def test_checkpoint_round_trip(self):
+        network = networks.NucleusClassifier(5, 15).eval()
+        checkpoint = self.data_dir.joinpath("nucleus.pt")
+        networks.save_checkpoint(network, checkpoint)
+
+        loaded = networks.load_checkpoint(checkpoint).eval()
+        inputs = torch.nn.utils.rnn.pack_padded_sequence(
+            torch.randn(2, 15, 5), [15, 9], batch_first=True, enforce_sorted=False
+        )
+
+        self.assertTrue(torch.allclose(network(inputs), loaded(inputs)))
+
+    def test_command_line_arguments(self):
+        args = training.parse_args(
+            ["nucleus", "--epochs", "3", "--num-workers", "2", "--no-pin-memory"]
+        )
+        config = training.apply_args(self.config, args)
+
+        self.assertEqual(config["models"]["nucleus"]["epochs"], 3)
+        self.assertEqual(config["loader"]["num_workers"], 2)
+        self.assertFalse(config["loader"]["pin_memory"])
+
+
+class InferenceTests(unittest.TestCase):
+    """
+    Are raw nucleus tables turned into model inputs and predicted per recording?
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_file = Path(self.tmp_dir.name).joinpath("nucleus.pt")
+
+        torch.manual_seed(1)
+        networks.save_checkpoint(
+            networks.NucleusClassifier(len(process_features.NUCLEUS_FEATURES), 40),
+            self.model_file,
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_to_sequence(self):
+        rng = np.random.default_rng(0)
+        features = pd.DataFrame(
+            rng.normal(size=(6, 25)), columns=process_features.NUCLEUS_FEATURES[:-1]
+        )
+        features["start_est"] = [0.1, 0.3, 0.3, 0.6, 0.9, 1.2]
+        features["end"] = [0.2, 0.4, 0.4, 0.7, 1.0, 1.3]
+        features["accent_label"] = ["H*", None, None, "L*", None, None]
+        features.loc[4, "rms"] = np.nan
+
+        nuclei, sequence = process_features.to_sequence(features, "m")
+
+        self.assertEqual(sequence.shape, (5, 26))
+        self.assertEqual(sequence.dtype, np.float32)
+        self.assertFalse(np.isnan(sequence).any())
+        self.assertEqual(list(nuclei["has_accent"]), [1, 0, 1, 0, 0])
+        self.assertTrue((sequence[:, -1] == 1).all())
+
+    def test_predict_sequences(self):
+        tester = inference.NucleusPredictor(self.model_file)
+        sequences = [torch.randn(length, 26) for length in [7, 12, 3]]
+
+        probs = tester.predict_sequences(sequences)
+
+        self.assertEqual([len(prob) for prob in probs], [7, 12, 3])
+        self.assertTrue(all(((prob >= 0) & (prob <= 1)).all() for prob in probs))
+
+        single = tester.predict_sequences(sequences[1:2])[0]
+        self.assertTrue(np.allclose(single, probs[1], atol=1e-6))
+
+    def test_padded_lstm(self):
+        torch.manual_seed(1)
+        lstm = torch.nn.LSTM(6, 16, num_layers=2, bidirectional=True, batch_first=True)
+        lengths = torch.tensor([5, 9, 2])
+        packed = pack_padded_sequence(
+            torch.randn(3, 9, 6), lengths, batch_first=True, enforce_sorted=False
+        )
+
+        with torch.no_grad():
+            expected, (expected_h, discard) = lstm(packed)
+            output, (h, c) = acceleration.PaddedLSTM(lstm)(packed)
+
+        self.assertTrue(
+            torch.allclose(
+                pad_packed_sequence(output, batch_first=True)[0],
+                pad_packed_sequence(expected, batch_first=True)[0],
+                atol=1e-6,
+            )
+        )
+        self.assertTrue(torch.allclose(h, expected_h, atol=1e-6))
+        self.assertIsNone(c)
+
+    def test_accelerated_predictor(self):
+        sequences = [torch.randn(length, 26) for length in [7, 12, 3]]
+
+        expected = inference.NucleusPredictor(self.model_file).predict_sequences(
+            sequences
+        )
+        tester = inference.NucleusPredictor(self.model_file, mode="bf16")
+        probs = tester.predict_sequences(sequences)
+
+        self.assertIsInstance(tester.model, acceleration.AcceleratedModel)
+        for prob, expected_prob in zip(probs, expected):
+            self.assertEqual(prob.dtype, np.float32)
+            self.assertTrue(np.allclose(prob, expected_prob, atol=0.02))
+
+        with self.assertRaises(ValueError):
+            inference.NucleusPredictor(self.model_file, mode="fp8")
+
+    def test_legacy_predictor(self):
+        store = Path(networks.__file__).parent.joinpath("model_store", "nucleus_level")
+        sequences = [torch.randn(length, 26) for length in [7, 12, 3]]
+        lengths = torch.tensor([7, 12, 3])
+
+        for model_file in sorted(store.glob("model-*.pt")):
+            with self.subTest(model=model_file.name):
+                tester = inference.NucleusPredictor(model_file)
+                probs = tester.predict_sequences(sequences)
+
+                # Reference: the pickled notebook layers, applied in the order of the notebook
+                legacy = torch.load(
+                    model_file,
+                    map_location="cpu",
+                    pickle_module=networks._legacy_pickle,
+                    weights_only=False,
+                ).eval()
+                with torch.no_grad():
+                    packed = pack_padded_sequence(
+                        torch.nn.utils.rnn.pad_sequence(sequences, batch_first=True),
+                        lengths,
+                        batch_first=True,
+                        enforce_sorted=False,
+                    )
+                    lstm_out, discard = legacy.lstm_1(packed)
+                    x, discard_lengths = pad_packed_sequence(lstm_out, batch_first=True)
+                    num_dense = len(tester.model.dense_layers())
+                    for i in range(1, num_dense + 1):
+                        x = getattr(legacy, f"dense_{i}")(torch.relu(x))
+                    expected = torch.sigmoid(x).squeeze(2)
+
+                self.assertIsInstance(tester.model, networks.NucleusClassifier)
+                for i, prob in enumerate(probs):
+                    self.assertTrue(
+                        np.allclose(prob, expected[i, : lengths[i]], atol=1e-6)
+                    )
+
+
+class ForestTests(unittest.TestCase):
+    """
+    Is the random forest grown from chunks of a memory-mapped set and predicted in batches?
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+
+        rng = np.random.default_rng(0)
+        lengths = rng.integers(20, 40, size=20)
+        features = rng.normal(size=(lengths.sum(), 5)).astype("float32")
+        labels = (features[:, 0] + 0.3 * rng.normal(size=len(features)) > 0.5).astype(
+            "int8"
+        )
+
+        write_ragged(self.data_dir.joinpath("features.npy"), features, lengths)
+        write_ragged(self.data_dir.joinpath("labels.npy"), labels, lengths)
+
+        self.features = datasets.load_set(self.data_dir, "features.npy")
+        self.labels = datasets.load_set(self.data_dir, "labels.npy")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunk_bounds(self):
+        bounds = forest.chunk_bounds(np.array([5, 3, 4, 10, 2]), chunk_size=8)
+
+        self.assertEqual(list(bounds), [0, 2, 4, 5])
+        self.assertEqual(list(forest.chunk_bounds(np.array([5, 3]))), [0, 2])
+
+    def test_chunked_fit(self):
+        tester = forest.NucleusForest(n_estimators=20, n_jobs=2, batch_size=50)
+        tester.fit(self.features, self.labels, chunk_size=150)
+
+        self.assertEqual(len(tester.model.estimators_), 20)
+
+        rows = np.concatenate(self.features)
+        probs = tester.predict_sequences(self.features)
+        self.assertEqual(
+            [len(prob) for prob in probs], [len(seq) for seq in self.labels]
+        )
+        self.assertTrue(np.allclose(np.concatenate(probs), tester.predict_proba(rows)))
+        self.assertTrue(
+            np.allclose(
+                tester.predict_proba(rows),
+                tester.model.predict_proba(rows)[:, 1],
+            )
+        )
+
+        accuracy = (tester.predict(rows) == np.concatenate(self.labels)).mean()
+        self.assertGreater(accuracy, 0.8)
+
+    def test_train_and_evaluate(self):
+        config = training.load_config()
+        config["models"]["random_forest"].update(
+            features="features.npy", labels="labels.npy"
+        )
+        config_file = self.data_dir.joinpath("config.json")
+        with open(config_file, "w") as cfg:
+            json.dump(config, cfg)
+
+        forest.main(
+            [
+                "--config",
+                str(config_file),
+                "--data-dir",
+                str(self.data_dir),
+                "--model-store",
+                str(self.data_dir.joinpath("store")),
+                "--eval-dir",
+                str(self.data_dir),
+                "--n-estimators",
+                "10",
+                "--chunk-size",
+                "200",
+                "--num-jobs",
+                "1",
+            ]
+        )
+
+        model_file = self.data_dir.joinpath(
+            "store", "nucleus_level", "model-random_forest-est_10.joblib"
+        )
+        stored = forest.NucleusForest.load(model_file)
+        self.assertEqual(len(stored.model.estimators_), 10)
+        self.assertTrue(
+            self.data_dir.joinpath(
+                "nucleus_level", "eval", "model-random_forest-est_10.txt"
+            ).exists()
+        )
+
+
+class SweepTests(unittest.TestCase):
+    """
+    Are the folds grouped by speaker and are all runs collected in one results table?
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+
+        lengths = [12, 9, 15, 7, 11, 10, 8, 14, 13, 6]
+        np.save(
+            self.data_dir.joinpath("nucleus_features.npy"),
+            ragged_set(lengths, width=5),
+        )
+        np.save(self.data_dir.joinpath("nucleus_labels.npy"), ragged_set(lengths))
+
+        rows = np.concatenate(ragged_set(lengths, width=5)).astype("float32")
+        write_ragged(self.data_dir.joinpath("forest_features.npy"), rows, lengths)
+        write_ragged(
+            self.data_dir.joinpath("forest_labels.npy"),
+            np.concatenate(ragged_set(lengths)).astype("int8"),
+            lengths,
+        )
+
+        frame_lengths = [64, 80, 72, 96, 56, 88, 64, 72, 80, 64]
+        word_lengths = [3, 4, 3, 5, 2, 4, 3, 3, 4, 3]
+        times = np.empty(len(frame_lengths), dtype=object)
+        for i, (frames, words) in enumerate(zip(frame_lengths, word_lengths)):
+            bounds = np.linspace(1, frames - 1, words + 1).astype(int)
+            times[i] = np.stack([bounds[:-1], bounds[1:] - 1], axis=1)
+
+        np.save(
+            self.data_dir.joinpath("frame_features.npy"),
+            ragged_set(frame_lengths, width=4),
+        )
+        np.save(self.data_dir.joinpath("frame_labels.npy"), ragged_set(frame_lengths))
+        np.save(self.data_dir.joinpath("frame_times.npy"), times)
+        np.save(
+            self.data_dir.joinpath("word_features.npy"),
+            ragged_set(word_lengths, width=3),
+        )
+        np.save(self.data_dir.joinpath("word_labels.npy"), ragged_set(word_lengths))
+
+        self.groups = ["a", "a", "b", "b", "b", "c", "c", "d", "e", "e"]
+
+        self.config = training.load_config()
+        self.config["data_dir"] = str(self.data_dir)
+        self.config["device"] = "cpu"
+        self.config["models"]["nucleus"].update(
+            features="nucleus_features.npy",
+            labels="nucleus_labels.npy",
+            batch_size=4,
+            epochs=1,
+        )
+        self.config["models"]["frame_cnn"].update(
+            features="frame_features.npy",
+            labels="frame_labels.npy",
+            times="frame_times.npy",
+            words="word_features.npy",
+            words_labels="word_labels.npy",
+            batch_size=4,
+            epochs=1,
+        )
+        self.config["models"]["random_forest"].update(
+            features="forest_features.npy", labels="forest_labels.npy"
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_grouped_folds(self):
+        tester = sweep.Sweep(
+            self.config, "nucleus", self.data_dir, folds=3, groups=self.groups
+        )
+        groups = np.array(self.groups)
+
+        splits = tester.split(len(self.groups))
+
+        self.assertEqual(len(splits), 3)
+        self.assertEqual(
+            sorted(np.concatenate([val for train, val in splits])), list(range(10))
+        )
+        for train, val in splits:
+            self.assertFalse(set(groups[train]) & set(groups[val]))
+
+    def test_frame_cnn_folds(self):
+        """
+        Are the frame sets, which have no sequence table, only split by sequence on request?
+        """
+
+        with self.assertRaises(ValueError):
+            sweep.Sweep(self.config, "frame_cnn", self.data_dir, folds=2)
+
+        tester = sweep.Sweep(
+            self.config,
+            "frame_cnn",
+            self.data_dir.joinpath("frame_cnn"),
+            grid={"kernel_size": [5]},
+            folds=2,
+            ungrouped=True,
+        )
+        results = tester.run()
+
+        self.assertEqual(list(results["fold"]), [1, 2])
+        self.assertEqual(list(results["param_kernel_size"]), [5, 5])
+        self.assertTrue(results["f1"].between(0, 1).all())
+
+        grouped = sweep.Sweep(
+            self.config, "frame_cnn", self.data_dir, folds=2, groups=self.groups
+        )
+        for train, val in grouped.split(len(self.groups)):
+            self.assertFalse(
+                set(np.array(self.groups)[train]) & set(np.array(self.groups)[val])
+            )
+
+    def test_parse_grid(self):
+        grid = sweep.parse_grid(["learning_rate=0.001,0.01", "pos_weight=null,3"])
+
+        self.assertEqual(
+            grid, {"learning_rate": [0.001, 0.01], "pos_weight": [None, 3]}
+        )
+        with self.assertRaises(ValueError):
+            sweep.parse_grid(["epochs"])
+
+    def test_run_sweeps(self):
+        out_dir = self.data_dir.joinpath("sweep")
+        tester = sweep.Sweep(
+            self.config,
+            "random_forest",
+            out_dir.joinpath("forest"),
+            grid={"n_estimators": [5, 10]},
+            folds=2,
+            groups=self.groups,
+        )
+        results = tester.run(num_workers=2)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(list(results["param_n_estimators"]), [5, 5, 10, 10])
+        self.assertTrue(out_dir.joinpath("forest", "results.csv").exists())
+        # Sets that are already memory-mapped are used in place
+        self.assertFalse(any(out_dir.joinpath("forest", "sets").iterdir()))
+
+        tester = sweep.Sweep(
+            self.config,
+            "nucleus",
+            out_dir.joinpath("nucleus"),
+            grid={"learning_rate": [0.001]},
+            folds=2,
+            groups=self.groups,
+        )
+        results = tester.run()
+
+        self.assertEqual(list(results["fold"]), [1, 2])
+        self.assertTrue(results["f1"].between(0, 1).all())
+        self.assertTrue(
+            out_dir.joinpath("nucleus", "sets", "features_offsets.npy").exists()
+        )
+        self.assertEqual(len(sweep.summarize(results)), 1)
+
+
+class ExportTests(unittest.TestCase):
+    """
+    Do the exported models give the same predictions as the trained networks?
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = Path(self.tmp_dir.name)
+        torch.manual_seed(1)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check_nucleus(self, fmt):
+        network = networks.NucleusClassifier(5).eval()
+        export.export_nucleus(network, self.out_dir, fmt)
+
+        features = torch.randn(3, 12, 5)
+        lengths = torch.tensor([12, 4, 9])
+        with torch.no_grad():
+            expected = torch.sigmoid(
+                network(
+                    torch.nn.utils.rnn.pack_padded_sequence(
+                        features, lengths, batch_first=True, enforce_sorted=False
+                    )
+                )
+            ).squeeze(2)
+
+        probs = runtime.load(self.out_dir).predict(features.numpy(), lengths.numpy())
+
+        for i, length in enumerate(lengths):
+            self.assertTrue(
+                np.allclose(probs[i, :length], expected[i, :length], atol=1e-5)
+            )
+
+    def check_cnn_lstm(self, fmt, num_word_features=3):
+        cnn = networks.FrameClassifier(4).eval()
+        lstm = networks.WordClassifier(num_word_features + 1, None).eval()
+        export.export_cnn_lstm(cnn, lstm, self.out_dir, fmt)
+
+        frames = torch.randn(2, 4, 96)
+        times = torch.tensor(
+            [[[1, 30], [31, 60], [61, 94]], [[1, 40], [41, 70], [0, 0]]]
+        )
+        words = torch.randn(2, 3, num_word_features)
+        lengths = torch.tensor([3, 2])
+
+        with torch.no_grad():
+            word_input = loop_word_inputs(words, cnn(frames, times // 8), times // 8)
+            preds, discard = lstm(
+                torch.nn.utils.rnn.pack_padded_sequence(
+                    word_input, lengths, batch_first=True, enforce_sorted=False
+                )
+            )
+        expected = torch.sigmoid(preds).squeeze(2)
+
+        probs = runtime.load(self.out_dir).predict(
+            frames.numpy(),
+            times.numpy(),
+            lengths.numpy(),
+            words.numpy() if num_word_features > 0 else None,
+        )
+
+        for i, length in enumerate(lengths):
+            self.assertTrue(
+                np.allclose(probs[i, :length], expected[i, :length], atol=1e-4)
+            )
+
+    def test_torchscript(self):
+        self.check_nucleus("torchscript")
+        self.check_cnn_lstm("torchscript")
+        self.check_cnn_lstm("torchscript", num_word_features=0)
+
+    @unittest.skipUnless(importlib.util.find_spec("onnxruntime"), "needs onnxruntime")
+    def test_onnx(self):
+        self.check_nucleus("onnx")
+        self.check_cnn_lstm("onnx")
+        self.check_cnn_lstm("onnx", num_word_features=0)
@@ -2,17 +2,30 @@
 Code to test functions in the `prep` submodule
 """
 
+import pickle
+import tempfile
 import unittest
 from pandas import DataFrame
 import numpy as np
 import json
 from parselmouth import Sound
 from parselmouth import praat
+from pathlib import Path
+from promdetect.benchmarks import run, synthetic
+from promdetect.models import datasets
+from promdetect.word_based import process_features as word_process
 from promdetect.prep import (
+    audio,
+    build_sets,
     process_annotations,
     find_syllable_nuclei,
     extract_features,
     prepare_data,
+    process_features,
+    pitch_range,
+    instrumentation,
+    oversampling,
+    schemas,
 )
 
 
@@ -145,6 +158,514 @@ class AnnotationImportTests(unittest.TestCase):
         self.assertTrue(tester.get_speaker_info() == correct_output)
 
 
+class SpeakerRegistryTests(unittest.TestCase):
+    """
+    Test that the speaker registry parses speaker files once and looks up recordings correctly.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.speaker_list = f"{cls.tmp_dir.name}/speakers.txt"
+        cls.speaker_json = f"{cls.tmp_dir.name}/speakers.json"
+
+        with open(cls.speaker_list, "w") as speaker_file:
+            speaker_file.write("200703250000\tSP1m\n")
+            speaker_file.write("200703260600\tSP2f\n")
+            speaker_file.write("200703260600\tSP3m\n")
+            speaker_file.write("200703261200\t???\n")
+
+        with open(cls.speaker_json, "w") as speaker_file:
+            json.dump({"dlf-nachrichten-200703250000": "m"}, speaker_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_speaker_list(self):
+        registry = process_annotations.SpeakerRegistry.from_speaker_list(
+            self.speaker_list
+        )
+
+        self.assertEqual(registry.get("dlf-nachrichten-200703250000"), ("1", "m"))
+        self.assertEqual(registry.get("dlf-nachrichten-200703260600"), ("2", "f"))
+        self.assertEqual(registry.get("dlf-nachrichten-200703261200"), ("unknown", "f"))
+        self.assertEqual(registry.get("dlf-nachrichten-200801010000"), ("unknown", "f"))
+        self.assertEqual(registry.get("notarealid2005-08-20-1500"), ("unknown", "f"))
+
+    def test_json(self):
+        registry = process_annotations.SpeakerRegistry.from_json(self.speaker_json)
+
+        self.assertEqual(registry.gender("dlf-nachrichten-200703250000"), "m")
+
+    def test_cache(self):
+        registry = process_annotations.speaker_registry(self.speaker_list)
+
+        self.assertTrue(
+            process_annotations.speaker_registry(self.speaker_list) is registry
+        )
+        # Registries are passed to worker processes by pickling
+        self.assertEqual(
+            pickle.loads(pickle.dumps(registry)).speakers, registry.speakers
+        )
+
+
+class PitchRangeTests(unittest.TestCase):
+    """
+    Test the per-speaker pitch range estimation on a synthetic voice between 100 and 160 Hz.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        times = np.arange(16_000 * 5) / 16_000
+        f0 = 130 + 30 * np.sin(2 * np.pi * 0.3 * times)
+        phase = 2 * np.pi * np.cumsum(f0) / 16_000
+        signal = sum(np.sin(k * phase) / k for k in range(1, 8))
+        cls.snd_obj = Sound(0.3 * signal, 16_000)
+        cls.silence = Sound(np.zeros(16_000), 16_000)
+
+    def test_estimate_range(self):
+        floor, ceiling = pitch_range.estimate_range(self.snd_obj, "m")
+
+        self.assertTrue(50 < floor < 100)
+        self.assertTrue(160 < ceiling < 300)
+
+    def test_fallback(self):
+        self.assertEqual(pitch_range.estimate_range(self.silence, "m"), (50, 300))
+
+    def test_cache(self):
+        """
+        Is a speaker's range pooled over all of their recordings, independent of the recording asked first?
+        """
+
+        registry = process_annotations.SpeakerRegistry(
+            {"0001": ("1", "m"), "0002": ("1", "m"), "0003": ("2", "m")}
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_files = [
+                f"{tmp_dir}/dlf-nachrichten-{key}.wav"
+                for key in ["0001", "0002", "0003"]
+            ]
+            self.snd_obj.save(wav_files[0], "WAV")
+            self.silence.save(wav_files[1], "WAV")
+            self.silence.save(wav_files[2], "WAV")
+
+            range_dir = f"{tmp_dir}/ranges"
+            ranges = [
+                pitch_range.PitchRangeCache(range_dir, registry).get(
+                    ("1", "m"), wav_file
+                )
+                for wav_file in reversed(wav_files[:2])
+            ]
+
+            self.assertEqual(ranges[0], ranges[1])
+            self.assertEqual(
+                ranges[0], pitch_range.estimate_speaker_range(wav_files[:2], "m")
+            )
+            self.assertTrue(Path(range_dir, "1m.json").is_file())
+
+            # Ranges in the directory are shared with new caches without estimating them again
+            Path(wav_files[0]).unlink()
+            cache = pitch_range.PitchRangeCache(range_dir, registry)
+            self.assertEqual(cache.get(("1", "m"), wav_files[1]), ranges[0])
+
+            self.assertEqual(cache.get(("2", "m"), wav_files[2]), (50, 300))
+            self.assertEqual(cache.get(("unknown", "m"), self.silence), (50, 300))
+            self.assertEqual(
+                sorted(path.name for path in Path(range_dir).iterdir()),
+                ["1m.json", "2m.json"],
+            )
+
+
+class AudioTests(unittest.TestCase):
+    """
+    Test that memory-mapped WAV files give the same samples and measurements as Praat.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+        rng = np.random.default_rng(0)
+        times = np.arange(16_000) / 16_000
+        signal = 0.4 * np.sin(2 * np.pi * 180 * times) + 0.05 * rng.normal(size=16_000)
+        signal[4_000:5_000] = 0
+        cls.snd_obj = Sound(np.vstack([signal, -0.5 * signal]), 16_000)
+
+        cls.wav_files = {}
+        for file_format in ["WAV", "WAV_24", "WAV_32"]:
+            cls.wav_files[file_format] = f"{cls.tmp_dir.name}/{file_format}.wav"
+            cls.snd_obj.save(cls.wav_files[file_format], file_format)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_samples(self):
+        for file_format, wav_file in self.wav_files.items():
+            wav = audio.WavFile(wav_file)
+
+            self.assertEqual(wav.num_channels, 2)
+            self.assertEqual(wav.sample_rate, 16_000)
+            self.assertEqual(wav.samples().dtype, np.float32)
+            self.assertTrue(np.array_equal(wav.sound().values, Sound(wav_file).values))
+
+    def test_rms(self):
+        wav = audio.WavFile(self.wav_files["WAV"])
+        snd_obj = wav.sound()
+        starts = np.array([0.0, 0.1234, 0.26, 0.9, 1.2, np.nan])
+
+        expected = [
+            snd_obj.get_rms(from_time=start, to_time=start + 0.015)
+            for start in starts[:-1]
+        ]
+
+        rms = wav.rms(starts, starts + 0.015)
+        self.assertTrue(np.allclose(rms[:-2], expected[:-1]))
+        self.assertTrue(np.isnan(rms[-2:]).all())
+
+    def test_zero_crossings(self):
+        wav = audio.WavFile(self.wav_files["WAV"])
+        snd_obj = wav.sound()
+        starts = np.arange(0.0, 0.95, 0.0173)
+
+        expected = [
+            praat.call(
+                praat.call(
+                    snd_obj.extract_part(from_time=start, to_time=start + 0.01),
+                    "To PointProcess (zeroes)",
+                    1,
+                    "yes",
+                    "yes",
+                ),
+                "Get number of points",
+            )
+            for start in starts
+        ]
+
+        self.assertEqual(list(wav.zero_crossings(starts, starts + 0.01)), expected)
+
+    def test_open_wav(self):
+        wav_file = f"{self.tmp_dir.name}/shared.wav"
+        self.snd_obj.save(wav_file, "WAV")
+
+        wav = audio.open_wav(wav_file)
+        self.assertIs(audio.open_wav(wav_file), wav)
+        self.assertIs(audio.as_wav(wav), wav)
+
+        # The Praat sound is only built once it is needed
+        extractor = extract_features.Extractor(wav_file)
+        self.assertIsNone(wav._sound)
+        self.assertIs(extractor.snd_obj, wav.sound())
+
+        # Rewritten files are opened again
+        Sound(np.zeros(800), 8_000).save(wav_file, "WAV")
+        self.assertEqual(audio.open_wav(wav_file).sample_rate, 8_000)
+
+    def test_release_after_extraction(self):
+        """
+        Does the shared recording drop its Praat sound once the nucleus features are extracted?
+        """
+
+        directory = f"{self.tmp_dir.name}/release"
+        wav_file, nucleus_times = synthetic.write_recording(directory, duration=2.0)
+        with open(prepare_data.CFG_FILE, "r") as cfg:
+            config = dict(json.load(cfg), directory=directory, find_nuclei=False)
+
+        feature_set = prepare_data.FeatureSet(
+            config, wav_file.stem, speaker=("unknown", "f")
+        )
+        feature_set.nuclei_raw = run.annotated_nuclei(
+            nucleus_times,
+            {
+                annotation_type: feature_set.collect_annotations(annotation_type)
+                for annotation_type in ["phones", "words", "tones", "accents"]
+            },
+        )
+        features = feature_set.run_config()
+
+        self.assertEqual(len(features), len(feature_set.nuclei))
+        self.assertIsNone(audio.open_wav(wav_file)._sound)
+
+
+class SchemaTests(unittest.TestCase):
+    """
+    Test that tables are cast to the column types of the schemas.
+    """
+
+    def test_enforce(self):
+        table = DataFrame(
+            {
+                "index": [3, 4, 5],
+                "nucl_time": np.array([1.5, 2.5, np.nan], dtype=object),
+                "phone": ["a:", "E", np.nan],
+                "rms": [0.1, 0.2, 0.3],
+                "zcr": [3, 4, 5],
+                "f0_max": np.array([np.nan, 120.0, None], dtype=object),
+                "part_obj": [Sound(np.zeros(10), 16_000)] * 3,
+                "has_accent": [True, False, True],
+            }
+        )
+
+        schemas.enforce(table, schemas.NUCLEI)
+
+        self.assertEqual(table["index"].dtype, "int32")
+        self.assertEqual(table["nucl_time"].dtype, "float64")
+        self.assertEqual(table["phone"].dtype, "category")
+        self.assertTrue(table["phone"].isna().iloc[2])
+        for column in ["rms", "zcr", "f0_max"]:
+            self.assertEqual(table[column].dtype, "float32")
+        self.assertEqual(table["part_obj"].dtype, object)
+        self.assertEqual(table["has_accent"].dtype, bool)
+
+    def test_memory_report(self):
+        labels = DataFrame({"label": ["wort"] * 1_000, "dur": np.ones(1_000)})
+        report = schemas.memory_report(
+            {
+                "objects": labels,
+                "typed": schemas.enforce(labels.copy(), schemas.SEGMENTS),
+            }
+        )
+
+        self.assertEqual(report.loc["objects", "object_columns"], 1)
+        self.assertEqual(report.loc["typed", "object_columns"], 0)
+        self.assertLess(
+            report.loc["typed", "bytes"], report.loc["objects", "bytes"] / 5
+        )
+
+
+class SetBuilderTests(unittest.TestCase):
+    """
+    Test that feature tables are aligned with their labels and split into sequences.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        labels = ["<P>", "<P>", "das", "ist", "<P>", "ein", "Test", "<P>", "ja"]
+        starts = np.array([0.0, 0.2, 0.5, 0.8, 1.1, 1.4, 1.7, 2.0, 2.3])
+
+        cls.words = DataFrame(
+            rng.normal(size=(len(labels), len(word_process.WORD_FEATURES))),
+            columns=word_process.WORD_FEATURES,
+        )
+        cls.words["label"] = labels
+        cls.words["start"] = starts
+        cls.words["end"] = starts + 0.3
+        cls.words.loc[3, "f0_max"] = np.nan
+
+        # Accents in "ist", "Test" (on the boundary to the pause) and in a pause
+        cls.accents = DataFrame({"time": [0.9, 2.0, 0.1], "label": ["H*", "L*", "H*"]})
+
+    def test_accent_labels(self):
+        labels = build_sets.accent_labels(self.words, self.accents)
+
+        self.assertEqual(list(labels), [0, 0, 0, 1, 0, 0, 1, 0, 0])
+
+    def test_word_sequences(self):
+        rows, labels, sequences = build_sets.word_sequences(self.words, self.accents)
+
+        self.assertEqual(list(sequences["length"]), [2, 2, 1])
+        self.assertEqual(list(sequences["start"]), [0.5, 1.4, 2.3])
+        np.testing.assert_allclose(sequences["end"], [1.1, 2.0, 2.6])
+        self.assertEqual(list(labels), [0, 1, 0, 1, 0])
+        self.assertEqual(rows.shape, (5, len(word_process.WORD_FEATURES)))
+        self.assertFalse(np.isnan(rows).any())
+
+    def test_nucleus_sequences(self):
+        rng = np.random.default_rng(1)
+        nuclei = DataFrame(
+            rng.normal(size=(6, 25)), columns=process_features.NUCLEUS_FEATURES[:-1]
+        )
+        nuclei["start_est"] = np.arange(6) * 0.2
+        nuclei["end"] = nuclei["start_est"] + 0.1
+        nuclei["ip_start"] = [0.0, 0.0, np.nan, 0.5, 0.5, 0.5]
+        nuclei["ip_end"] = [0.4, 0.4, np.nan, 1.2, 1.2, 1.2]
+        nuclei["accent_label"] = ["H*", np.nan, np.nan, np.nan, "L*", np.nan]
+
+        features, labels, sequences = build_sets.nucleus_sequences(nuclei, "m")
+        self.assertEqual(features.shape, (6, len(process_features.NUCLEUS_FEATURES)))
+        self.assertEqual(list(sequences["length"]), [6])
+
+        features, labels, sequences = build_sets.nucleus_sequences(
+            nuclei, "m", by_ip=True
+        )
+        self.assertEqual(list(sequences["length"]), [2, 3])
+        self.assertEqual(list(sequences["start"]), [0.0, 0.5])
+        self.assertEqual(list(labels), [1, 0, 0, 1, 0])
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            feature_dir = Path(tmp_dir).joinpath("features")
+            annotations_dir = Path(tmp_dir).joinpath("annotations")
+            feature_dir.mkdir()
+            annotations_dir.mkdir()
+
+            recordings = ["dlf-nachrichten-1", "dlf-nachrichten-2"]
+            for num, recording in enumerate(recordings):
+                self.words.to_csv(feature_dir.joinpath(f"{recording}.csv"))
+                synthetic.write_annotations(
+                    annotations_dir.joinpath(f"{recording}.accents"),
+                    self.accents.iloc[num:].to_numpy(),
+                )
+
+            builder = build_sets.SetBuilder("word", feature_dir, annotations_dir)
+            sequences = builder.write(f"{tmp_dir}/sets", num_workers=2)
+
+            features = datasets.load_set(tmp_dir, "sets/word_features.npy")
+            labels = datasets.load_set(tmp_dir, "sets/word_labels.npy")
+
+        self.assertEqual(
+            list(sequences["recording"]), [recordings[0]] * 3 + [recordings[1]] * 3
+        )
+        self.assertEqual([len(seq) for seq in features], [2, 2, 1] * 2)
+        self.assertEqual(
+            [list(seq) for seq in labels],
+            [[0, 1], [0, 1], [0], [0, 0], [0, 1], [0]],
+        )
+
+
+class OversamplingTests(unittest.TestCase):
+    """
+    Test that SMOTENC balances the classes of each group with rows interpolated between minority-class neighbours.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        cls.features = []
+        cls.labels = []
+        for num, length in enumerate([40, 55, 30, 25]):
+            features = rng.normal(size=(length, 4))
+            features[:, 3] = num % 2
+            cls.features.append(features)
+            cls.labels.append((np.arange(length) % 4 == 0).astype("int8"))
+
+    def test_smotenc(self):
+        features = np.concatenate(self.features[:2])
+        features[::3, 3] = 2
+        labels = np.concatenate(self.labels[:2])
+
+        synthetic, synthetic_labels, sources = oversampling.smotenc(
+            features, labels, [3], k_neighbors=3, rng=np.random.default_rng(1)
+        )
+
+        self.assertEqual(len(synthetic), (labels == 0).sum() - (labels == 1).sum())
+        self.assertTrue((synthetic_labels == 1).all())
+        self.assertTrue((labels[sources] == 1).all())
+        self.assertTrue(np.isin(synthetic[:, 3], [0, 1, 2]).all())
+
+        # Each synthetic row lies between its source row and one of the minority rows
+        minority = features[labels == 1][:, :3]
+        for row, source in zip(synthetic[:, :3], sources):
+            offsets = minority - features[source, :3]
+            steps = (offsets @ (row - features[source, :3])) / np.maximum(
+                (offsets * offsets).sum(axis=1), 1e-12
+            )
+            on_segment = np.abs(
+                features[source, :3] + steps[:, None] * offsets - row
+            ).max(axis=1)
+            self.assertLess(on_segment.min(), 1e-9)
+
+    def test_fit_resample(self):
+        oversampler = oversampling.Oversampler([3], k_neighbors=3, seed=5)
+        features, labels = oversampler.fit_resample(self.features, self.labels)
+
+        for seq_features, seq_labels, original in zip(features, labels, self.features):
+            self.assertEqual((seq_labels == 0).sum(), (seq_labels == 1).sum())
+            np.testing.assert_array_equal(seq_features[: len(original)], original)
+            self.assertTrue((seq_features[:, 3] == original[0, 3]).all())
+
+        parallel = oversampler.fit_resample(self.features, self.labels, num_workers=2)
+        for seq_features, parallel_features in zip(features, parallel[0]):
+            np.testing.assert_array_equal(seq_features, parallel_features)
+
+        # Groups are balanced as a whole
+        features, labels = oversampler.fit_resample(
+            self.features, self.labels, groups=["a", "b", "a", "b"]
+        )
+        group_labels = np.concatenate([labels[0], labels[2]])
+        self.assertEqual((group_labels == 0).sum(), (group_labels == 1).sum())
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            oversampler = oversampling.Oversampler([3], seed=5, cache_dir=tmp_dir)
+            features, labels = oversampler.fit_resample(self.features, self.labels)
+            cache_files = oversampler.cache_files(
+                self.features, self.labels, np.arange(4)
+            )
+            self.assertTrue(cache_files[0].exists())
+
+            cached_features, cached_labels = oversampler.fit_resample(
+                self.features, self.labels
+            )
+            for seq, cached_seq in zip(features, cached_features):
+                np.testing.assert_array_equal(seq, cached_seq)
+
+            # Other seeds are not read from the cache
+            oversampler.seed = 6
+            self.assertNotEqual(
+                oversampler.cache_files(self.features, self.labels, np.arange(4)),
+                cache_files,
+            )
+
+
+class InstrumentationTests(unittest.TestCase):
+    """
+    Test that the instrumentation records time, Praat calls, allocations and rows of each stage.
+    """
+
+    def test_stage(self):
+        recorder = instrumentation.Instrumentation("rec", "nucleus")
+        snd_obj = Sound(np.zeros(1_600), 16_000)
+
+        with recorder.stage("calls", rows=3):
+            for _ in range(3):
+                praat.call(snd_obj, "Get root-mean-square", 0, 0)
+            values = np.ones(1_000_000)
+
+        record = recorder.records[0]
+        self.assertEqual(record["praat_calls"], 3)
+        self.assertEqual(record["rows"], 3)
+        self.assertTrue(record["bytes_allocated"] >= values.nbytes)
+        # praat.call is only replaced while a stage runs
+        self.assertTrue(praat.call is instrumentation._praat_call)
+
+    def test_instrument(self):
+        class DummyExtractor(object):
+            def __init__(self):
+                self.features = DataFrame({"a": [1.0, 2.0]})
+
+            def get_feature(self):
+                self.features["b"] = self.features["a"] * 2
+                return "done"
+
+        recorder = instrumentation.Instrumentation("rec", "word", trace_memory=False)
+        extractor = instrumentation.instrument(DummyExtractor(), recorder)
+
+        self.assertEqual(extractor.get_feature(), "done")
+        self.assertEqual(recorder.records[0]["stage"], "get_feature")
+        self.assertEqual(recorder.records[0]["rows"], 2)
+
+    def test_aggregate(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for recording in ["rec_a", "rec_b"]:
+                recorder = instrumentation.Instrumentation(
+                    recording, "word", f"{tmp_dir}/log.jsonl"
+                )
+                for name in ["fast", "slow"]:
+                    with recorder.stage(name, rows=10):
+                        pass
+                recorder.write()
+
+            totals = instrumentation.aggregate([f"{tmp_dir}/log.jsonl"])
+
+        self.assertEqual(totals.loc[("word", "slow"), "recordings"], 2)
+        self.assertEqual(totals.loc[("word", "fast"), "rows"], 20)
+        self.assertAlmostEqual(totals["share"].sum(), 1.0)
+
+
 class NucleiExtractionTests(unittest.TestCase):
     """
     Test that the automatic extraction of syllable nuclei works as expected.
@@ -324,9 +845,9 @@ class NucleiExtractionTests(unittest.TestCase):
             accents=accents_df,
         )
 
-        self.assertTrue(list(assigned_df["end"]) == [26.16, np.nan, 26.49, 26.74])
-        self.assertTrue(
-            list(assigned_df["start_est"]) == [26.1301, np.nan, 26.4201, 26.6201]
+        np.testing.assert_array_equal(assigned_df["end"], [26.16, np.nan, 26.49, 26.74])
+        np.testing.assert_array_equal(
+            assigned_df["start_est"], [26.1301, np.nan, 26.4201, 26.6201]
         )
 
     def test_nucleus_extraction(self):
@@ -1085,6 +1606,61 @@ class FeatureExtractionTests(unittest.TestCase):
 
         self.assertTrue(np.array_equal(tilt, expected_vals, equal_nan=True))
 
+    def test_missing_timestamps(self):
+        """
+        Are nuclei without timestamps skipped, and are the others computed as per-row Praat queries?
+        """
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_file, nucl_times = synthetic.write_recording(tmp_dir, duration=4.0)
+
+            nuclei_df = DataFrame(
+                {
+                    "start_est": nucl_times - 0.04,
+                    "end": nucl_times + 0.04,
+                    "ip_start": np.where(nucl_times < 2.0, 0.0, 2.0),
+                    "ip_end": np.where(nucl_times < 2.0, 2.0, 4.0),
+                }
+            )
+            nuclei_df.loc[[1, 4], "end"] = np.nan
+            nuclei_df.loc[2, "ip_start"] = np.nan
+
+            tester = extract_features.Extractor(str(wav_file), nuclei=nuclei_df)
+            tester.calc_pitch()
+            f0_max = tester.get_f0_max_nuclei()
+
+            expected_rows = nuclei_df.index.drop([1, 4])
+            self.assertTrue(f0_max.index.equals(expected_rows))
+            self.assertEqual(
+                list(f0_max),
+                [
+                    praat.call(
+                        tester.pitch_obj, "Get maximum", start, end, "Hertz", "None"
+                    )
+                    for start, end in nuclei_df.loc[
+                        expected_rows, ["start_est", "end"]
+                    ].to_numpy()
+                ],
+            )
+            self.assertTrue(tester.nuclei["f0_max"].isna()[[1, 4]].all())
+
+            # IP excursions use one quantile per IP
+            excursions = tester.get_excursion("ip")
+            f0_q10 = [
+                (
+                    praat.call(
+                        tester.pitch_obj, "Get quantile", start, end, 0.1, "Hertz"
+                    )
+                    if not np.isnan(start)
+                    else np.nan
+                )
+                for start, end in nuclei_df[["ip_start", "ip_end"]].to_numpy()
+            ]
+            np.testing.assert_allclose(
+                excursions, 12 * np.log2(tester.nuclei["f0_max"] / f0_q10)
+            )
+            self.assertTrue(np.isnan(excursions[[1, 2, 4]]).all())
+
 
 class FeatureSetTests(unittest.TestCase):
     """
@@ -1,7 +1,11 @@
+import tempfile
 import unittest
+import wave
 import pandas as pd
 import numpy as np
 from glob import glob
+import parselmouth as pm
+from parselmouth import praat
 
 from promdetect.word_based import segmentation, extract_word_features
 
@@ -38,9 +42,11 @@ class WordSegmentationTests(unittest.TestCase):
 
         ex_df = tester.annotations["dlf-nachrichten-200703250000"]
 
+        self.assertTrue("start_sample" in ex_df.columns)
+        self.assertTrue("end_sample" in ex_df.columns)
         self.assertTrue("start_frame" in ex_df.columns)
         self.assertTrue("end_frame" in ex_df.columns)
-        self.assertTrue("duration_frames" in ex_df.columns)
+        self.assertTrue(ex_df["start_frame"].dtype == "int32")
 
     def test_frame_calculation_output_values(self):
         tester = segmentation.Segmenter(
@@ -53,10 +59,15 @@ class WordSegmentationTests(unittest.TestCase):
         ex_df = tester.annotations["dlf-nachrichten-200703250000"]
 
         ex_vals = ex_df.loc[145]
+        indexer = tester.indexers["dlf-nachrichten-200703250000"]
+        frame_times = indexer.frame_times()
 
-        self.assertTrue(ex_vals["start_frame"] == (ex_vals["start"] * 48_000))
-        self.assertTrue(ex_vals["end_frame"] == (ex_vals["end"] * 48_000))
-        self.assertTrue(ex_vals["duration_frames"] == (ex_vals["duration"] * 48_000))
+        self.assertTrue(
+            ex_vals["start_sample"] >= ex_vals["start"] * indexer.sample_rate
+        )
+        self.assertTrue(ex_vals["end_sample"] <= ex_vals["end"] * indexer.sample_rate)
+        self.assertTrue(frame_times[ex_vals["start_frame"]] >= ex_vals["start"])
+        self.assertTrue(frame_times[ex_vals["end_frame"]] <= ex_vals["end"])
 
     def test_file_output(self):
         tester = segmentation.Segmenter(
@@ -107,9 +118,11 @@ class IPSegmentationTests(unittest.TestCase):
 
         ex_df = tester.annotations["dlf-nachrichten-200703250000"]
 
+        self.assertTrue("start_sample" in ex_df.columns)
+        self.assertTrue("end_sample" in ex_df.columns)
         self.assertTrue("start_frame" in ex_df.columns)
         self.assertTrue("end_frame" in ex_df.columns)
-        self.assertTrue("duration_frames" in ex_df.columns)
+        self.assertTrue(ex_df["start_frame"].dtype == "int32")
 
     def test_frame_calculation_output_values(self):
         tester = segmentation.Segmenter(
@@ -122,10 +135,15 @@ class IPSegmentationTests(unittest.TestCase):
         ex_df = tester.annotations["dlf-nachrichten-200703250000"]
 
         ex_vals = ex_df.loc[42]
+        indexer = tester.indexers["dlf-nachrichten-200703250000"]
+        frame_times = indexer.frame_times()
 
-        self.assertTrue(ex_vals["start_frame"] == (ex_vals["start"] * 48_000))
-        self.assertTrue(ex_vals["end_frame"] == (ex_vals["end"] * 48_000))
-        self.assertTrue(ex_vals["duration_frames"] == (ex_vals["duration"] * 48_000))
+        self.assertTrue(
+            ex_vals["start_sample"] >= ex_vals["start"] * indexer.sample_rate
+        )
+        self.assertTrue(ex_vals["end_sample"] <= ex_vals["end"] * indexer.sample_rate)
+        self.assertTrue(frame_times[ex_vals["start_frame"]] >= ex_vals["start"])
+        self.assertTrue(frame_times[ex_vals["end_frame"]] <= ex_vals["end"])
 
     def test_file_output(self):
         tester = segmentation.Segmenter(
@@ -144,6 +162,99 @@ class IPSegmentationTests(unittest.TestCase):
         )
 
 
+class CorpusSegmentationTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+
+        words = [
+            (0.05, "[@]"),
+            (0.6, "eins"),
+            (1.2, "zwei"),
+            (1.7, "<P>"),
+            (6.0, "drei"),
+            (6.4, "[h]"),
+            (6.9, "vier"),
+        ]
+        for recording in ["rec_a", "rec_b"]:
+            with open(f"{cls.tmp_dir.name}/{recording}.words", "w") as annot_file:
+                annot_file.write("signal rec\nnfields 1\n#\n")
+                for end, label in words:
+                    annot_file.write(f"    {end:.6f}  121 {label}\n")
+
+            with wave.open(f"{cls.tmp_dir.name}/{recording}.wav", "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(16_000)
+                wav.writeframes(bytes(2 * 16_000 * 7))
+
+        cls.tester = segmentation.Segmenter("words", cls.tmp_dir.name)
+        cls.tester.read_annotations()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_start_duration(self):
+        ex_df = self.tester.annotations["rec_a"]
+
+        self.assertListEqual(
+            list(ex_df["label"]), ["eins", "zwei", "<P>", "drei", "vier"]
+        )
+        self.assertAlmostEqual(ex_df.loc[0, "start"], 0.0501)
+        self.assertAlmostEqual(ex_df.loc[1, "duration"], 0.5999)
+        # Words longer than 3 seconds start 3 seconds before their end
+        self.assertAlmostEqual(ex_df.loc[3, "start"], 3.0)
+        self.assertEqual(ex_df.loc[3, "duration"], 3.0)
+
+    def test_parallel(self):
+        tester = segmentation.Segmenter("words", self.tmp_dir.name)
+        tester.read_annotations(num_workers=2)
+
+        for recording, content in self.tester.annotations.items():
+            pd.testing.assert_frame_equal(tester.annotations[recording], content)
+
+    def test_corpus_table(self):
+        path = f"{self.tmp_dir.name}/words.pkl"
+        self.tester.save_corpus(path)
+        table = segmentation.load_corpus(path)
+
+        self.assertListEqual(table.index.names, ["recording", "position"])
+        pd.testing.assert_frame_equal(
+            table.loc["rec_b"].reset_index(drop=True),
+            self.tester.annotations["rec_b"],
+        )
+
+    def test_frame_info(self):
+        tester = segmentation.Segmenter("words", self.tmp_dir.name)
+        tester.read_annotations()
+        tester.add_frame_info(pitch_floors={"rec_b": 50})
+
+        for recording, pitch_floor in [("rec_a", 75), ("rec_b", 50)]:
+            ex_df = tester.annotations[recording]
+            indexer = tester.indexers[recording]
+            pitch_obj = pm.Sound(f"{self.tmp_dir.name}/{recording}.wav").to_pitch_cc(
+                time_step=0.01, pitch_floor=pitch_floor
+            )
+
+            # Same frames as the frame-level features
+            self.assertEqual(indexer.num_frames, pitch_obj.n_frames)
+            self.assertTrue(np.allclose(indexer.frame_times(), pitch_obj.ts()))
+
+            self.assertEqual(ex_df.loc[1, "start_sample"], 9602)
+            self.assertEqual(ex_df.loc[1, "end_sample"], 19199)
+            for word in ex_df.itertuples():
+                frame_times = indexer.frame_times()[
+                    word.start_frame : word.end_frame + 1
+                ]
+                self.assertTrue(np.all(frame_times >= word.start))
+                self.assertTrue(np.all(frame_times <= word.end))
+
+        spans = segmentation.span_table(tester.annotations["rec_a"])
+        self.assertTrue(spans.dtype == "int64")
+        self.assertTrue(np.array_equal(spans[:, 0], [4, 59, 119, 299, 639]))
+
+
 class DurationExtractionTests(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -627,3 +738,124 @@ class SpectralExtractionTests(unittest.TestCase):
         )
 
         cls.assertTrue(np.array_equal(expected_h1_h2_vals, true_h1_h2_vals))
+
+
+class SpanAssignmentTests(unittest.TestCase):
+    def test_find_spans(self):
+        span_starts = np.array([np.nan, 3.0001, 1.0001])[1:]
+        span_ends = np.array([np.nan, 5.0, 3.0])[1:]
+        starts = np.array([np.nan, 1.2, 2.5, 2.9, 3.5, 4.8, 5.5])
+        ends = np.array([1.0, 2.0, 2.9, 3.2, 4.0, 5.0, 6.0])
+
+        span_idx = extract_word_features.find_spans(
+            starts, ends, span_starts, span_ends
+        )
+
+        self.assertTrue(np.array_equal(span_idx, [-1, 1, 1, -1, 0, 0, -1]))
+
+
+class IntervalStatsTests(unittest.TestCase):
+    """
+    Do the array-based word statistics match the corresponding Praat queries?
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        times = np.arange(48_000) / 16_000
+        signal = np.sin(2 * np.pi * 150 * times) * (1 + np.sin(2 * np.pi * 3 * times))
+        cls.snd_obj = pm.Sound(signal + 0.01 * rng.normal(size=times.size), 16_000)
+        cls.int_obj = cls.snd_obj.to_intensity(minimum_pitch=50)
+
+        cls.starts = np.sort(rng.uniform(0.05, 2.5, 20))
+        cls.ends = cls.starts + rng.uniform(0.03, 0.4, 20)
+
+    def test_sound_rms(self):
+        expected = [
+            praat.call(self.snd_obj, "Get root-mean-square", start, end)
+            for start, end in zip(self.starts, self.ends)
+        ]
+
+        self.assertTrue(
+            np.allclose(
+                extract_word_features.sound_rms(self.snd_obj, self.starts, self.ends),
+                expected,
+            )
+        )
+
+    def test_intensity_stats(self):
+        stats = extract_word_features.interval_stats(
+            self.int_obj, self.starts, self.ends
+        )
+
+        for key, query, args in [
+            ("min", "Get minimum", ["None"]),
+            ("max", "Get maximum", ["None"]),
+            ("min_time", "Get time of minimum", ["None"]),
+            ("max_time", "Get time of maximum", ["None"]),
+            ("mean", "Get mean", ["energy"]),
+            ("std", "Get standard deviation", []),
+        ]:
+            expected = [
+                praat.call(self.int_obj, query, start, end, *args)
+                for start, end in zip(self.starts, self.ends)
+            ]
+
+            self.assertTrue(np.allclose(stats[key], expected), key)
+
+    def test_tied_extrema(self):
+        """
+        Are minimum and maximum placed on the frame Praat picks on flat and silent stretches?
+        """
+
+        silent = np.concatenate([np.zeros(8_000), self.snd_obj.values[0, :8_000]])
+        int_obj = pm.Sound(np.tile(silent, 2), 16_000).to_intensity(minimum_pitch=50)
+        starts = np.array([0.05, 0.3, 0.6, 0.9, 1.2, 1.4, 0.1])
+        ends = np.array([0.45, 0.55, 0.95, 1.3, 1.6, 1.9, 0.4])
+
+        stats = extract_word_features.interval_stats(int_obj, starts, ends)
+
+        for key, query in [
+            ("min_time", "Get time of minimum"),
+            ("max_time", "Get time of maximum"),
+        ]:
+            expected = [
+                praat.call(int_obj, query, start, end, "None")
+                for start, end in zip(starts, ends)
+            ]
+
+            self.assertTrue(np.allclose(stats[key], expected), key)
+
+    def test_pitch_quantiles(self):
+        pitch_obj = self.snd_obj.to_pitch_cc(pitch_floor=75, pitch_ceiling=500)
+        ends = self.starts + 0.5
+
+        expected = [
+            praat.call(pitch_obj, "Get quantile", start, end, 0.1, "Hertz")
+            for start, end in zip(self.starts, ends)
+        ]
+
+        self.assertTrue(
+            np.allclose(
+                extract_word_features.pitch_quantiles(
+                    pitch_obj, self.starts, ends, 0.1
+                ),
+                expected,
+                equal_nan=True,
+            )
+        )
+
+    def test_pitch_slopes(self):
+        """
+        On the full frame range of a contour, the slope equals Praat's slope without octave jumps.
+        """
+
+        pitch_obj = self.snd_obj.extract_part(from_time=0.5, to_time=1.2).to_pitch_cc(
+            pitch_floor=75, pitch_ceiling=500
+        )
+
+        slopes = extract_word_features.pitch_slopes(
+            pitch_obj, np.array([pitch_obj.xmin]), np.array([pitch_obj.xmax])
+        )
+
+        self.assertAlmostEqual(slopes[0], pitch_obj.get_slope_without_octave_jumps())